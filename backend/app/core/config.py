@@ -1,36 +1,135 @@
-from pydantic_settings import BaseSettings
-from typing import List, Optional
 import os
 
+from pydantic_settings import BaseSettings
+from typing import Dict, List, Literal, Optional
+
 class Settings(BaseSettings):
     # MongoDB Database
     MONGODB_URL: str
     DATABASE_NAME: str = "betting_db"
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 10  # Opened at startup when MONGODB_WARM_UP is on
+    MONGODB_MAX_CONNECTING: int = 4
+    MONGODB_MAX_IDLE_TIME_MS: int = 300000
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 2000  # Fail fast instead of queueing behind a full pool
+    MONGODB_CONNECT_TIMEOUT_MS: int = 5000
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGODB_COMPRESSORS: str = "zstd,snappy,zlib"
+    MONGODB_SECONDARY_READS: bool = True  # secondaryPreferred for catalog, stats and history
+    MONGODB_MAX_STALENESS_SECONDS: int = 90
+    MONGODB_WARM_UP: bool = True
+    INDEX_CREATION: Literal["startup", "background", "skip"] = "background"
     
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    JWT_CACHE_SIZE: int = 10000
+    
+    # Password hashing pool (workers defaults to CPU count)
+    PASSWORD_HASH_WORKERS: Optional[int] = None
+    PASSWORD_HASH_QUEUE_SIZE: int = 64
+    PASSWORD_HASH_RETRY_AFTER: int = 1
     
-    # Redis
+    # Rate limiting, "<METHOD> <path>" or "*" -> "ip:<count>/<seconds>,account:<count>/<seconds>"
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_POLICIES: Dict[str, str] = {
+        "POST /api/v1/auth/login": "ip:20/60,account:5/300",
+        "POST /api/v1/auth/token": "ip:20/60,account:5/300",
+        "POST /api/v1/auth/register": "ip:5/300",
+        "*": "ip:600/60",
+    }
+    RATE_LIMIT_TRUSTED_PROXIES: int = 0  # Proxies in front of the app that append to X-Forwarded-For
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = 100000
+    
+    # Redis; without it caches are only invalidated on the worker that made the change
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_ENABLED: bool = False
+    
+    # Celery workers (broker and results default to REDIS_URL)
+    CELERY_ENABLED: bool = False
+    CELERY_BROKER_URL: Optional[str] = None
+    CELERY_RESULT_BACKEND: Optional[str] = None
+    CELERY_RESULT_EXPIRES_SECONDS: int = 86400
+    
+    # Principal cache for authorization checks
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    
+    # Wallet operation keys are kept this long for double-apply protection,
+    # longer than settlement replays and the orphaned stake sweep look back
+    WALLET_OP_KEY_TTL_HOURS: int = 72
+    
+    # Bet placement
+    BET_WRITE_BATCH_SIZE: int = 500
+    BET_WRITE_WINDOW_MS: int = 25
+    BET_BATCH_MAX_BETS: int = 50
+    
+    # Live session totals
+    SESSION_STATS_SHARDS: int = 16
+    SESSION_STATS_FLUSH_MS: int = 1000
+    
+    # Bet settlement
+    SETTLEMENT_BATCH_SIZE: int = 5000
+    
+    # Archival of settled bets and completed transactions
+    ARCHIVE_AFTER_DAYS: int = 90
+    ARCHIVE_BATCH_SIZE: int = 1000
+    
+    # Notification delivery
+    NOTIFICATION_STREAM: str = "notifications"
+    NOTIFICATION_STREAM_MAXLEN: int = 1000000
+    NOTIFICATION_BATCH_SIZE: int = 500
+    NOTIFICATION_CONNECTION_BUFFER: int = 100
+    NOTIFICATION_MAX_DROPPED: int = 500
+    NOTIFICATION_KEEPALIVE_SECONDS: int = 15
+    NOTIFICATION_PUSH_CLAIM_INTERVAL_MS: int = 100
+    NOTIFICATION_PUSH_CLAIM_TIMEOUT_SECONDS: int = 30  # Stop waiting for a notification to be stored
     
     # Payment Gateway
     STRIPE_SECRET_KEY: str
     STRIPE_PUBLISHABLE_KEY: str
     STRIPE_WEBHOOK_SECRET: str
+    PAYMENT_WEBHOOK_TOLERANCE_SECONDS: int = 300
+    PAYMENT_WORKERS: int = 8
+    PAYMENT_QUEUE_SIZE: int = 10000
+    PAYMENT_MAX_ATTEMPTS: int = 5
+    PAYMENT_EVENT_BLOOM_CAPACITY: int = 1000000
+    PAYMENT_EVENT_DEDUP_TTL_SECONDS: int = 7 * 24 * 3600
+    WALLET_CURRENCY: str = "usd"  # ISO code, deposits in any other currency are rejected
     
     # Email Configuration
     SMTP_SERVER: str = "smtp.gmail.com"
     SMTP_PORT: int = 587
     SMTP_USERNAME: str
     SMTP_PASSWORD: str
+    SMTP_START_TLS: bool = True
+    SMTP_POOL_SIZE: int = 4
+    EMAIL_ENABLED: bool = False
+    EMAIL_BATCH_SIZE: int = 200
+    EMAIL_BATCH_WINDOW_MS: int = 200
+    # Notification types that are also emailed; bet results stay in the inbox
+    EMAIL_NOTIFICATION_TYPES: List[str] = ["deposit_confirmation", "withdrawal_confirmation"]
+    EMAIL_TASK_RATE_LIMIT: str = "30/m"  # Celery email tasks per worker, each sends one batch
+    SMTP_FROM: str = "no-reply@betting.com"
     
     # Application Settings
     APP_NAME: str = "Betting Application"
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = True
     CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8080"]
+    FAST_JSON_RESPONSES: bool = True  # Routes using fast_response skip the second validation
+    
+    # Readiness checks, cached so probes never pile onto the database
+    HEALTH_CHECK_TTL_SECONDS: float = 2.0
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 1.0
+    
+    # Instrumentation: Prometheus /metrics and the admin ?__profile=1 sampler.
+    # /metrics needs METRICS_TOKEN or an admin token as a bearer
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: Optional[str] = None
+    PROFILING_ENABLED: bool = True
+    PROFILE_SAMPLE_INTERVAL_MS: float = 2.0
     
     # Admin Settings
     SUPER_ADMIN_EMAIL: str = "admin@betting.com"
@@ -41,3 +140,12 @@ class Settings(BaseSettings):
         case_sensitive = True
 
 settings = Settings()
+
+# Motor runs driver calls on a thread pool sized from MOTOR_MAX_WORKERS
+# when it is first imported, so this module is imported before motor. A
+# call waiting for a connection holds its thread: fewer threads than
+# connections would cap the pool below maxPoolSize.
+os.environ.setdefault(
+    "MOTOR_MAX_WORKERS",
+    str(max(settings.MONGODB_MAX_POOL_SIZE, min(32, (os.cpu_count() or 1) + 4))),
+)
@@ -1,40 +1,274 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from beanie import init_beanie
+import asyncio
+import logging
+import threading
+# Before motor, it sizes Motor's thread pool
 from .config import settings
-from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from beanie import init_beanie
+from pymongo import IndexModel, ReadPreference, monitoring
+from pymongo.read_preferences import SecondaryPreferred
+from .metrics import MONGO_COMMANDS, MONGO_DURATION, MONGO_POOL_CHECKOUT_FAILURES, MONGO_POOL_WAIT
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
 
 # MongoDB client
 client: Optional[AsyncIOMotorClient] = None
 
+# Secondary indexes: "pending", "ready", "failed" or "skipped", reported
+# by readiness checks. Unique indexes are always in place before serving.
+index_status = "skipped"
+_index_task: Optional[asyncio.Task] = None
+
+# Catalog, stats and history reads tolerate replication lag; everything
+# else, the wallet included, reads from the primary
+SECONDARY_PREFERRED = SecondaryPreferred(max_staleness=settings.MONGODB_MAX_STALENESS_SECONDS)
+
+_secondary_collections: Dict[str, AsyncIOMotorCollection] = {}
+
 # Get MongoDB client
 async def get_database_client() -> AsyncIOMotorClient:
     return client
 
-# Initialize database
-async def init_database():
-    global client
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
+class CommandMetrics(monitoring.CommandListener):
+    """Counts and times every command the driver sends."""
+    
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        MONGO_COMMANDS.inc(command=event.command_name, status="ok")
+        MONGO_DURATION.observe(event.duration_micros / 1e6, command=event.command_name)
+    
+    def failed(self, event):
+        MONGO_COMMANDS.inc(command=event.command_name, status="error")
+        MONGO_DURATION.observe(event.duration_micros / 1e6, command=event.command_name)
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connections open and checked out per server, and time spent waiting for one."""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._open: Dict[tuple, int] = {}
+        self._checked_out: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+    
+    def _add(self, counts: Dict[tuple, int], address: tuple, amount: int):
+        with self._lock:
+            counts[address] = counts.get(address, 0) + amount
+    
+    def pool_created(self, event):
+        self._add(self._open, event.address, 0)
+        self._add(self._checked_out, event.address, 0)
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_cleared(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        with self._lock:
+            self._open.pop(event.address, None)
+            self._checked_out.pop(event.address, None)
+    
+    def connection_created(self, event):
+        self._add(self._open, event.address, 1)
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_closed(self, event):
+        self._add(self._open, event.address, -1)
+    
+    def connection_check_out_started(self, event):
+        pass
     
-    # Import all models here for beanie initialization
+    def connection_check_out_failed(self, event):
+        MONGO_POOL_CHECKOUT_FAILURES.inc(reason=event.reason)
+        MONGO_POOL_WAIT.observe(event.duration)
+    
+    def connection_checked_out(self, event):
+        self._add(self._checked_out, event.address, 1)
+        MONGO_POOL_WAIT.observe(event.duration)
+    
+    def connection_checked_in(self, event):
+        self._add(self._checked_out, event.address, -1)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            checked_out = list(self._checked_out.values())
+            open_connections = sum(self._open.values())
+        return {
+            "servers": len(checked_out),
+            "max_size": self.max_size,
+            "open": open_connections,
+            "checked_out": sum(checked_out),
+            # Busiest server's pool, the one requests queue on first
+            "utilization": max(checked_out, default=0) / self.max_size,
+        }
+
+pool_metrics = PoolMetrics(settings.MONGODB_MAX_POOL_SIZE)
+
+def _client_options() -> dict:
+    options = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxConnecting": settings.MONGODB_MAX_CONNECTING,
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGODB_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    }
+    if settings.MONGODB_COMPRESSORS:
+        # Compressors whose library is missing are skipped with a warning
+        options["compressors"] = settings.MONGODB_COMPRESSORS
+    if settings.METRICS_ENABLED:
+        options["event_listeners"] = [CommandMetrics(), pool_metrics]
+    return options
+
+async def _warm_up(mongo_client: AsyncIOMotorClient):
+    """Open `minPoolSize` connections before the first request needs them.
+    
+    The driver fills the pool to `minPoolSize` by itself, but only in
+    the background; concurrent pings open the connections now. With
+    secondary reads on, a secondary's pool is warmed too.
+    """
+    count = settings.MONGODB_MIN_POOL_SIZE
+    preferences = [ReadPreference.PRIMARY]
+    if settings.MONGODB_SECONDARY_READS:
+        preferences.append(SECONDARY_PREFERRED)
+    await asyncio.gather(*(
+        mongo_client.admin.command("ping", read_preference=preference)
+        for preference in preferences
+        for _ in range(max(1, count))
+    ))
+
+def secondary_reads(collection: AsyncIOMotorCollection) -> AsyncIOMotorCollection:
+    """The collection with reads going to a secondary when one is available."""
+    if not settings.MONGODB_SECONDARY_READS:
+        return collection
+    routed = _secondary_collections.get(collection.full_name)
+    if routed is None:
+        routed = _secondary_collections[collection.full_name] = collection.with_options(
+            read_preference=SECONDARY_PREFERRED
+        )
+    return routed
+
+def document_models() -> list:
+    """Every Beanie document model, imported late to avoid import cycles."""
     from app.models.user import User
     from app.models.bet import Bet
-    from app.models.game import Game
+    from app.models.game import Game, GameSession
     from app.models.transaction import Transaction
-    from app.models.notification import Notification
+    from app.models.notification import Notification, BroadcastNotification, NotificationReadState
+    from app.models.stats import UserDailyStats, GameHourlyStats
+    from app.models.payment import PaymentEvent
+    
+    return [
+        User,
+        Bet,
+        Game,
+        GameSession,
+        Transaction,
+        Notification,
+        BroadcastNotification,
+        NotificationReadState,
+        UserDailyStats,
+        GameHourlyStats,
+        PaymentEvent,
+    ]
+
+def declared_indexes(model) -> List[IndexModel]:
+    """Indexes listed in a model's `Settings.indexes`, field names included."""
+    return [
+        IndexModel(index) if isinstance(index, str) else index
+        for index in getattr(model.Settings, "indexes", [])
+    ]
+
+def _is_unique(index: IndexModel) -> bool:
+    return bool(index.document.get("unique"))
+
+async def create_indexes(unique: Optional[bool] = None):
+    """Create the indexes declared on every model.
+    
+    `unique=True` creates only the unique indexes, which wallet
+    idempotency, webhook dedup and registration depend on, `False` only
+    the others. Plain `create_indexes`, so existing indexes are left as
+    they are: nothing is dropped, including indexes added by hand.
+    Idempotent, so workers racing on it are harmless.
+    """
+    for model in document_models():
+        indexes = [
+            index for index in declared_indexes(model)
+            if unique is None or _is_unique(index) == unique
+        ]
+        if indexes:
+            await model.get_motor_collection().create_indexes(indexes)
+
+async def undeclared_indexes() -> Dict[str, List[str]]:
+    """Index names per collection that no model declares, `_id_` aside."""
+    found = {}
+    for model in document_models():
+        declared = {index.document["name"] for index in declared_indexes(model)} | {"_id_"}
+        collection = model.get_motor_collection()
+        extra = [name for name in await collection.index_information() if name not in declared]
+        if extra:
+            found[collection.name] = extra
+    return found
+
+async def _create_indexes_in_background():
+    global index_status
+    try:
+        await create_indexes(unique=False)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        index_status = "failed"
+        logger.exception("Background index creation failed")
+    else:
+        index_status = "ready"
+        logger.info("Indexes created")
+
+# Initialize database
+async def init_database(indexes: Optional[str] = None):
+    """Connect and bind the models.
     
-    # Initialize beanie with the models
+    `indexes` overrides `INDEX_CREATION`: "startup" creates every index
+    before returning; "background" creates the unique indexes before
+    returning and the rest in a task after; "skip" leaves them all to
+    `scripts/create_indexes.py`.
+    """
+    global client, index_status, _index_task
+    mode = indexes or settings.INDEX_CREATION
+    client = AsyncIOMotorClient(settings.MONGODB_URL, **_client_options())
+    _secondary_collections.clear()
+    if settings.MONGODB_WARM_UP:
+        await _warm_up(client)
+    
+    # Initialize beanie with the models, indexes are created below
     await init_beanie(
         database=client[settings.DATABASE_NAME],
-        document_models=[
-            User,
-            Bet,
-            Game,
-            Transaction,
-            Notification
-        ],
+        document_models=document_models(),
+        skip_indexes=True,
     )
+    
+    if mode == "startup":
+        await create_indexes()
+        index_status = "ready"
+    elif mode == "background":
+        # Correctness guards, not just speed: serve nothing without them
+        await create_indexes(unique=True)
+        index_status = "pending"
+        _index_task = asyncio.create_task(_create_indexes_in_background())
+    else:
+        index_status = "skipped"
 
 # Close database connection
 async def close_database():
+    global _index_task
+    if _index_task is not None:
+        _index_task.cancel()
+        _index_task = None
     if client:
         client.close()
@@ -1,43 +1,79 @@
+import hmac
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.config import settings
 from app.core.security import verify_token
-from app.models.user import User, UserRole
-from app.schemas.user import TokenData
+from app.core.principal import Principal, principal_cache
+from app.models.user import User, UserRole, UserStatus
 
 security = HTTPBearer()
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user."""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+async def principal_from_token(token: str) -> Principal:
+    """Resolve a bearer token to its principal, cached by email."""
+    credentials_exception = _credentials_exception()
+    
+    email = await verify_token(token, credentials_exception)
+    
+    principal = await principal_cache.get(email)
+    if principal is None:
+        user = await User.find_one(User.email == email)
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        await principal_cache.set(principal)
+    
+    return principal
+
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Principal:
+    """Get authorization data for the current user, cached by email."""
+    return await principal_from_token(credentials.credentials)
+
+async def get_current_active_principal(
+    principal: Principal = Depends(get_current_principal)
+) -> Principal:
+    """Get current active principal."""
+    if principal.status != UserStatus.ACTIVE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
+    return principal
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> User:
+    """Get current authenticated user."""
+    credentials_exception = _credentials_exception()
     
     token = credentials.credentials
-    email = verify_token(token, credentials_exception)
+    email = await verify_token(token, credentials_exception)
     
-    user = db.query(User).filter(User.email == email).first()
+    user = await User.find_one(User.email == email)
     if user is None:
         raise credentials_exception
     
     return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """Get current active user."""
-    if current_user.status != "active":
+    if current_user.status != UserStatus.ACTIVE:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Inactive user"
         )
     return current_user
 
-def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+async def get_current_admin_user(current_user: Principal = Depends(get_current_active_principal)) -> Principal:
     """Get current admin user."""
     if current_user.role not in [UserRole.ADMIN, UserRole.SUPER_ADMIN]:
         raise HTTPException(
@@ -46,7 +82,7 @@ def get_current_admin_user(current_user: User = Depends(get_current_active_user)
         )
     return current_user
 
-def get_current_super_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+async def get_current_super_admin_user(current_user: Principal = Depends(get_current_active_principal)) -> Principal:
     """Get current super admin user."""
     if current_user.role != UserRole.SUPER_ADMIN:
         raise HTTPException(
@@ -54,3 +90,18 @@ def get_current_super_admin_user(current_user: User = Depends(get_current_active
             detail="Super admin access required"
         )
     return current_user
+
+async def require_metrics_access(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> None:
+    """Allow the scraper's `METRICS_TOKEN` or an active admin's token."""
+    token = credentials.credentials
+    if settings.METRICS_TOKEN and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        return
+    
+    principal = await principal_from_token(token)
+    if principal.status != UserStatus.ACTIVE or principal.role not in [UserRole.ADMIN, UserRole.SUPER_ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
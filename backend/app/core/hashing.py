@@ -0,0 +1,127 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+from app.core.security import pwd_context
+
+# Latency buckets in seconds for hash/verify timings
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HASH_DURATION = REGISTRY.histogram(
+    "password_hash_duration_seconds", "bcrypt calls including time queued for a worker.", ("operation",),
+    buckets=LATENCY_BUCKETS,
+)
+HASH_QUEUE_WAIT = REGISTRY.histogram(
+    "password_hash_queue_wait_seconds", "Time bcrypt calls wait for a free pool process.",
+    buckets=(0.001, 0.005, 0.01, 0.05, *LATENCY_BUCKETS),
+)
+
+def _timed(func, submitted: float, *args):
+    """Run `func` in a pool worker, returning (seconds it waited for the worker, result)."""
+    return time.time() - submitted, func(*args)
+
+def _hash_password(password: str) -> str:
+    """Hash a password inside a pool worker."""
+    return pwd_context.hash(password)
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password inside a pool worker."""
+    return pwd_context.verify(plain_password, hashed_password)
+
+class PasswordService:
+    """Runs bcrypt in a bounded process pool with an admission queue.
+
+    At most `workers` hashes run at once and at most `queue_size` more
+    wait for a worker. Anything beyond that is rejected with 503 so a
+    login storm sheds load instead of piling up behind the pool.
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_size: int = 64, retry_after: int = 1):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        """Create the worker pool."""
+        if self._executor is None:
+            # Never fork: by now Motor and the executors have threads running,
+            # and a forked child can inherit one of their locks held
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def shutdown(self):
+        """Stop the worker pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls waiting for a free worker."""
+        return max(0, self._pending - self.workers)
+
+    async def _run(self, operation: str, func, *args):
+        if self._pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, please retry",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        
+        self.start()
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            # Wall clock, the only one shared with the worker process
+            waited, result = await loop.run_in_executor(self._executor, _timed, func, time.time(), *args)
+            HASH_QUEUE_WAIT.observe(max(0.0, waited))
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+            return result
+        finally:
+            self._pending -= 1
+            HASH_DURATION.observe(time.perf_counter() - started, operation=operation)
+
+    async def hash(self, password: str) -> str:
+        """Generate password hash."""
+        return await self._run("hash", _hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash."""
+        return await self._run("verify", _verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        """Pool metrics: queue depth, failures and rejections."""
+        return {
+            "workers": self.workers,
+            "in_flight": self._pending,
+            "queue_depth": self.queue_depth,
+            "queue_size": self.queue_size,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+password_service = PasswordService(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER,
+)
@@ -0,0 +1,77 @@
+"""
+Liveness and readiness checks.
+
+Liveness only says the event loop is answering. Readiness pings Mongo
+and, when enabled, Redis, each under a timeout, and is cached for
+`HEALTH_CHECK_TTL_SECONDS` with concurrent probes sharing one check, so
+a load balancer probing every worker often never adds database load.
+Failures are cached too: a database that is down is asked again after
+the TTL, not on every probe.
+
+Unique indexes are created before the app starts serving, since wallet
+idempotency, webhook dedup and registration depend on them. Secondary
+indexes are built after startup; their progress is reported but does
+not gate readiness, queries work without them, only slower.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from app.core import database
+from app.core.config import settings
+from app.core.redis import get_redis
+
+class HealthChecker:
+    def __init__(self, ttl: float = 2.0, timeout: float = 1.0):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._result: Optional[dict] = None
+        self._expires = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def _probe(self, ping) -> dict:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(ping(), self.timeout)
+        except asyncio.TimeoutError:
+            return {"ok": False, "error": f"timed out after {self.timeout}s"}
+        except Exception as exc:
+            return {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+    
+    async def _check(self) -> dict:
+        async def ping_mongo():
+            if database.client is None:
+                raise RuntimeError("not connected")
+            await database.client.admin.command("ping")
+        
+        redis = get_redis()
+        if redis is None:
+            mongodb = await self._probe(ping_mongo)
+            checks = {"mongodb": mongodb}
+        else:
+            mongodb, redis_result = await asyncio.gather(self._probe(ping_mongo), self._probe(redis.ping))
+            checks = {"mongodb": mongodb, "redis": redis_result}
+        
+        return {
+            "ready": all(check["ok"] for check in checks.values()),
+            "checks": checks,
+            "indexes": database.index_status,
+        }
+    
+    async def ready(self) -> dict:
+        """Cached readiness: `ready`, per dependency `checks` and `indexes`."""
+        if self._result is not None and self._expires > time.monotonic():
+            return self._result
+        
+        async with self._lock:
+            if self._result is None or self._expires <= time.monotonic():
+                self._result = await self._check()
+                self._expires = time.monotonic() + self.ttl
+        return self._result
+
+health_checker = HealthChecker(
+    ttl=settings.HEALTH_CHECK_TTL_SECONDS,
+    timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,206 @@
+"""
+Prometheus metrics without a client library.
+
+Counters and histograms live in a process-wide `REGISTRY` and are
+updated from the event loop and from driver threads (the Mongo command
+and pool listeners), so updates take a lock. Services that already keep
+their own counters expose them through `register_stats`: their
+`stats()` dict is read at scrape time and every numeric value becomes a
+gauge.
+
+`/metrics` is per worker process; Prometheus scrapes each worker or
+sums across them.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import anyio.to_thread
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket..., +Inf count], sum
+        self._values: Dict[tuple, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+        self._stats: List[Tuple[str, Callable[[], dict]]] = []
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+    
+    def register_stats(self, component: str, stats: Callable[[], dict]):
+        """Expose a service's `stats()` as `<component>_<key>` gauges."""
+        self._stats.append((component, stats))
+    
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for component, stats in self._stats:
+            for key, value in stats().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{component}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"),
+)
+HTTP_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to the last response byte, by route template.", ("method", "route"),
+)
+MONGO_COMMANDS = REGISTRY.counter(
+    "mongodb_commands_total", "MongoDB commands by name and outcome.", ("command", "status"),
+)
+MONGO_DURATION = REGISTRY.histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round trips, as seen by the driver.", ("command",),
+    buckets=FAST_BUCKETS,
+)
+MONGO_POOL_WAIT = REGISTRY.histogram(
+    "mongodb_pool_wait_seconds", "Time to check a connection out of the driver's pool.",
+    buckets=FAST_BUCKETS,
+)
+MONGO_POOL_CHECKOUT_FAILURES = REGISTRY.counter(
+    "mongodb_pool_checkout_failures_total", "Connection check-outs that failed, by reason.", ("reason",),
+)
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts and latency per route.
+    
+    Requests are labelled with the matched route's path template, so
+    `/users/{user_id}` is one series however many users there are.
+    Anything that matched no route, including requests rejected before
+    routing, is labelled `unmatched`.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(method=scope["method"], route=template, status=status_code)
+            HTTP_DURATION.observe(time.perf_counter() - started, method=scope["method"], route=template)
+
+def threadpool_stats() -> dict:
+    """Starlette's worker threads, where sync routes and dependencies run.
+    
+    `run_in_threadpool` borrows a token from AnyIO's default capacity
+    limiter for each call; `waiting` calls are queued for one. Read on
+    the event loop at scrape time.
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {
+        "total": limiter.total_tokens,
+        "borrowed": limiter.borrowed_tokens,
+        "waiting": limiter.statistics().tasks_waiting,
+    }
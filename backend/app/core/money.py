@@ -0,0 +1,12 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Balances and ledger amounts are stored as integer minor units (cents)
+MINOR_UNITS = 100
+
+def to_minor(amount: float) -> int:
+    """Convert a decimal amount to integer minor units."""
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+def from_minor(amount: int) -> float:
+    """Convert integer minor units to a decimal amount."""
+    return amount / MINOR_UNITS
@@ -0,0 +1,73 @@
+import base64
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import json_util
+from fastapi import HTTPException, status
+
+# Sort spec as (field, direction) pairs, last one must be unique (_id)
+SortSpec = List[Tuple[str, int]]
+
+# Filtered counts are cached per worker for this long
+COUNT_CACHE_TTL_SECONDS = 60
+
+_counts: Dict[tuple, Tuple[int, float]] = {}
+
+# Cursor datetimes round-trip as naive UTC, like documents read from Mongo
+CURSOR_JSON_OPTIONS = json_util.JSONOptions(tz_aware=False)
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    """Encode the sort key of the last returned item as an opaque cursor."""
+    return base64.urlsafe_b64encode(json_util.dumps(values, json_options=CURSOR_JSON_OPTIONS).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: SortSpec) -> Dict[str, Any]:
+    """Decode a cursor produced by `encode_cursor` for the given sort."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode()), json_options=CURSOR_JSON_OPTIONS)
+        if not isinstance(values, dict) or any(field not in values for field, _ in sort):
+            raise ValueError(cursor)
+        return values
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def keyset_filter(cursor: Dict[str, Any], sort: SortSpec) -> dict:
+    """Build the filter for items strictly after the cursor in sort order.
+
+    For sort [(a, -1), (_id, -1)] this is
+    {a < ca} OR {a == ca AND _id < c_id}, which an index on (a, _id) serves
+    without skipping over earlier pages.
+    """
+    branches = []
+    for position, (field, direction) in enumerate(sort):
+        branch = {prefix: cursor[prefix] for prefix, _ in sort[:position]}
+        branch[field] = {"$gt" if direction > 0 else "$lt": cursor[field]}
+        branches.append(branch)
+    return branches[0] if len(branches) == 1 else {"$or": branches}
+
+def page_cursor(items: List[dict], sort: SortSpec, limit: int) -> Optional[str]:
+    """Cursor for the page after `items`, or None on the last page.
+
+    `items` is the result of a query with `limit + 1`.
+    """
+    if len(items) <= limit:
+        return None
+    last = items[limit - 1]
+    return encode_cursor({field: last[field] for field, _ in sort})
+
+async def cached_count(collection, query: dict) -> int:
+    """Total for a listing: estimated when unfiltered, otherwise cached."""
+    if not query:
+        return await collection.estimated_document_count()
+    
+    key = (collection.name, json_util.dumps(query, sort_keys=True))
+    entry = _counts.get(key)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0]
+    
+    total = await collection.count_documents(query)
+    _counts[key] = (total, time.monotonic() + COUNT_CACHE_TTL_SECONDS)
+    return total
@@ -0,0 +1,178 @@
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+
+from beanie import PydanticObjectId
+from pydantic import BaseModel
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis import get_redis, publish, subscribe
+from app.models.user import User, UserRole, UserStatus
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = "principal:invalidate"
+
+# KEYS[1] principal, KEYS[2] its floor; ARGV principal json, version, ttl
+# Versions are fixed-width ISO strings, so they compare as text
+SET_IF_CURRENT_LUA = """
+local floor = redis.call('GET', KEYS[2])
+if floor and ARGV[2] < floor then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+return 1
+"""
+
+def _version(value: Optional[datetime]) -> str:
+    # Mongo keeps milliseconds, so a freshly loaded user matches the floor
+    if value is None:
+        return ""
+    return value.replace(microsecond=value.microsecond // 1000 * 1000).isoformat(timespec="microseconds")
+
+class Principal(BaseModel):
+    """The slice of a user needed for authorization checks."""
+    id: PydanticObjectId
+    email: str
+    role: UserRole
+    status: UserStatus
+    version: str = ""  # The user's updated_at when loaded
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            role=user.role,
+            status=user.status,
+            version=_version(user.updated_at),
+        )
+
+class PrincipalCache:
+    """In-process LRU of principals by email, backed by Redis when enabled.
+
+    Writes to a user's email, role or status call `invalidate`, which
+    drops the local entry and tells every other worker to do the same
+    over Redis pub/sub. With `REDIS_ENABLED` off (the default) the
+    message only reaches the local worker, so other workers serve the
+    old principal for up to `ttl` seconds. Balances are deliberately not
+    part of a principal; they change too often to cache.
+
+    A request that loaded the user before the write can finish after the
+    invalidation. Each principal therefore carries the user's
+    `updated_at`. `invalidate` records the written version as a floor
+    for `ttl` seconds, and `set` refuses principals older than the floor.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: int = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._floors: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._script = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(email: str) -> str:
+        return f"principal:{email}"
+
+    @staticmethod
+    def _floor_key(email: str) -> str:
+        return f"principal:{email}:floor"
+
+    async def get(self, email: str) -> Optional[Principal]:
+        """Get cached principal from memory, then Redis."""
+        entry = self._entries.get(email)
+        if entry is not None and entry[1] > time.monotonic():
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return entry[0]
+        
+        redis = get_redis()
+        if redis is not None:
+            try:
+                data = await redis.get(self._key(email))
+            except RedisError:
+                data = None
+            if data:
+                principal = Principal.model_validate_json(data)
+                self._store(principal)
+                self.hits += 1
+                return principal
+        
+        self.misses += 1
+        return None
+
+    async def set(self, principal: Principal):
+        """Cache principal locally and in Redis, unless a newer version was written."""
+        if principal.version < self._floor(principal.email):
+            return
+        self._store(principal)
+        redis = get_redis()
+        if redis is not None:
+            if self._script is None:
+                self._script = redis.register_script(SET_IF_CURRENT_LUA)
+            try:
+                await self._script(
+                    keys=[self._key(principal.email), self._floor_key(principal.email)],
+                    args=[principal.model_dump_json(), principal.version, self.ttl],
+                )
+            except RedisError:
+                logger.warning("Could not cache principal in Redis")
+
+    async def invalidate(self, email: str, version: Optional[datetime] = None):
+        """Drop a principal everywhere after the user changed.
+
+        `version` is the `updated_at` the write stored, now if the user
+        is gone; principals loaded before it are not cached again.
+        """
+        floor = _version(version or datetime.utcnow())
+        self._raise_floor(email, floor)
+        self.evict_local(email)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                async with redis.pipeline(transaction=True) as pipe:
+                    pipe.set(self._floor_key(email), floor, ex=self.ttl)
+                    pipe.delete(self._key(email))
+                    await pipe.execute()
+            except RedisError:
+                logger.warning("Could not drop principal from Redis")
+        await publish(INVALIDATE_CHANNEL, f"{email} {floor}")
+
+    def evict_local(self, message: str):
+        email, _, floor = message.partition(" ")
+        if floor:
+            self._raise_floor(email, floor)
+        self._entries.pop(email, None)
+
+    def _floor(self, email: str) -> str:
+        entry = self._floors.get(email)
+        if entry is None or entry[1] <= time.monotonic():
+            return ""
+        return entry[0]
+
+    def _raise_floor(self, email: str, floor: str):
+        self._floors[email] = (max(floor, self._floor(email)), time.monotonic() + self.ttl)
+        self._floors.move_to_end(email)
+        while len(self._floors) > self.maxsize:
+            self._floors.popitem(last=False)
+
+    def _store(self, principal: Principal):
+        self._entries[principal.email] = (principal, time.monotonic() + self.ttl)
+        self._entries.move_to_end(principal.email)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
+subscribe(INVALIDATE_CHANNEL, principal_cache.evict_local)
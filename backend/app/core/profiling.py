@@ -0,0 +1,132 @@
+"""
+On-demand sampling profiler for single requests.
+
+An admin adds `?__profile=1` to any request. While that request runs, a
+background thread reads the event loop thread's stack every
+`PROFILE_SAMPLE_INTERVAL_MS` and counts identical stacks. The response
+is replaced by the counts in collapsed format, one `frame;frame;frame
+count` line per stack, which `flamegraph.pl` and speedscope read as is:
+    
+    curl -H "Authorization: Bearer $TOKEN" "$API/api/v1/bets/?__profile=1" > bets.folded
+    flamegraph.pl bets.folded > bets.svg
+
+The sampler sees the whole loop thread, so other requests running on
+the same worker at the same time show up too; profile on a quiet worker.
+Stacks ending in the selector are the loop idling while the request
+waits on I/O.
+"""
+
+import sys
+import threading
+from collections import Counter
+from typing import Optional
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.deps import principal_from_token
+from app.models.user import UserRole, UserStatus
+
+PROFILE_PARAM = "__profile"
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}"
+
+class StackSampler:
+    """Counts the stacks one thread is in, sampled from a daemon thread."""
+    
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+    
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def _wants_profile(scope) -> bool:
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get(PROFILE_PARAM, ["0"])[0] not in ("", "0", "false")
+
+def _bearer(scope) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+    return None
+
+async def _is_admin(token: str) -> bool:
+    try:
+        principal = await principal_from_token(token)
+    except HTTPException:
+        return False
+    return principal.status == UserStatus.ACTIVE and principal.role in (UserRole.ADMIN, UserRole.SUPER_ADMIN)
+
+class ProfilerMiddleware:
+    """ASGI middleware returning a stack profile instead of the response for `?__profile=1`.
+    
+    Requests from anyone but an active admin run normally, as if the
+    parameter were not there.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        token = _bearer(scope)
+        if token is None or not await _is_admin(token):
+            await self.app(scope, receive, send)
+            return
+        
+        status_code = 500
+        
+        async def capture(message):
+            # The real response is dropped, only its status is reported
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+        
+        sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        sampler.start()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            sampler.stop()
+        
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"x-profile-samples", str(sampler.samples).encode()),
+                (b"x-profile-status", str(status_code).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": sampler.collapsed().encode()})
@@ -0,0 +1,294 @@
+"""
+Token-bucket rate limiting as pure ASGI middleware.
+
+Policies are configured per route as `"<METHOD> <path>"` keys (or `"*"`
+for everything else) mapping to comma-separated limits such as
+`"ip:10/60,account:5/300"`: at most 10 requests per 60 seconds per
+client IP and 5 per 300 seconds per account. Account limits use the
+email/username from the request body, so they only apply to the auth
+routes that carry one. IP buckets are per route, but an account has one
+bucket shared by every route, so guesses spread over `/auth/login` and
+`/auth/token` drain the same tokens; give those routes the same account
+limit.
+
+Each request first hits a per-worker bucket with the same limits. A
+worker only sees part of the traffic, so its bucket running dry means
+the shared one is dry too, and the request is rejected without leaving
+the process. Otherwise the shared bucket in Redis decides, updated
+atomically by a Lua script. Without Redis, or when it fails, the
+per-worker buckets are all there is.
+
+Rejections are written straight to the ASGI `send` callable, before
+routing, body validation or password hashing.
+"""
+
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Request bodies are only read for account limits, and only up to this size
+MAX_ACCOUNT_BODY = 16 * 1024
+
+# KEYS[1] bucket; ARGV capacity, refill per ms, cost
+# Returns {allowed, tokens left, ms until the next token}
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = time[1] * 1000 + math.floor(time[2] / 1000)
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate))
+
+local wait = 0
+if allowed == 0 then
+    wait = math.ceil((cost - tokens) / rate)
+end
+return {allowed, math.floor(tokens), wait}
+"""
+
+class Limit(NamedTuple):
+    scope: str  # "ip" or "account"
+    capacity: int
+    period: float  # Seconds to refill the whole bucket
+    
+    @property
+    def rate(self) -> float:
+        """Tokens per second."""
+        return self.capacity / self.period
+
+def parse_limits(spec: str) -> List[Limit]:
+    """Parse `"ip:10/60,account:5/300"` into limits."""
+    limits = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        scope, _, rate = item.partition(":")
+        count, _, period = rate.partition("/")
+        if scope not in ("ip", "account"):
+            raise ValueError(f"Unknown rate limit scope {scope!r}")
+        limits.append(Limit(scope, int(count), float(period)))
+    return limits
+
+class LocalBuckets:
+    """Per-worker token buckets, least recently used ones dropped first."""
+    
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+    
+    def take(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        """Take a token, returning (allowed, seconds until one is available)."""
+        now = time.monotonic()
+        tokens, stamp = self._buckets.pop(key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - stamp) * limit.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / limit.rate
+    
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+def _client_ip(scope: dict, trusted_proxies: int) -> str:
+    """Client address as seen by the outermost trusted proxy.
+
+    Each proxy appends the address it got the request from, so the entry
+    `trusted_proxies` from the right is the last one not written by the
+    client itself.
+    """
+    if trusted_proxies:
+        entries = [
+            entry.strip()
+            for name, value in scope.get("headers", ()) if name == b"x-forwarded-for"
+            for entry in value.decode("latin-1").split(",") if entry.strip()
+        ]
+        if len(entries) >= trusted_proxies:
+            return entries[-trusted_proxies]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+def _account(body: bytes, content_type: str) -> Optional[str]:
+    try:
+        if content_type.startswith("application/json"):
+            data = json.loads(body)
+            value = data.get("email") or data.get("username") if isinstance(data, dict) else None
+        else:
+            form = parse_qs(body.decode("utf-8", "replace"))
+            value = (form.get("username") or form.get("email") or [None])[0]
+    except ValueError:
+        return None
+    return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+def _bucket(policy: str, limit: Limit, identity: str) -> str:
+    if limit.scope == "account":
+        return f"rl:account:{identity}"
+    return f"rl:{policy}:{limit.scope}:{identity}"
+
+class RateLimiter:
+    """Per-route token-bucket limits keyed by client IP and account."""
+    
+    def __init__(self, policies: Dict[str, str], trusted_proxies: int = 0, local_max_keys: int = 100000):
+        self.policies = {route: parse_limits(spec) for route, spec in policies.items()}
+        self.default = self.policies.pop("*", [])
+        self.trusted_proxies = trusted_proxies
+        self.local = LocalBuckets(local_max_keys)
+        self._script = None
+        self.allowed = 0
+        self.rejected_local = 0
+        self.rejected_shared = 0
+    
+    def policy_for(self, method: str, path: str) -> Tuple[str, List[Limit]]:
+        """Policy name and limits for a request, the default policy being `*`."""
+        route = f"{method} {path}"
+        if route in self.policies:
+            return route, self.policies[route]
+        return "*", self.default
+    
+    async def check(self, policy: str, limits: List[Limit], identity: str) -> Optional[float]:
+        """None if every bucket allows the request, else seconds to wait."""
+        checks = [(_bucket(policy, limit, identity), limit) for limit in limits]
+        wait = 0.0
+        for key, limit in checks:
+            allowed, retry_after = self.local.take(key, limit)
+            if not allowed:
+                wait = max(wait, retry_after)
+        if wait:
+            self.rejected_local += 1
+            return wait
+        
+        redis = get_redis()
+        if redis is None:
+            return None
+        if self._script is None:
+            self._script = redis.register_script(TOKEN_BUCKET_LUA)
+        try:
+            for key, limit in checks:
+                allowed, _, wait_ms = await self._script(keys=[key], args=[limit.capacity, limit.rate / 1000, 1])
+                if not allowed:
+                    wait = max(wait, wait_ms / 1000)
+        except RedisError:
+            logger.warning("Redis unavailable for rate limiting, using per-worker limits only")
+            return None
+        if wait:
+            self.rejected_shared += 1
+            return wait
+        return None
+    
+    def stats(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "rejected_local": self.rejected_local,
+            "rejected_shared": self.rejected_shared,
+            "local_buckets": len(self.local),
+        }
+
+class RateLimitMiddleware:
+    """ASGI middleware enforcing a `RateLimiter` before the app sees the request."""
+    
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        policy, limits = self.limiter.policy_for(scope["method"], scope["path"])
+        if not limits:
+            await self.app(scope, receive, send)
+            return
+        
+        # IP limits first, so a flood is turned away before its body is read
+        ip_limits = [limit for limit in limits if limit.scope == "ip"]
+        if ip_limits:
+            retry_after = await self.limiter.check(policy, ip_limits, _client_ip(scope, self.limiter.trusted_proxies))
+            if retry_after is not None:
+                await _reject(send, retry_after)
+                return
+        
+        account_limits = [limit for limit in limits if limit.scope == "account"]
+        if account_limits:
+            body, receive = await _buffer(receive)
+            content_type = next(
+                (value.decode("latin-1") for name, value in scope.get("headers", ()) if name == b"content-type"), "",
+            )
+            account = _account(body, content_type)
+            if account:
+                retry_after = await self.limiter.check(policy, account_limits, account)
+                if retry_after is not None:
+                    await _reject(send, retry_after)
+                    return
+        
+        self.limiter.allowed += 1
+        await self.app(scope, receive, send)
+
+async def _buffer(receive):
+    """Read the request body and return it with a receive that replays it."""
+    chunks = []
+    size = 0
+    more = True
+    while more:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        size += len(chunks[-1])
+        more = message.get("more_body", False)
+        if size > MAX_ACCOUNT_BODY:
+            break
+    body = b"".join(chunks)
+    replayed = False
+    
+    async def replay():
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": more}
+        return await receive()
+    
+    return body, replay
+
+async def _reject(send, retry_after: float):
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": b'{"detail":"Too many requests"}'})
+
+rate_limiter = RateLimiter(
+    settings.RATE_LIMIT_POLICIES,
+    trusted_proxies=settings.RATE_LIMIT_TRUSTED_PROXIES,
+    local_max_keys=settings.RATE_LIMIT_LOCAL_MAX_KEYS,
+)
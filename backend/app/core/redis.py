@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+from redis import asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Redis client, None when Redis is disabled
+redis_client: Optional[aioredis.Redis] = None
+
+# Local callbacks for pub/sub channels, keyed by channel name
+_subscribers: Dict[str, List[Callable[[str], None]]] = {}
+_listener_task: Optional[asyncio.Task] = None
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """Get Redis client, or None when Redis is not configured."""
+    return redis_client
+
+def subscribe(channel: str, callback: Callable[[str], None]):
+    """Call `callback` with every message published on `channel`."""
+    _subscribers.setdefault(channel, []).append(callback)
+
+async def publish(channel: str, message: str):
+    """Publish a message to every worker, including this one."""
+    if redis_client is None:
+        _dispatch(channel, message)
+        return
+    try:
+        await redis_client.publish(channel, message)
+    except aioredis.RedisError:
+        logger.warning("Redis publish on %s failed, delivering locally", channel)
+        _dispatch(channel, message)
+
+def _dispatch(channel: str, message: str):
+    for callback in _subscribers.get(channel, []):
+        try:
+            callback(message)
+        except Exception:
+            logger.exception("Subscriber for %s failed", channel)
+
+async def _listen():
+    while True:
+        try:
+            pubsub = redis_client.pubsub()
+            await pubsub.subscribe(*_subscribers)
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    _dispatch(message["channel"], message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Redis pub/sub listener failed, reconnecting")
+            await asyncio.sleep(1)
+
+# Initialize Redis
+async def init_redis():
+    global redis_client, _listener_task
+    if not settings.REDIS_ENABLED:
+        return
+    
+    redis_client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    if _subscribers:
+        _listener_task = asyncio.create_task(_listen())
+
+# Close Redis connection
+async def close_redis():
+    global redis_client, _listener_task
+    if _listener_task:
+        _listener_task.cancel()
+        _listener_task = None
+    if redis_client:
+        await redis_client.aclose()
+        redis_client = None
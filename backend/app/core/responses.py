@@ -0,0 +1,39 @@
+from typing import Any
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from app.core.config import settings
+
+def _fallback(value: Any) -> Any:
+    # Raw ObjectIds turn up in documents read straight from Motor
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by pydantic-core in one pass.
+
+    Models go through their compiled serializer straight to bytes; other
+    content through `pydantic_core.to_json`. Both understand datetimes,
+    enums and `ObjectId`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content, fallback=_fallback)
+        return to_json(content, fallback=_fallback)
+
+def fast_response(model: BaseModel, status_code: int = 200):
+    """Return an already validated model without FastAPI validating it again.
+
+    A returned `Response` bypasses `response_model` processing (dump,
+    validate, serialize, `json.dumps`); the route keeps `response_model`
+    for its schema. With `FAST_JSON_RESPONSES` off the model is returned
+    for FastAPI to handle as usual.
+    """
+    if not settings.FAST_JSON_RESPONSES:
+        return model
+    return FastJSONResponse(model, status_code=status_code)
@@ -1,12 +1,32 @@
+import logging
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Optional
 from jose import JWTError, jwt
+from redis.exceptions import RedisError
 from passlib.context import CryptContext
-from fastapi import HTTPException, status
 from app.core.config import settings
+from app.core.metrics import FAST_BUCKETS, REGISTRY
+from app.core.redis import get_redis, publish, subscribe
+from app.core.token_cache import TokenCache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+logger = logging.getLogger(__name__)
+
+# Verified claims, so each token is decoded once per process
+token_cache = TokenCache(maxsize=settings.JWT_CACHE_SIZE)
+
+# Revocations are announced to every worker and kept in Redis until the
+# token expires, so workers started later refuse the token too. Without
+# Redis a logout only reaches the worker that handled it.
+REVOKED_CHANNEL = "tokens:revoked"
+
+JWT_DURATION = REGISTRY.histogram(
+    "jwt_duration_seconds", "JWT signing and verification, cache hits excluded.", ("operation",),
+    buckets=FAST_BUCKETS,
+)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,16 +43,71 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    started = time.perf_counter()
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    JWT_DURATION.observe(time.perf_counter() - started, operation="encode")
     return encoded_jwt
 
-def verify_token(token: str, credentials_exception) -> str:
-    """Verify token and return email."""
+def _revoked_key(key: bytes) -> str:
+    return f"tokens:revoked:{key.hex()}"
+
+async def _is_revoked(token: str) -> bool:
+    if token_cache.is_revoked(token):
+        return True
+    redis = get_redis()
+    if redis is None:
+        return False
+    try:
+        return bool(await redis.exists(_revoked_key(token_cache.digest(token))))
+    except RedisError:
+        logger.warning("Redis unavailable, checking token revocation locally only")
+        return False
+
+async def decode_token(token: str, credentials_exception) -> dict:
+    """Verify token and return its claims."""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+    
+    if await _is_revoked(token):
+        raise credentials_exception
+    
+    started = time.perf_counter()
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        return email
     except JWTError:
         raise credentials_exception
+    finally:
+        JWT_DURATION.observe(time.perf_counter() - started, operation="decode")
+    
+    token_cache.put(token, payload)
+    return payload
+
+async def verify_token(token: str, credentials_exception) -> str:
+    """Verify token and return email."""
+    payload = await decode_token(token, credentials_exception)
+    email: str = payload.get("sub")
+    if email is None:
+        raise credentials_exception
+    return email
+
+async def revoke_token(token: str, credentials_exception):
+    """Revoke token on every worker so it is rejected until it expires."""
+    payload = await decode_token(token, credentials_exception)
+    key = token_cache.digest(token)
+    expires_at = float(payload["exp"])
+    token_cache.revoke(key, expires_at)
+    
+    redis = get_redis()
+    if redis is not None:
+        try:
+            await redis.set(_revoked_key(key), 1, ex=max(1, int(expires_at - time.time()) + 1))
+        except RedisError:
+            logger.warning("Could not store token revocation in Redis")
+    await publish(REVOKED_CHANNEL, f"{key.hex()}:{expires_at}")
+
+def _on_revoked(message: str):
+    key, _, expires_at = message.partition(":")
+    token_cache.revoke(bytes.fromhex(key), float(expires_at))
+
+subscribe(REVOKED_CHANNEL, _on_revoked)
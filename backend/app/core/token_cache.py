@@ -0,0 +1,89 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+class TokenCache:
+    """Bounded LRU of verified JWT claims keyed by token digest.
+
+    Entries live until the token's `exp` claim, so a token pays for the
+    signature check once and later requests only hash it. Revoked tokens
+    are dropped and remembered until they would have expired anyway, at
+    most `maxsize` of them; `security.revoke_token` also shares them
+    through Redis. The cache is per process; every worker verifies a
+    token once.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+        self._revoked: "OrderedDict[bytes, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return cached claims for a still valid token."""
+        key = self.digest(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def put(self, token: str, claims: dict):
+        """Cache verified claims until the token expires."""
+        expires_at = claims.get("exp")
+        if expires_at is None:
+            return
+        
+        key = self.digest(token)
+        self._entries[key] = (claims, float(expires_at))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def is_revoked(self, token: str) -> bool:
+        """Check whether a token was revoked."""
+        return self.digest(token) in self._revoked
+
+    def revoke(self, key: bytes, expires_at: float):
+        """Evict a token by digest and refuse it until it expires."""
+        self._entries.pop(key, None)
+        self._revoked[key] = float(expires_at)
+        self._revoked.move_to_end(key)
+        if len(self._revoked) <= self.maxsize:
+            return
+        
+        # Forget revocations for tokens that have expired on their own,
+        # then the oldest ones, which Redis still knows about when enabled
+        now = time.time()
+        for stale in [k for k, exp in self._revoked.items() if exp <= now]:
+            del self._revoked[stale]
+        while len(self._revoked) > self.maxsize:
+            self._revoked.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached claims."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        return {
+            "size": len(self._entries),
+            "revoked": len(self._revoked),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -1,8 +1,8 @@
-from beanie import Document, Link
+from beanie import Document, PydanticObjectId
 from pydantic import Field
 from datetime import datetime
 from typing import Optional, Dict, Any
-from bson import ObjectId
+from pymongo import IndexModel
 import enum
 
 class BetStatus(str, enum.Enum):
@@ -18,9 +18,9 @@ class BetType(str, enum.Enum):
     SYSTEM = "system"
 
 class Bet(Document):
-    user_id: ObjectId
-    game_id: ObjectId
-    game_session_id: Optional[ObjectId] = None
+    user_id: PydanticObjectId
+    game_id: PydanticObjectId
+    game_session_id: Optional[PydanticObjectId] = None
     bet_amount: float
     potential_payout: float
     actual_payout: float = 0.0
@@ -31,12 +31,19 @@ class Bet(Document):
     result_data: Optional[Dict[str, Any]] = None  # JSON data for bet result
     placed_at: datetime = Field(default_factory=datetime.utcnow)
     settled_at: Optional[datetime] = None
+    settlement_batch: Optional[str] = None  # Set while a settlement batch is in flight
     
     class Settings:
         name = "bets"
         indexes = [
-            "user_id",
-            "game_id",
-            "status",
-            "placed_at",
+            # A user's bets by time
+            IndexModel([("user_id", 1), ("placed_at", -1)], name="user_placed_at"),
+            IndexModel([("game_id", 1), ("placed_at", -1)], name="game_placed_at"),
+            IndexModel([("game_session_id", 1), ("status", 1)], name="session_status"),
+            # Settlement cursor: pending bets of a session in _id order
+            IndexModel(
+                [("game_session_id", 1), ("_id", 1)],
+                name="session_pending",
+                partialFilterExpression={"status": BetStatus.PENDING.value},
+            ),
         ]
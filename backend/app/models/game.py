@@ -1,7 +1,7 @@
-from beanie import Document
+from beanie import Document, PydanticObjectId
 from pydantic import Field
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import enum
 
 class GameStatus(str, enum.Enum):
@@ -22,6 +22,7 @@ class Game(Document):
     min_bet: float = 1.0
     max_bet: float = 10000.0
     house_edge: float = 2.0 # percentage
+    odds: Dict[str, float] = {}  # Decimal odds by selection or bet type, "*" for any
     status: GameStatus = GameStatus.ACTIVE
     is_featured: bool = False
     image_url: Optional[str] = None
@@ -37,12 +38,18 @@ class Game(Document):
         ]
 
 class GameSession(Document):
-    game_id: str
-    session_data: Optional[Dict[str, Any]] = None # JSON data for game state
+    game_id: PydanticObjectId
+    session_data: Optional[Dict[str, Any]] = None # JSON data for game state, "odds" overrides the game's
     started_at: datetime = Field(default_factory=datetime.utcnow)
     ended_at: Optional[datetime] = None
-    total_bets: float = 0.0
+    bet_count: int = 0
+    total_bets: float = 0.0  # Staked
+    total_liability: float = 0.0  # Sum of potential payouts
     total_payouts: float = 0.0
+    outcomes: Dict[str, Dict[str, float]] = {}  # bets, staked and liability per selection
+    settled_at: Optional[datetime] = None
+    reconciled_at: Optional[datetime] = None  # When the totals were last recomputed from the bets
+    settled_batches: List[str] = []  # Settlement batches already added to the totals
 
     class Settings:
         name = "game_sessions"
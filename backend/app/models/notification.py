@@ -1,8 +1,8 @@
-from beanie import Document
+from beanie import Document, PydanticObjectId
 from pydantic import Field
 from datetime import datetime
-from typing import Optional, Dict, Any
-from bson import ObjectId
+from typing import Optional, Dict, Any, List
+from pymongo import IndexModel
 import enum
 
 class NotificationType(str, enum.Enum):
@@ -20,12 +20,13 @@ class NotificationStatus(str, enum.Enum):
     ARCHIVED = "archived"
 
 class Notification(Document):
-    user_id: ObjectId
+    user_id: PydanticObjectId
     title: str
     message: str
     notification_type: NotificationType
     status: NotificationStatus = NotificationStatus.UNREAD
     is_push_sent: bool = False
+    push_claim: Optional[str] = None  # Set with is_push_sent by the worker that pushes it
     is_email_sent: bool = False
     metadata: Optional[Dict[str, Any]] = None  # JSON data for additional info
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -34,8 +35,45 @@ class Notification(Document):
     class Settings:
         name = "notifications"
         indexes = [
-            "user_id",
-            "notification_type",
-            "status",
+            # Inbox pages, newest first
+            IndexModel([("user_id", 1), ("created_at", -1), ("_id", -1)], name="user_inbox"),
+            # Mark-all-read and unread recounts
+            IndexModel(
+                [("user_id", 1)],
+                name="user_unread",
+                partialFilterExpression={"status": NotificationStatus.UNREAD.value},
+            ),
+        ]
+
+class BroadcastNotification(Document):
+    """A notification for every user, stored once."""
+    title: str
+    message: str
+    notification_type: NotificationType
+    metadata: Optional[Dict[str, Any]] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: Optional[datetime] = None
+    
+    class Settings:
+        name = "broadcast_notifications"
+        indexes = [
             "created_at",
         ]
+
+class NotificationReadState(Document):
+    """Per-user notification state.
+    
+    Broadcasts created at or before `broadcast_watermark` are read; newer
+    ones are read if their id is in `read_broadcast_ids`. `unread_count`
+    is the maintained number of unread personal notifications.
+    """
+    user_id: PydanticObjectId
+    unread_count: int = 0
+    broadcast_watermark: datetime = datetime(1970, 1, 1)
+    read_broadcast_ids: List[PydanticObjectId] = []
+    
+    class Settings:
+        name = "notification_read_state"
+        indexes = [
+            IndexModel("user_id", name="user_id_1", unique=True),
+        ]
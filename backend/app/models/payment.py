@@ -0,0 +1,38 @@
+from beanie import Document
+from pydantic import Field
+from datetime import datetime
+from typing import Optional, Dict, Any
+from pymongo import IndexModel
+import enum
+
+class PaymentEventStatus(str, enum.Enum):
+    RECEIVED = "received"
+    PROCESSING = "processing"
+    PROCESSED = "processed"
+    FAILED = "failed"
+
+class PaymentEvent(Document):
+    """A payment gateway webhook event, stored once per gateway event id."""
+    event_id: str
+    event_type: str
+    payload: Dict[str, Any]
+    status: PaymentEventStatus = PaymentEventStatus.RECEIVED
+    attempts: int = 0
+    last_error: Optional[str] = None
+    received_at: datetime = Field(default_factory=datetime.utcnow)
+    claimed_at: Optional[datetime] = None
+    processed_at: Optional[datetime] = None
+
+    class Settings:
+        name = "payment_events"
+        indexes = [
+            IndexModel("event_id", name="event_id_unique", unique=True),
+            # Recovery sweep over events not processed yet
+            IndexModel(
+                [("received_at", 1)],
+                name="unprocessed_received_at",
+                partialFilterExpression={"status": {"$in": [
+                    PaymentEventStatus.RECEIVED.value, PaymentEventStatus.PROCESSING.value,
+                ]}},
+            ),
+        ]
@@ -0,0 +1,37 @@
+from beanie import Document, PydanticObjectId
+from datetime import datetime
+from typing import Dict, List
+from pymongo import IndexModel
+
+class UserDailyStats(Document):
+    """Settled betting totals for one user on one UTC day, in minor units."""
+    user_id: PydanticObjectId
+    day: datetime  # Midnight UTC
+    bets: int = 0
+    wins: int = 0
+    wagered: int = 0
+    won: int = 0
+    games: Dict[str, Dict[str, int]] = {}  # Same counters per game id
+    applied: List[str] = []  # Settlement batches already counted
+
+    class Settings:
+        name = "user_daily_stats"
+        indexes = [
+            IndexModel([("user_id", 1), ("day", -1)], name="user_day", unique=True),
+        ]
+
+class GameHourlyStats(Document):
+    """Settled betting totals for one game in one UTC hour, in minor units."""
+    game_id: PydanticObjectId
+    hour: datetime
+    bets: int = 0
+    wins: int = 0
+    wagered: int = 0
+    won: int = 0
+    applied: List[str] = []
+
+    class Settings:
+        name = "game_hourly_stats"
+        indexes = [
+            IndexModel([("game_id", 1), ("hour", -1)], name="game_hour", unique=True),
+        ]
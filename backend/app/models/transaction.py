@@ -1,8 +1,8 @@
-from beanie import Document, Indexed
+from beanie import Document, PydanticObjectId
 from pydantic import Field
 from datetime import datetime
 from typing import Optional, Dict, Any
-from bson import ObjectId
+from pymongo import IndexModel
 import enum
 
 class TransactionType(str, enum.Enum):
@@ -13,6 +13,7 @@ class TransactionType(str, enum.Enum):
     BET_REFUND = "bet_refund"
     BONUS = "bonus"
     COMMISSION = "commission"
+    ADJUSTMENT = "adjustment"
 
 class TransactionStatus(str, enum.Enum):
     PENDING = "pending"
@@ -28,16 +29,18 @@ class PaymentMethod(str, enum.Enum):
     WALLET = "wallet"
 
 class Transaction(Document):
-    user_id: ObjectId
+    user_id: PydanticObjectId
     transaction_type: TransactionType
-    amount: float
-    balance_before: float
-    balance_after: float
+    amount: int  # Minor units
+    balance_before: Optional[int] = None  # Minor units, set once completed
+    balance_after: Optional[int] = None
     payment_method: Optional[PaymentMethod] = None
     status: TransactionStatus = TransactionStatus.PENDING
     description: Optional[str] = None
-    reference_id: Indexed(Optional[str], unique=True) = None  # External payment reference
+    reference_id: Optional[str] = None  # Idempotency key or external payment reference
     payment_gateway_response: Optional[Dict[str, Any]] = None  # JSON response from payment gateway
+    details: Optional[Dict[str, Any]] = None  # What the operation covers, e.g. the stake per bet id
+    failure_reason: Optional[str] = None  # Why a FAILED operation failed, returned again on replay
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
     processed_at: Optional[datetime] = None
@@ -45,9 +48,18 @@ class Transaction(Document):
     class Settings:
         name = "transactions"
         indexes = [
-            "user_id",
-            "transaction_type",
-            "status",
-            "created_at",
-            "reference_id",
+            # A user's transactions, all or by type, newest first
+            IndexModel([("user_id", 1), ("created_at", -1)], name="user_created_at"),
+            IndexModel(
+                [("user_id", 1), ("transaction_type", 1), ("created_at", -1)],
+                name="user_type_created_at",
+            ),
+            # Orphaned stake sweep: recent stakes across all users
+            IndexModel([("transaction_type", 1), ("created_at", 1)], name="type_created_at"),
+            IndexModel(
+                "reference_id",
+                name="reference_id_unique",
+                unique=True,
+                partialFilterExpression={"reference_id": {"$type": "string"}},
+            ),
         ]
@@ -1,9 +1,12 @@
-from beanie import Document, Indexed
+from beanie import Document, Insert, Replace, Save, before_event
 from pydantic import EmailStr, Field
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from pymongo import IndexModel, TEXT
 import enum
 
+from app.core.money import from_minor
+
 class UserRole(str, enum.Enum):
     USER = "user"
     ADMIN = "admin"
@@ -14,9 +17,17 @@ class UserStatus(str, enum.Enum):
     INACTIVE = "inactive"
     SUSPENDED = "suspended"
 
+def search_fields(email: str, username: str, first_name: str, last_name: str) -> dict:
+    """Normalized copies of the searchable fields, for prefix search."""
+    return {
+        "email_lower": email.lower(),
+        "username_lower": username.lower(),
+        "name_tokens": f"{first_name} {last_name}".lower().split(),
+    }
+
 class User(Document):
-    email: Indexed(EmailStr, unique=True)
-    username: Indexed(str, unique=True)
+    email: EmailStr
+    username: str
     hashed_password: str
     first_name: str
     last_name: str
@@ -24,14 +35,40 @@ class User(Document):
     role: UserRole = UserRole.USER
     status: UserStatus = UserStatus.ACTIVE
     is_verified: bool = False
-    balance: float = 0.0
+    balance_minor: int = 0  # Balance in minor units, only changed by the wallet service
+    balance_version: int = 0
+    recent_ops: List[Dict[str, Any]] = []  # Recent wallet operation keys with their time, guards against double apply
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
     last_login: Optional[datetime] = None
     
+    # Maintained from the fields above, see search_fields
+    email_lower: Optional[str] = None
+    username_lower: Optional[str] = None
+    name_tokens: List[str] = []
+    
+    @before_event(Insert, Replace, Save)
+    def normalize_search_fields(self):
+        for field, value in search_fields(self.email, self.username, self.first_name, self.last_name).items():
+            setattr(self, field, value)
+    
+    @property
+    def balance(self) -> float:
+        return from_minor(self.balance_minor)
+    
     class Settings:
         name = "users"
         indexes = [
-            "email",
-            "username",
+            # Registration relies on these to reject duplicates
+            IndexModel("email", name="email_1", unique=True),
+            IndexModel("username", name="username_1", unique=True),
+            IndexModel([("created_at", -1), ("_id", -1)], name="created_at_id"),
+            IndexModel("email_lower", name="email_lower"),
+            IndexModel("username_lower", name="username_lower"),
+            IndexModel("name_tokens", name="name_tokens"),
+            IndexModel(
+                [("username", TEXT), ("email", TEXT), ("first_name", TEXT), ("last_name", TEXT)],
+                name="user_text",
+                weights={"username": 5, "email": 5, "first_name": 2, "last_name": 2},
+            ),
         ]
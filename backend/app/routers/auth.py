@@ -1,33 +1,55 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials
 from datetime import datetime
 
-from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.security import create_access_token, revoke_token
+from app.core.deps import security
+from app.core.hashing import password_service
 from app.models.user import User, UserRole, UserStatus
 from app.schemas.user import UserCreate, UserResponse, UserLogin, Token
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+async def _authenticate(email: str, password: str) -> User:
+    """Check credentials and return the active user."""
+    user = await User.find_one(User.email == email)
+    
+    if not user or not await password_service.verify(password, user.hashed_password):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    if user.status != UserStatus.ACTIVE:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Account is not active"
+        )
+    
+    # Update last login
+    await user.set({User.last_login: datetime.utcnow()})
+    
+    return user
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate):
     """Register a new user."""
     # Check if user already exists
-    if db.query(User).filter(User.email == user.email).first():
+    if await User.find_one(User.email == user.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    if db.query(User).filter(User.username == user.username).first():
+    if await User.find_one(User.username == user.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_service.hash(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -39,33 +61,14 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         status=UserStatus.ACTIVE
     )
     
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db_user.insert()
     
     return db_user
 
 @router.post("/login", response_model=Token)
-def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin):
     """Login user and return access token."""
-    user = db.query(User).filter(User.email == user_credentials.email).first()
-    
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    if user.status != UserStatus.ACTIVE:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Account is not active"
-        )
-    
-    # Update last login
-    user.last_login = datetime.utcnow()
-    db.commit()
+    user = await _authenticate(user_credentials.email, user_credentials.password)
     
     # Create access token
     access_token = create_access_token(data={"sub": user.email})
@@ -73,28 +76,22 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """OAuth2 compatible token login."""
-    user = db.query(User).filter(User.email == form_data.username).first()
-    
-    if not user or not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    if user.status != UserStatus.ACTIVE:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Account is not active"
-        )
-    
-    # Update last login
-    user.last_login = datetime.utcnow()
-    db.commit()
+    user = await _authenticate(form_data.username, form_data.password)
     
     # Create access token
     access_token = create_access_token(data={"sub": user.email})
     
     return {"access_token": access_token, "token_type": "bearer"}
+
+@router.post("/logout")
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Revoke the current access token."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    await revoke_token(credentials.credentials, credentials_exception)
+    return {"message": "Logged out successfully"}
@@ -0,0 +1,164 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from beanie import PydanticObjectId
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.deps import get_current_active_principal
+from app.core.money import to_minor
+from app.core.responses import fast_response
+from app.core.principal import Principal
+from app.models.bet import Bet, BetStatus
+from app.models.game import Game, GameStatus
+from app.models.transaction import TransactionType
+from app.schemas.betting import BetCreate, BetBatchCreate, BetResponse, BetList
+from app.services import archive, wallet
+from app.services.bet_writer import bet_writer
+from app.services.games import get_cached_game
+from app.services.session_stats import session_stats
+
+router = APIRouter(prefix="/bets", tags=["Bets"])
+
+def _server_odds(game: Game, session: Optional[dict], bet: BetCreate) -> Optional[float]:
+    """Current odds for a bet, the session's prices first, then the game's."""
+    odds = dict(game.odds)
+    if session:
+        odds.update((session.get("session_data") or {}).get("odds") or {})
+    
+    selection = (bet.bet_data or {}).get("selection")
+    keys = [bet.bet_type.value, "*"]
+    if selection is not None:
+        keys[:0] = [f"{bet.bet_type.value}:{selection}", str(selection)]
+    for key in keys:
+        if key in odds:
+            return odds[key]
+    return None
+
+async def _build_bet(bet: BetCreate, principal: Principal) -> Bet:
+    """Validate a bet against its game and build the document."""
+    game = await get_cached_game(bet.game_id)
+    if not game or game.status != GameStatus.ACTIVE:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Game not found"
+        )
+    
+    if bet.bet_amount < game.min_bet or bet.bet_amount > game.max_bet:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Bet amount must be between {game.min_bet} and {game.max_bet}"
+        )
+    
+    session = None
+    if bet.game_session_id is not None:
+        session = await session_stats.get_session(bet.game_session_id)
+        if not session or session["game_id"] != bet.game_id or session.get("ended_at"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Game session is not open for betting"
+            )
+    
+    # Payouts are priced from the server's odds, the client's only have to agree
+    odds = _server_odds(game, session, bet)
+    if odds is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No odds available for this selection"
+        )
+    if abs(bet.odds - odds) > 1e-9:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Odds have changed to {odds}"
+        )
+    
+    return Bet(
+        id=PydanticObjectId(),
+        user_id=principal.id,
+        game_id=bet.game_id,
+        game_session_id=bet.game_session_id,
+        bet_amount=bet.bet_amount,
+        potential_payout=round(bet.bet_amount * odds, 2),
+        odds=odds,
+        bet_type=bet.bet_type,
+        bet_data=bet.bet_data,
+    )
+
+async def _reserve(principal: Principal, bets: List[Bet], reference_id: str, description: str):
+    """Debit the stakes before the bets are queued.
+    
+    The stake per bet is kept on the transaction so that stakes for bets
+    lost before they were written can be refunded.
+    """
+    stakes = {str(bet.id): to_minor(bet.bet_amount) for bet in bets}
+    try:
+        await wallet.debit(
+            principal.id,
+            sum(stakes.values()),
+            TransactionType.BET_PLACED,
+            reference_id=reference_id,
+            description=description,
+            details={"bets": stakes},
+        )
+    except wallet.InsufficientFundsError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Insufficient balance"
+        )
+    except wallet.AccountNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
+
+@router.get("/", response_model=BetList)
+async def get_bet_history(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    bet_status: Optional[BetStatus] = Query(None, alias="status"),
+    include_archive: bool = True,
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """Get the current user's bets, newest first, including archived ones.
+    
+    Pass `next_cursor` from the previous page as `cursor` to continue.
+    """
+    bets, next_cursor = await archive.history(
+        archive.BETS,
+        current_user.id,
+        cursor,
+        limit,
+        query={"status": bet_status} if bet_status else None,
+        include_archive=include_archive,
+    )
+    return fast_response(BetList(bets=bets, size=limit, next_cursor=next_cursor))
+
+@router.post("/", response_model=BetResponse, status_code=status.HTTP_201_CREATED)
+async def place_bet(
+    bet: BetCreate,
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """Place a bet."""
+    db_bet = await _build_bet(bet, current_user)
+    await _reserve(current_user, [db_bet], f"bet:{db_bet.id}", f"Stake for bet {db_bet.id}")
+    
+    # Written in the next batch, funds are already reserved
+    bet_writer.submit(db_bet)
+    return db_bet
+
+@router.post("/batch", response_model=List[BetResponse], status_code=status.HTTP_201_CREATED)
+async def place_bets(
+    batch: BetBatchCreate,
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """Place several bets with a single all-or-nothing stake reservation."""
+    if not batch.bets or len(batch.bets) > settings.BET_BATCH_MAX_BETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch must contain between 1 and {settings.BET_BATCH_MAX_BETS} bets"
+        )
+    
+    db_bets = [await _build_bet(bet, current_user) for bet in batch.bets]
+    await _reserve(current_user, db_bets, f"bets:{db_bets[0].id}", f"Stake for {len(db_bets)} bets")
+    
+    for db_bet in db_bets:
+        bet_writer.submit(db_bet)
+    return db_bets
@@ -1,45 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from beanie import PydanticObjectId
+from datetime import datetime
+from typing import Optional
 
-from app.core.database import get_db
-from app.core.deps import get_current_active_user, get_current_admin_user
-from app.models.game import Game, GameStatus
-from app.schemas.betting import GameCreate, GameUpdate, GameResponse, GameList
+from app.core.deps import get_current_admin_user
+from app.core.responses import fast_response
+from app.models.game import Game, GameSession, GameType
+from app.schemas.betting import (
+    GameCreate, GameUpdate, GameResponse, GameList,
+    GameSessionCreate, GameSessionClose, GameSessionResponse, GameSessionStats,
+)
+from app.services.games import catalog, invalidate_game
+from app.services.session_stats import session_stats
+from app.services.settlement import schedule_settlement
+from app.services.notifications import BROADCAST, build_event, notification_service
+from app.models.notification import NotificationType
 
 router = APIRouter(prefix="/games", tags=["Games"])
 
 @router.get("/", response_model=GameList)
-def get_games(
-    skip: int = Query(0, ge=0),
+async def get_games(
+    request: Request,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = Query(100, ge=1, le=100),
-    game_type: Optional[str] = None,
-    featured_only: bool = False,
-    db: Session = Depends(get_db)
+    game_type: Optional[GameType] = None,
+    featured_only: bool = False
 ):
     """Get all active games."""
-    query = db.query(Game).filter(Game.status == GameStatus.ACTIVE)
+    page = await catalog.page(game_type, featured_only, cursor, skip, limit)
+    headers = {"ETag": page.etag, "Cache-Control": "no-cache"}
     
-    if game_type:
-        query = query.filter(Game.game_type == game_type)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or page.etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
-    if featured_only:
-        query = query.filter(Game.is_featured == True)
-    
-    total = query.count()
-    games = query.offset(skip).limit(limit).all()
-    
-    return GameList(
-        games=games,
-        total=total,
-        page=skip // limit + 1,
-        size=limit
-    )
+    return Response(content=page.body, media_type="application/json", headers=headers)
 
 @router.get("/{game_id}", response_model=GameResponse)
-def get_game(game_id: int, db: Session = Depends(get_db)):
+async def get_game(game_id: PydanticObjectId):
     """Get game by ID."""
-    game = db.query(Game).filter(Game.id == game_id).first()
+    game = await Game.get(game_id)
     if not game:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -48,54 +49,112 @@ def get_game(game_id: int, db: Session = Depends(get_db)):
     return game
 
 @router.post("/", response_model=GameResponse, status_code=status.HTTP_201_CREATED)
-def create_game(
+async def create_game(
     game: GameCreate,
-    current_user = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user = Depends(get_current_admin_user)
 ):
     """Create a new game (admin only)."""
     db_game = Game(**game.dict())
-    db.add(db_game)
-    db.commit()
-    db.refresh(db_game)
+    await db_game.insert()
+    await invalidate_game(db_game.id)
     return db_game
 
 @router.put("/{game_id}", response_model=GameResponse)
-def update_game(
-    game_id: int,
+async def update_game(
+    game_id: PydanticObjectId,
     game_update: GameUpdate,
-    current_user = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user = Depends(get_current_admin_user)
 ):
     """Update game (admin only)."""
-    game = db.query(Game).filter(Game.id == game_id).first()
+    game = await Game.get(game_id)
     if not game:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Game not found"
         )
     
-    for field, value in game_update.dict(exclude_unset=True).items():
-        setattr(game, field, value)
-    
-    db.commit()
-    db.refresh(game)
+    update_data = game_update.dict(exclude_unset=True)
+    if update_data:
+        update_data["updated_at"] = datetime.utcnow()
+        await game.set(update_data)
+        await invalidate_game(game.id)
+        await notification_service.publish(build_event(
+            BROADCAST,
+            NotificationType.GAME_UPDATE,
+            f"{game.name} updated",
+            f"{game.name} is now {game.status.value}",
+            {"game_id": str(game.id), "status": game.status.value},
+        ))
     return game
 
 @router.delete("/{game_id}")
-def delete_game(
-    game_id: int,
-    current_user = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+async def delete_game(
+    game_id: PydanticObjectId,
+    current_user = Depends(get_current_admin_user)
 ):
     """Delete game (admin only)."""
-    game = db.query(Game).filter(Game.id == game_id).first()
+    game = await Game.get(game_id)
     if not game:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Game not found"
         )
     
-    db.delete(game)
-    db.commit()
+    await game.delete()
+    await invalidate_game(game.id)
     return {"message": "Game deleted successfully"}
+
+async def _get_session(game_id: PydanticObjectId, session_id: PydanticObjectId) -> dict:
+    session = await session_stats.snapshot(session_id)
+    if not session or session["game_id"] != game_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Game session not found"
+        )
+    return session
+
+@router.post("/{game_id}/sessions", response_model=GameSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_game_session(
+    game_id: PydanticObjectId,
+    session: GameSessionCreate,
+    current_user = Depends(get_current_admin_user)
+):
+    """Open a new betting session for a game (admin only)."""
+    game = await Game.get(game_id)
+    if not game:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Game not found"
+        )
+    
+    db_session = GameSession(game_id=game.id, session_data=session.session_data)
+    await db_session.insert()
+    return db_session
+
+@router.get("/{game_id}/sessions/{session_id}/stats", response_model=GameSessionStats)
+async def get_game_session_stats(
+    game_id: PydanticObjectId,
+    session_id: PydanticObjectId,
+    current_user = Depends(get_current_admin_user)
+):
+    """Get live staked totals, liability and bets per outcome (admin only)."""
+    return fast_response(GameSessionStats.model_validate(await _get_session(game_id, session_id)))
+
+@router.post("/{game_id}/sessions/{session_id}/close", response_model=GameSessionStats)
+async def close_game_session(
+    game_id: PydanticObjectId,
+    session_id: PydanticObjectId,
+    close: GameSessionClose,
+    current_user = Depends(get_current_admin_user)
+):
+    """Stop taking bets, reconcile the totals and settle the session (admin only)."""
+    await _get_session(game_id, session_id)
+    session = await session_stats.close(session_id, close.result)
+    if session is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Game session is already closed"
+        )
+    
+    schedule_settlement(session_id)
+    return session
@@ -0,0 +1,147 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import Response, StreamingResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from beanie import PydanticObjectId
+from typing import Optional
+import asyncio
+import json
+
+from app.core.config import settings
+from app.core.deps import get_current_active_principal, get_current_admin_user, get_current_principal
+from app.core.principal import Principal
+from app.core.responses import fast_response
+from app.models.notification import BroadcastNotification
+from app.schemas.notification import (
+    NotificationList,
+    UnreadCount,
+    NotificationIds,
+    BroadcastCreate,
+    BroadcastResponse,
+)
+from app.services import inbox
+from app.services.inbox_state import inbox_cache
+from app.services.notifications import hub
+
+router = APIRouter(prefix="/notifications", tags=["Notifications"])
+
+optional_security = HTTPBearer(auto_error=False)
+
+async def get_stream_principal(
+    token: Optional[str] = Query(None, description="Access token for clients that cannot set headers"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+) -> Principal:
+    """Authenticate from the Authorization header or the `token` query parameter."""
+    if credentials is None and token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if credentials is None:
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    principal = await get_current_principal(credentials)
+    return await get_current_active_principal(principal)
+
+@router.get("/stream")
+async def stream_notifications(current_user: Principal = Depends(get_stream_principal)):
+    """Server-sent events with the current user's notifications as they happen."""
+    connection = hub.connect(str(current_user.id))
+    
+    async def events():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        connection.queue.get(), settings.NOTIFICATION_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event["type"] == "close":
+                    break
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            hub.disconnect(connection)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/", response_model=NotificationList)
+async def get_notifications(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """Get the current user's inbox, personal and broadcast, newest first."""
+    # The first page is what every app launch asks for, serve it cached
+    if cursor is None:
+        body = await inbox_cache.get(current_user.id, str(limit))
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+    
+    items, next_cursor = await inbox.list_inbox(current_user.id, cursor, limit)
+    page = NotificationList(
+        notifications=items,
+        unread=await inbox.unread_count(current_user.id),
+        size=limit,
+        next_cursor=next_cursor
+    )
+    if cursor is None:
+        await inbox_cache.set(current_user.id, str(limit), page.model_dump_json().encode())
+    return fast_response(page)
+
+@router.get("/unread-count", response_model=UnreadCount)
+async def get_unread_count(current_user: Principal = Depends(get_current_active_principal)):
+    """Get the number of unread notifications."""
+    return UnreadCount(unread=await inbox.unread_count(current_user.id))
+
+@router.post("/broadcasts", response_model=BroadcastResponse, status_code=status.HTTP_201_CREATED)
+async def create_broadcast(
+    broadcast: BroadcastCreate,
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    """Send a notification to every user (admin only)."""
+    return await inbox.send_broadcast(BroadcastNotification(**broadcast.dict()))
+
+@router.post("/broadcasts/read-all")
+async def read_all_broadcasts(current_user: Principal = Depends(get_current_active_principal)):
+    """Mark every broadcast read."""
+    await inbox.mark_all_broadcasts_read(current_user.id)
+    return {"message": "Broadcasts marked as read"}
+
+@router.post("/broadcasts/{broadcast_id}/read")
+async def read_broadcast(
+    broadcast_id: PydanticObjectId,
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """Mark one broadcast read."""
+    await inbox.mark_broadcast_read(current_user.id, broadcast_id)
+    return {"message": "Broadcast marked as read"}
+
+@router.post("/read")
+async def read_notifications(
+    selection: NotificationIds,
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """Mark notifications read; without ids, everything including broadcasts."""
+    updated = await inbox.mark_read(current_user.id, selection.ids)
+    if selection.ids is None:
+        await inbox.mark_all_broadcasts_read(current_user.id)
+    return {"updated": updated}
+
+@router.post("/archive")
+async def archive_notifications(
+    selection: NotificationIds,
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """Archive notifications."""
+    if not selection.ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No notifications selected"
+        )
+    return {"updated": await inbox.archive(current_user.id, selection.ids)}
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException, Request, status
+
+from app.services.payments import InvalidSignatureError, payment_processor
+
+router = APIRouter(prefix="/payments", tags=["Payments"])
+
+@router.post("/webhook")
+async def payment_webhook(request: Request):
+    """Receive a payment gateway event; it is applied in the background."""
+    payload = await request.body()
+    try:
+        new = await payment_processor.ingest(payload, request.headers.get("stripe-signature"))
+    except InvalidSignatureError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    return {"received": True, "duplicate": not new}
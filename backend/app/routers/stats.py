@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, Query
+from beanie import PydanticObjectId
+
+from app.core.deps import get_current_active_principal, get_current_admin_user
+from app.core.principal import Principal
+from app.core.responses import fast_response
+from app.schemas.stats import UserStats, GameStats
+from app.services import stats
+
+router = APIRouter(prefix="/stats", tags=["Statistics"])
+
+@router.get("/me", response_model=UserStats)
+async def get_my_stats(
+    days: int = Query(30, ge=1, le=366),
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """Get the current user's betting totals for the last `days` days."""
+    return fast_response(UserStats.model_validate(await stats.user_stats(current_user.id, days)))
+
+@router.get("/users/{user_id}", response_model=UserStats)
+async def get_user_stats(
+    user_id: PydanticObjectId,
+    days: int = Query(30, ge=1, le=366),
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    """Get a user's betting totals for the last `days` days (admin only)."""
+    return fast_response(UserStats.model_validate(await stats.user_stats(user_id, days)))
+
+@router.get("/games/{game_id}", response_model=GameStats)
+async def get_game_stats(
+    game_id: PydanticObjectId,
+    hours: int = Query(24, ge=1, le=24 * 31),
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    """Get a game's betting totals for the last `hours` hours (admin only)."""
+    return fast_response(GameStats.model_validate(await stats.game_stats(game_id, hours)))
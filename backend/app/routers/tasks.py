@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+
+from app.core.deps import get_current_admin_user
+from app.core.principal import Principal
+from app.workers.celery_app import celery_app
+
+router = APIRouter(prefix="/tasks", tags=["Tasks"])
+
+@router.get("/{task_id}")
+async def get_task(
+    task_id: str,
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    """Get the state and result of a background task (admin only)."""
+    result = celery_app.AsyncResult(task_id)
+    return {
+        "id": task_id,
+        "name": result.name,
+        "state": result.state,
+        "result": result.result if result.successful() else None,
+        "error": repr(result.result) if result.failed() else None,
+        "date_done": result.date_done,
+    }
@@ -1,91 +1,173 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from beanie import PydanticObjectId
+from datetime import datetime
+from typing import Optional
 
-from app.core.database import get_db
-from app.core.deps import get_current_active_user, get_current_admin_user
-from app.models.user import User
-from app.schemas.user import UserResponse, UserUpdate, UserList
+from app.core.deps import get_current_active_user, get_current_active_principal, get_current_admin_user
+from app.core.principal import Principal, principal_cache
+from app.core.money import to_minor
+from app.core.pagination import cached_count, decode_cursor, keyset_filter, page_cursor
+from app.core.responses import fast_response
+from app.services import archive, wallet
+from app.services.user_search import USER_LIST_PROJECTION, search_users
+from app.models.user import User, search_fields
+from app.models.transaction import TransactionType
+from app.schemas.user import UserResponse, UserUpdate, UserList, AdminUserUpdate
+from app.schemas.transaction import TransactionList
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
+# Keyset order for user listings, served by the created_at_id index
+USER_SORT = [("created_at", -1), ("_id", -1)]
+
 @router.get("/me", response_model=UserResponse)
-def get_current_user_profile(current_user: User = Depends(get_current_active_user)):
+async def get_current_user_profile(current_user: User = Depends(get_current_active_user)):
     """Get current user profile."""
-    return current_user
+    return fast_response(UserResponse.model_validate(current_user))
 
 @router.put("/me", response_model=UserResponse)
-def update_current_user_profile(
+async def update_current_user_profile(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """Update current user profile."""
-    for field, value in user_update.dict(exclude_unset=True).items():
-        setattr(current_user, field, value)
-    
-    db.commit()
-    db.refresh(current_user)
+    update_data = user_update.dict(exclude_unset=True)
+    if update_data:
+        update_data["updated_at"] = datetime.utcnow()
+        update_data.update(search_fields(
+            current_user.email,
+            current_user.username,
+            update_data.get("first_name") or current_user.first_name,
+            update_data.get("last_name") or current_user.last_name,
+        ))
+        await current_user.set(update_data)
     return current_user
 
+@router.get("/me/transactions", response_model=TransactionList)
+async def get_current_user_transactions(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    transaction_type: Optional[TransactionType] = None,
+    include_archive: bool = True,
+    current_user: Principal = Depends(get_current_active_principal)
+):
+    """Get the current user's transactions, newest first, including archived ones.
+    
+    Pass `next_cursor` from the previous page as `cursor` to continue.
+    """
+    transactions, next_cursor = await archive.history(
+        archive.TRANSACTIONS,
+        current_user.id,
+        cursor,
+        limit,
+        query={"transaction_type": transaction_type} if transaction_type else None,
+        include_archive=include_archive,
+    )
+    return fast_response(TransactionList(transactions=transactions, size=limit, next_cursor=next_cursor))
+
 @router.get("/", response_model=UserList)
-def get_users(
-    skip: int = Query(0, ge=0),
+async def get_users(
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = Query(100, ge=1, le=100),
     search: Optional[str] = None,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    with_total: bool = True,
+    current_user: Principal = Depends(get_current_admin_user)
 ):
-    """Get all users (admin only)."""
-    query = db.query(User)
+    """Get all users, newest first, or ranked search results (admin only).
     
-    if search:
-        query = query.filter(
-            User.email.ilike(f"%{search}%") |
-            User.username.ilike(f"%{search}%") |
-            User.first_name.ilike(f"%{search}%") |
-            User.last_name.ilike(f"%{search}%")
-        )
+    Pass `next_cursor` from the previous page as `cursor` to continue.
+    Search results are ranked and paged with `skip`.
+    """
+    if search and search.strip():
+        users, total = await search_users(search, skip, limit)
+        return fast_response(UserList(
+            users=users,
+            total=total,
+            page=skip // limit + 1,
+            size=limit
+        ))
     
-    total = query.count()
-    users = query.offset(skip).limit(limit).all()
+    query = keyset_filter(decode_cursor(cursor, USER_SORT), USER_SORT) if cursor else {}
     
-    return UserList(
-        users=users,
-        total=total,
-        page=skip // limit + 1,
-        size=limit
-    )
+    collection = User.get_motor_collection()
+    find = collection.find(query, USER_LIST_PROJECTION).sort(USER_SORT)
+    if skip and not cursor:
+        find = find.skip(skip)
+    users = await find.limit(limit + 1).to_list(limit + 1)
+    
+    return fast_response(UserList(
+        users=users[:limit],
+        total=await cached_count(collection, {}) if with_total else None,
+        page=None if cursor else skip // limit + 1,
+        size=limit,
+        next_cursor=page_cursor(users, USER_SORT, limit)
+    ))
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(
-    user_id: int,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+async def get_user(
+    user_id: PydanticObjectId,
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Get user by ID (admin only)."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await User.get(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    return fast_response(UserResponse.model_validate(user))
+
+@router.put("/{user_id}", response_model=UserResponse)
+async def update_user(
+    user_id: PydanticObjectId,
+    user_update: AdminUserUpdate,
+    current_user: Principal = Depends(get_current_admin_user)
+):
+    """Update user role, status or balance (admin only)."""
+    user = await User.get(user_id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    update_data = user_update.dict(exclude_unset=True)
+    balance = update_data.pop("balance", None)
+    if balance is not None:
+        try:
+            await wallet.set_balance(
+                user.id,
+                to_minor(balance),
+                description=f"Balance set by admin {current_user.email}",
+            )
+        except wallet.WalletError:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Balance changed concurrently, please retry"
+            )
+        await user.sync()
+    
+    if update_data:
+        update_data["updated_at"] = datetime.utcnow()
+        await user.set(update_data)
+        # Balances are not part of the principal, only these fields are
+        await principal_cache.invalidate(user.email, user.updated_at)
     return user
 
 @router.delete("/{user_id}")
-def delete_user(
-    user_id: int,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+async def delete_user(
+    user_id: PydanticObjectId,
+    current_user: Principal = Depends(get_current_admin_user)
 ):
     """Delete user (admin only)."""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await User.get(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    db.delete(user)
-    db.commit()
+    await user.delete()
+    await principal_cache.invalidate(user.email)
     return {"message": "User deleted successfully"}
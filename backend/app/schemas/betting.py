@@ -1,4 +1,5 @@
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, Field, AliasChoices, validator
+from beanie import PydanticObjectId
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from app.models.game import GameType, GameStatus
@@ -12,6 +13,7 @@ class GameBase(BaseModel):
     min_bet: float = 1.0
     max_bet: float = 10000.0
     house_edge: float = 2.0
+    odds: Dict[str, float] = {}
 
 class GameCreate(GameBase):
     pass
@@ -22,12 +24,13 @@ class GameUpdate(BaseModel):
     min_bet: Optional[float] = None
     max_bet: Optional[float] = None
     house_edge: Optional[float] = None
+    odds: Optional[Dict[str, float]] = None
     status: Optional[GameStatus] = None
     is_featured: Optional[bool] = None
     image_url: Optional[str] = None
 
 class GameResponse(GameBase):
-    id: int
+    id: PydanticObjectId = Field(validation_alias=AliasChoices("id", "_id"))
     status: GameStatus
     is_featured: bool
     image_url: Optional[str] = None
@@ -38,7 +41,8 @@ class GameResponse(GameBase):
 
 # Bet Schemas
 class BetBase(BaseModel):
-    game_id: int
+    game_id: PydanticObjectId
+    game_session_id: Optional[PydanticObjectId] = None
     bet_amount: float
     odds: float
     bet_type: BetType = BetType.SINGLE
@@ -49,13 +53,22 @@ class BetBase(BaseModel):
         if v <= 0:
             raise ValueError('Bet amount must be positive')
         return v
+    
+    @validator('odds')
+    def validate_odds(cls, v):
+        if v < 1:
+            raise ValueError('Odds must be at least 1')
+        return v
 
 class BetCreate(BetBase):
     pass
 
+class BetBatchCreate(BaseModel):
+    bets: List[BetCreate]
+
 class BetResponse(BetBase):
-    id: int
-    user_id: int
+    id: PydanticObjectId = Field(validation_alias=AliasChoices("id", "_id"))
+    user_id: PydanticObjectId
     potential_payout: float
     actual_payout: float
     status: BetStatus
@@ -68,8 +81,8 @@ class BetResponse(BetBase):
 
 # Game Session Schemas
 class GameSessionResponse(BaseModel):
-    id: int
-    game_id: int
+    id: PydanticObjectId = Field(validation_alias=AliasChoices("id", "_id"))
+    game_id: PydanticObjectId
     session_data: Optional[Dict[str, Any]] = None
     started_at: datetime
     ended_at: Optional[datetime] = None
@@ -79,14 +92,39 @@ class GameSessionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class GameSessionCreate(BaseModel):
+    session_data: Optional[Dict[str, Any]] = None
+
+class GameSessionClose(BaseModel):
+    result: Optional[Any] = None  # Stored as session_data.result and used for settlement
+
+class OutcomeStats(BaseModel):
+    bets: int = 0
+    staked: float = 0.0
+    liability: float = 0.0
+
+class GameSessionStats(BaseModel):
+    id: PydanticObjectId = Field(validation_alias=AliasChoices("id", "_id"))
+    game_id: PydanticObjectId
+    started_at: datetime
+    ended_at: Optional[datetime] = None
+    settled_at: Optional[datetime] = None
+    bet_count: int
+    total_bets: float
+    total_liability: float
+    total_payouts: float = 0.0
+    outcomes: Dict[str, OutcomeStats]
+
 class GameList(BaseModel):
     games: List[GameResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     size: int
+    next_cursor: Optional[str] = None
 
 class BetList(BaseModel):
     bets: List[BetResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     size: int
+    next_cursor: Optional[str] = None
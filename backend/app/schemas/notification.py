@@ -0,0 +1,39 @@
+from pydantic import BaseModel
+from beanie import PydanticObjectId
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+from app.models.notification import NotificationType, NotificationStatus
+
+class NotificationResponse(BaseModel):
+    id: PydanticObjectId
+    title: str
+    message: str
+    notification_type: NotificationType
+    status: NotificationStatus
+    metadata: Optional[Dict[str, Any]] = None
+    created_at: datetime
+    read_at: Optional[datetime] = None
+    is_broadcast: bool = False
+
+class NotificationList(BaseModel):
+    notifications: List[NotificationResponse]
+    unread: int
+    size: int
+    next_cursor: Optional[str] = None
+
+class UnreadCount(BaseModel):
+    unread: int
+
+class NotificationIds(BaseModel):
+    ids: Optional[List[PydanticObjectId]] = None  # None means all
+
+class BroadcastCreate(BaseModel):
+    title: str
+    message: str
+    notification_type: NotificationType = NotificationType.PROMOTION
+    metadata: Optional[Dict[str, Any]] = None
+    expires_at: Optional[datetime] = None
+
+class BroadcastResponse(BroadcastCreate):
+    id: PydanticObjectId
+    created_at: datetime
@@ -0,0 +1,39 @@
+from pydantic import BaseModel, model_validator
+from typing import Optional, List, Dict
+from datetime import datetime
+from app.core.money import from_minor
+
+class StatsTotals(BaseModel):
+    bets: int
+    wins: int
+    wagered: float
+    won: float
+    
+    @model_validator(mode="before")
+    @classmethod
+    def amounts_from_minor(cls, data):
+        # Rollups store minor units
+        if isinstance(data, dict):
+            data = {**data, "wagered": from_minor(data["wagered"]), "won": from_minor(data["won"])}
+        return data
+
+class StatsPoint(StatsTotals):
+    day: Optional[datetime] = None
+    hour: Optional[datetime] = None
+
+class StatsSummary(StatsTotals):
+    net: float
+    series: List[StatsPoint]
+    
+    @model_validator(mode="before")
+    @classmethod
+    def net_from_minor(cls, data):
+        if isinstance(data, dict):
+            data = {**data, "net": from_minor(data["net"])}
+        return data
+
+class UserStats(StatsSummary):
+    games: Dict[str, StatsTotals]
+
+class GameStats(StatsSummary):
+    pass
@@ -0,0 +1,38 @@
+from pydantic import BaseModel, Field, AliasChoices, model_validator
+from beanie import PydanticObjectId
+from typing import Optional, List
+from datetime import datetime
+from app.models.transaction import TransactionType, TransactionStatus, PaymentMethod
+from app.core.money import from_minor
+
+class TransactionResponse(BaseModel):
+    id: PydanticObjectId = Field(validation_alias=AliasChoices("id", "_id"))
+    transaction_type: TransactionType
+    amount: float
+    balance_before: Optional[float] = None
+    balance_after: Optional[float] = None
+    payment_method: Optional[PaymentMethod] = None
+    status: TransactionStatus
+    description: Optional[str] = None
+    created_at: datetime
+    processed_at: Optional[datetime] = None
+    
+    @model_validator(mode="before")
+    @classmethod
+    def amounts_from_minor(cls, data):
+        # Stored amounts are minor units
+        if isinstance(data, dict):
+            data = {
+                **data,
+                **{field: from_minor(data[field]) for field in ("amount", "balance_before", "balance_after")
+                   if data.get(field) is not None},
+            }
+        return data
+    
+    class Config:
+        from_attributes = True
+
+class TransactionList(BaseModel):
+    transactions: List[TransactionResponse]
+    size: int
+    next_cursor: Optional[str] = None
@@ -1,7 +1,9 @@
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, EmailStr, Field, AliasChoices, validator, model_validator
+from beanie import PydanticObjectId
 from typing import Optional, List
 from datetime import datetime
 from app.models.user import UserRole, UserStatus
+from app.core.money import from_minor
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -25,7 +27,7 @@ class UserUpdate(BaseModel):
     phone: Optional[str] = None
 
 class UserResponse(UserBase):
-    id: int
+    id: PydanticObjectId = Field(validation_alias=AliasChoices("id", "_id"))
     role: UserRole
     status: UserStatus
     is_verified: bool
@@ -33,6 +35,14 @@ class UserResponse(UserBase):
     created_at: datetime
     last_login: Optional[datetime] = None
     
+    @model_validator(mode="before")
+    @classmethod
+    def balance_from_minor(cls, data):
+        # Documents dumped to dicts carry the stored minor units only
+        if isinstance(data, dict) and "balance_minor" in data:
+            data = {**data, "balance": from_minor(data["balance_minor"])}
+        return data
+    
     class Config:
         from_attributes = True
 
@@ -51,10 +61,11 @@ class AdminUserUpdate(BaseModel):
     role: Optional[UserRole] = None
     status: Optional[UserStatus] = None
     is_verified: Optional[bool] = None
-    balance: Optional[float] = None
+    balance: Optional[float] = Field(None, ge=0)
 
 class UserList(BaseModel):
     users: List[UserResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     size: int
+    next_cursor: Optional[str] = None
@@ -0,0 +1,196 @@
+"""
+Monthly archival of settled bets and completed transactions.
+
+Rows that can no longer change and are older than `ARCHIVE_AFTER_DAYS`
+move out of the live collections into `<collection>_archive_<YYYY>_<MM>`,
+partitioned by the same date that history is sorted on. Each batch is:
+
+1. streamed from the live collection in `_id` order,
+2. upserted by `_id` into its month's archive collection,
+3. deleted from the live collection.
+
+Upserting by `_id` makes step 2 idempotent, and the source query only
+matches what is still live, so a run interrupted anywhere simply
+continues where it stopped when started again.
+
+History reads go through `history`, which keyset-pages the live
+collection and only opens archive months that can still contribute to
+the requested page.
+"""
+
+import heapq
+import logging
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from beanie import PydanticObjectId
+from pymongo import IndexModel, ReplaceOne
+
+from app.core.config import settings
+from app.core.database import secondary_reads
+from app.core.pagination import SortSpec, decode_cursor, keyset_filter, page_cursor
+from app.models.bet import Bet, BetStatus
+from app.models.transaction import Transaction, TransactionStatus
+
+logger = logging.getLogger(__name__)
+
+# Archive collection names are refreshed this often
+ARCHIVE_LIST_TTL_SECONDS = 60
+
+@dataclass(frozen=True)
+class ArchiveSpec:
+    model: type
+    date_field: str
+    # Rows in these states are final and may be archived
+    final_statuses: tuple
+    
+    @property
+    def name(self) -> str:
+        return self.model.Settings.name
+    
+    @property
+    def sort(self) -> SortSpec:
+        return [(self.date_field, -1), ("_id", -1)]
+
+BETS = ArchiveSpec(
+    Bet, "placed_at",
+    (BetStatus.WON.value, BetStatus.LOST.value, BetStatus.CANCELLED.value, BetStatus.REFUNDED.value),
+)
+TRANSACTIONS = ArchiveSpec(
+    Transaction, "created_at",
+    (TransactionStatus.COMPLETED.value, TransactionStatus.FAILED.value, TransactionStatus.CANCELLED.value),
+)
+SPECS = {spec.name: spec for spec in (BETS, TRANSACTIONS)}
+
+_indexed: Set[str] = set()
+_months: Dict[str, tuple] = {}
+
+def archive_name(spec: ArchiveSpec, when: datetime) -> str:
+    return f"{spec.name}_archive_{when:%Y_%m}"
+
+def month_range(name: str) -> tuple:
+    """First instant of an archive collection's month and of the next one."""
+    year, month = (int(part) for part in name.rsplit("_", 2)[-2:])
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+def _database():
+    return Bet.get_motor_collection().database
+
+async def _archive_collection(spec: ArchiveSpec, name: str):
+    collection = _database()[name]
+    if name not in _indexed:
+        # Same shape as the live history index
+        await collection.create_indexes([
+            IndexModel([("user_id", 1), (spec.date_field, -1), ("_id", -1)], name="user_history"),
+        ])
+        _indexed.add(name)
+    return collection
+
+async def archive_months(spec: ArchiveSpec) -> List[str]:
+    """Archive collection names for a spec, newest month first."""
+    entry = _months.get(spec.name)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0]
+    
+    pattern = re.compile(rf"^{spec.name}_archive_\d{{4}}_\d{{2}}$")
+    names = sorted(
+        (name for name in await _database().list_collection_names() if pattern.match(name)),
+        reverse=True,
+    )
+    _months[spec.name] = (names, time.monotonic() + ARCHIVE_LIST_TTL_SECONDS)
+    return names
+
+async def _archive_batch(spec: ArchiveSpec, docs: List[dict]) -> int:
+    by_month: Dict[str, List[dict]] = defaultdict(list)
+    for doc in docs:
+        by_month[archive_name(spec, doc[spec.date_field])].append(doc)
+    
+    for name, month_docs in by_month.items():
+        collection = await _archive_collection(spec, name)
+        await collection.bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in month_docs],
+            ordered=False,
+        )
+    
+    # Only rows still final are removed, anything touched since stays live
+    result = await spec.model.get_motor_collection().delete_many({
+        "_id": {"$in": [doc["_id"] for doc in docs]},
+        "status": {"$in": list(spec.final_statuses)},
+    })
+    return result.deleted_count
+
+async def archive(spec: ArchiveSpec, before: Optional[datetime] = None, batch_size: Optional[int] = None) -> dict:
+    """Move final rows older than `before` into monthly archives.
+    
+    Safe to stop at any point and run again.
+    """
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    before = before or datetime.utcnow() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    
+    cursor = spec.model.get_motor_collection().find({
+        spec.date_field: {"$lt": before},
+        "status": {"$in": list(spec.final_statuses)},
+    }).sort("_id", 1).batch_size(batch_size)
+    
+    summary = {"archived": 0, "batches": 0}
+    batch: List[dict] = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            summary["archived"] += await _archive_batch(spec, batch)
+            summary["batches"] += 1
+            batch = []
+    if batch:
+        summary["archived"] += await _archive_batch(spec, batch)
+        summary["batches"] += 1
+    
+    _months.pop(spec.name, None)
+    logger.info("Archived %s older than %s: %s", spec.name, before, summary)
+    return summary
+
+async def history(
+    spec: ArchiveSpec,
+    user_id: PydanticObjectId,
+    cursor: Optional[str],
+    limit: int,
+    query: Optional[dict] = None,
+    include_archive: bool = True,
+) -> tuple:
+    """One page of a user's rows across live and archived data, newest first.
+    
+    Returns (items, next_cursor).
+    """
+    sort = spec.sort
+    base = {"user_id": user_id, **(query or {})}
+    if cursor:
+        position = decode_cursor(cursor, sort)
+        base = {"$and": [base, keyset_filter(position, sort)]}
+    
+    async def fetch(collection) -> List[dict]:
+        return await secondary_reads(collection).find(base).sort(sort).limit(limit + 1).to_list(limit + 1)
+    
+    def merged() -> List[dict]:
+        key = lambda doc: (doc[spec.date_field], doc["_id"])
+        return list(heapq.merge(*pages, key=key, reverse=True))[:limit + 1]
+    
+    pages = [await fetch(spec.model.get_motor_collection())]
+    items = pages[0]
+    
+    if include_archive:
+        # Live rows may be of any age, archived ones are confined to their month
+        for name in await archive_months(spec):
+            start, end = month_range(name)
+            if cursor and start > position[spec.date_field]:
+                continue
+            if len(items) > limit and items[limit][spec.date_field] >= end:
+                break
+            pages.append(await fetch(_database()[name]))
+            items = merged()
+    
+    return items[:limit], page_cursor(items, sort, limit)
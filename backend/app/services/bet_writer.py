@@ -0,0 +1,222 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from beanie import PydanticObjectId
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.money import to_minor
+from app.models.bet import Bet
+from app.models.game import GameSession
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+from app.services import wallet
+from app.services.session_stats import session_stats
+from app.services.settlement import schedule_settlement
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+# Stakes whose bets were never written are refunded by a periodic sweep
+SWEEP_INTERVAL_SECONDS = 300
+SWEEP_LOOKBACK = timedelta(days=1)
+# Well past any insert still retrying, so a bet on its way is not refunded
+SWEEP_GRACE = timedelta(minutes=10)
+
+class BetWriter:
+    """Write-behind micro-batcher for new bets.
+
+    Placed bets are queued and written with one `insert_many` when either
+    `batch_size` bets are waiting or `window` seconds have passed since
+    the first one arrived. Funds are already reserved when a bet is
+    queued; if a batch cannot be written the stakes of the bets that did
+    not land are refunded. Bets lost with the process (crash, kill) are
+    found by a periodic sweep over recent stakes and refunded under the
+    same keys. A bet written after its session was settled gets the
+    session settled again.
+    """
+
+    def __init__(self, batch_size: int = 500, window: float = 0.025):
+        self.batch_size = batch_size
+        self.window = window
+        self._queue: "asyncio.Queue[Bet]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._sweeper: Optional[asyncio.Task] = None
+        self.flushed = 0
+        self.batches = 0
+        self.recovered = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def stop(self):
+        """Stop the writer after flushing everything queued."""
+        if self._task is not None:
+            for task in (self._task, self._sweeper):
+                task.cancel()
+            await asyncio.gather(self._task, self._sweeper, return_exceptions=True)
+            self._task = self._sweeper = None
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        await self._flush(batch)
+
+    def submit(self, bet: Bet):
+        """Queue a bet for insertion."""
+        self._queue.put_nowait(bet)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Bet], retries: int = 2):
+        if not batch:
+            return
+        for attempt in range(retries + 1):
+            try:
+                await Bet.insert_many(batch, ordered=False)
+                break
+            except BulkWriteError as exc:
+                # Bets written by an earlier attempt are fine to skip
+                errors = exc.details.get("writeErrors", [])
+                if all(error["code"] == DUPLICATE_KEY for error in errors):
+                    break
+                logger.warning("Bet batch insert failed (attempt %d): %s", attempt + 1, exc)
+            except Exception:
+                logger.exception("Bet batch insert failed (attempt %d)", attempt + 1)
+            await asyncio.sleep(0.1 * (attempt + 1))
+        else:
+            batch = await self._refund_unwritten(batch)
+            if not batch:
+                return
+        session_stats.record(batch)
+        self.flushed += len(batch)
+        self.batches += 1
+        try:
+            await self._settle_stragglers(batch)
+        except Exception:
+            logger.exception("Could not check bet sessions for settlement")
+
+    async def _settle_stragglers(self, batch: List[Bet]):
+        session_ids = list({bet.game_session_id for bet in batch if bet.game_session_id is not None})
+        if not session_ids:
+            return
+        settled = await GameSession.get_motor_collection().distinct(
+            "_id", {"_id": {"$in": session_ids}, "settled_at": {"$ne": None}},
+        )
+        for session_id in settled:
+            logger.info("Bets written after session %s was settled, settling again", session_id)
+            schedule_settlement(session_id)
+
+    async def _refund_unwritten(self, batch: List[Bet]) -> List[Bet]:
+        """Refund the bets of a failed batch that are not in Mongo.
+
+        Part of the batch may have landed (a partial bulk write, a timeout
+        after the insert went through); those bets are live and returned.
+        If the check itself fails nothing is refunded here, the sweep
+        does the same check later.
+        """
+        try:
+            written = set(await Bet.get_motor_collection().distinct(
+                "_id", {"_id": {"$in": [bet.id for bet in batch]}},
+            ))
+        except Exception:
+            logger.exception("Could not check which bets were written, leaving them to the sweep")
+            return []
+        for bet in batch:
+            if bet.id in written:
+                continue
+            try:
+                await self._refund_stake(bet.user_id, bet.id, to_minor(bet.bet_amount))
+            except Exception:
+                logger.exception("Could not refund bet %s", bet.id)
+        return [bet for bet in batch if bet.id in written]
+
+    async def _refund_stake(self, user_id: PydanticObjectId, bet_id, amount: int):
+        await wallet.credit(
+            user_id,
+            amount,
+            TransactionType.BET_REFUND,
+            reference_id=f"refund:{bet_id}",
+            description=f"Refund for unrecorded bet {bet_id}",
+        )
+
+    async def recover_orphaned_stakes(self, since: datetime, until: datetime) -> int:
+        """Refund stakes taken between `since` and `until` whose bets do not exist.
+
+        Returns how many bets were refunded. Safe to run on every worker at
+        once, the `refund:<bet id>` key makes each refund happen once.
+        """
+        stakes = Transaction.get_motor_collection().find(
+            {
+                "transaction_type": TransactionType.BET_PLACED.value,
+                "status": TransactionStatus.COMPLETED.value,
+                "created_at": {"$gte": since, "$lt": until},
+            },
+            {"user_id": 1, "amount": 1, "reference_id": 1, "details": 1},
+        )
+        refunded = 0
+        async for stake in stakes:
+            bets: Dict[str, int] = (stake.get("details") or {}).get("bets") or {}
+            reference_id = stake.get("reference_id") or ""
+            if not bets and reference_id.startswith("bet:"):
+                # Single-bet stake taken before stakes carried their bets
+                bets = {reference_id[len("bet:"):]: stake["amount"]}
+            if not bets:
+                continue
+
+            ids = [PydanticObjectId(bet_id) for bet_id in bets]
+            written = await Bet.get_motor_collection().distinct("_id", {"_id": {"$in": ids}})
+            refunds = await Transaction.get_motor_collection().distinct(
+                "reference_id", {"reference_id": {"$in": [f"refund:{bet_id}" for bet_id in bets]}},
+            )
+            seen = {str(bet_id) for bet_id in written} | {refund[len("refund:"):] for refund in refunds}
+            for bet_id, amount in bets.items():
+                if bet_id in seen:
+                    continue
+                logger.warning("Refunding stake for bet %s that was never written", bet_id)
+                await self._refund_stake(stake["user_id"], bet_id, amount)
+                refunded += 1
+        self.recovered += refunded
+        return refunded
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+            try:
+                now = datetime.utcnow()
+                await self.recover_orphaned_stakes(now - SWEEP_LOOKBACK, now - SWEEP_GRACE)
+            except Exception:
+                logger.exception("Orphaned stake sweep failed")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "recovered": self.recovered,
+        }
+
+bet_writer = BetWriter(
+    batch_size=settings.BET_WRITE_BATCH_SIZE,
+    window=settings.BET_WRITE_WINDOW_MS / 1000,
+)
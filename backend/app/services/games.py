@@ -0,0 +1,141 @@
+import asyncio
+import bisect
+import hashlib
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from beanie import PydanticObjectId
+
+from app.core.database import secondary_reads
+from app.core.pagination import decode_cursor, encode_cursor
+from app.core.redis import publish, subscribe
+from app.models.game import Game, GameStatus, GameType
+from app.schemas.betting import GameList, GameResponse
+
+INVALIDATE_CHANNEL = "games:invalidate"
+
+# Games are read on every bet but change rarely
+GAME_CACHE_TTL_SECONDS = 30
+
+# Catalog pages are in _id order
+CATALOG_SORT = [("_id", 1)]
+
+# Rendered catalog pages kept per worker
+CATALOG_MAX_PAGES = 256
+
+_games: Dict[str, Tuple[Game, float]] = {}
+
+async def get_cached_game(game_id: PydanticObjectId) -> Optional[Game]:
+    """Get game by ID from the in-process cache."""
+    key = str(game_id)
+    entry = _games.get(key)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0]
+    
+    game = await Game.get(game_id)
+    if game is not None:
+        _games[key] = (game, time.monotonic() + GAME_CACHE_TTL_SECONDS)
+    return game
+
+class CatalogPage(NamedTuple):
+    body: bytes
+    etag: str
+
+class GameCatalog:
+    """Versioned snapshot of the active game catalog.
+
+    Each `game_type`/`featured_only` filter is loaded once per version and
+    every requested page is serialized to JSON once, with a strong ETag
+    over the bytes. Any game write bumps the version on every worker.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._snapshots: Dict[tuple, List[GameResponse]] = {}
+        self._pages: Dict[tuple, CatalogPage] = {}
+        self._locks: Dict[tuple, asyncio.Lock] = {}
+
+    def invalidate(self):
+        self.version += 1
+        self._snapshots.clear()
+        self._pages.clear()
+
+    async def _snapshot(self, game_type: Optional[GameType], featured_only: bool) -> List[GameResponse]:
+        key = (game_type, featured_only)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None:
+            return snapshot
+        
+        # Single flight, concurrent misses wait for one query
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot is not None:
+                return snapshot
+            
+            version = self.version
+            query = {"status": GameStatus.ACTIVE.value}
+            if game_type:
+                query["game_type"] = game_type.value
+            if featured_only:
+                query["is_featured"] = True
+            games = await secondary_reads(Game.get_motor_collection()).find(query).sort(CATALOG_SORT).to_list(None)
+            snapshot = [GameResponse.model_validate(game) for game in games]
+            
+            # Don't keep a snapshot that was invalidated while loading
+            if version == self.version:
+                self._snapshots[key] = snapshot
+            return snapshot
+
+    async def page(
+        self,
+        game_type: Optional[GameType],
+        featured_only: bool,
+        cursor: Optional[str],
+        skip: int,
+        limit: int,
+    ) -> CatalogPage:
+        """Get a rendered catalog page and its ETag.
+        
+        Pages continue after `cursor` (the `_id` of the last game seen) when
+        given, otherwise they start at `skip`.
+        """
+        key = (game_type, featured_only, cursor, skip, limit)
+        page = self._pages.get(key)
+        if page is not None:
+            return page
+        
+        version = self.version
+        games = await self._snapshot(game_type, featured_only)
+        if cursor:
+            start = bisect.bisect_right([game.id for game in games], decode_cursor(cursor, CATALOG_SORT)["_id"])
+        else:
+            start = skip
+        end = start + limit
+        body = GameList(
+            games=games[start:end],
+            total=len(games),
+            page=None if cursor else skip // limit + 1,
+            size=limit,
+            next_cursor=encode_cursor({"_id": games[end - 1].id}) if end < len(games) else None
+        ).model_dump_json().encode()
+        page = CatalogPage(body=body, etag=f'"{hashlib.sha1(body).hexdigest()}"')
+        
+        if version == self.version:
+            if len(self._pages) >= CATALOG_MAX_PAGES:
+                self._pages.clear()
+            self._pages[key] = page
+        return page
+
+catalog = GameCatalog()
+
+def _evict(game_id: str):
+    _games.pop(game_id, None)
+    catalog.invalidate()
+
+async def invalidate_game(game_id: PydanticObjectId):
+    """Drop a game and the catalog from every worker's cache after a change."""
+    _evict(str(game_id))
+    await publish(INVALIDATE_CHANNEL, str(game_id))
+
+subscribe(INVALIDATE_CHANNEL, _evict)
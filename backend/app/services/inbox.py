@@ -0,0 +1,223 @@
+"""
+User inbox: personal notifications merged with broadcasts.
+
+Broadcasts are stored once in `broadcast_notifications`. Whether a user
+has read one comes from their `NotificationReadState`: everything up to
+the watermark is read, plus the ids read one by one after it. Listings
+and unread counts merge the personal and broadcast streams at read
+time, so sending a promotion writes one document, not one per user.
+"""
+
+import heapq
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import List, Optional, Tuple
+
+from beanie import PydanticObjectId
+
+from app.core.pagination import decode_cursor, encode_cursor, keyset_filter
+from app.core.redis import publish, subscribe
+from app.models.notification import (
+    BroadcastNotification,
+    Notification,
+    NotificationReadState,
+    NotificationStatus,
+)
+from app.schemas.notification import NotificationResponse
+from app.services.inbox_state import add_unread, inbox_cache, recount_unread
+from app.services.notifications import BROADCAST, notification_service
+
+INBOX_SORT = [("created_at", -1), ("_id", -1)]
+
+# Broadcasts older than this drop out of inboxes
+BROADCAST_RETENTION_DAYS = 30
+
+# Recent broadcasts are cached per worker for this long
+BROADCAST_CACHE_TTL_SECONDS = 30
+
+# Compact read ids into the watermark past this many
+MAX_READ_IDS = 200
+
+INVALIDATE_CHANNEL = "broadcasts:invalidate"
+
+class _BroadcastCache:
+    def __init__(self):
+        self._items: Optional[List[BroadcastNotification]] = None
+        self._expires = 0.0
+
+    async def recent(self) -> List[BroadcastNotification]:
+        """Live broadcasts, newest first."""
+        if self._items is not None and self._expires > time.monotonic():
+            return self._items
+        now = datetime.utcnow()
+        since = now - timedelta(days=BROADCAST_RETENTION_DAYS)
+        items = await BroadcastNotification.find(
+            BroadcastNotification.created_at >= since
+        ).sort([("created_at", -1), ("_id", -1)]).to_list()
+        self._items = [item for item in items if item.expires_at is None or item.expires_at > now]
+        self._expires = time.monotonic() + BROADCAST_CACHE_TTL_SECONDS
+        return self._items
+
+    def invalidate(self, _message: str = ""):
+        self._items = None
+
+broadcasts = _BroadcastCache()
+subscribe(INVALIDATE_CHANNEL, broadcasts.invalidate)
+
+async def send_broadcast(broadcast: BroadcastNotification) -> BroadcastNotification:
+    """Store a broadcast once and push it to everyone connected."""
+    await broadcast.insert()
+    broadcasts.invalidate()
+    await publish(INVALIDATE_CHANNEL, str(broadcast.id))
+    await inbox_cache.invalidate_all()
+    await notification_service.publish({
+        "id": str(broadcast.id),
+        "user_id": BROADCAST,
+        "type": broadcast.notification_type.value,
+        "title": broadcast.title,
+        "message": broadcast.message,
+        "metadata": broadcast.metadata or {},
+        "created_at": broadcast.created_at.isoformat(),
+    })
+    return broadcast
+
+async def get_read_state(user_id: PydanticObjectId) -> NotificationReadState:
+    state = await NotificationReadState.find_one(NotificationReadState.user_id == user_id)
+    return state or NotificationReadState(user_id=user_id)
+
+def _is_read(broadcast: BroadcastNotification, state: NotificationReadState) -> bool:
+    return broadcast.created_at <= state.broadcast_watermark or broadcast.id in state.read_broadcast_ids
+
+def _broadcast_response(broadcast: BroadcastNotification, state: NotificationReadState) -> NotificationResponse:
+    return NotificationResponse(
+        id=broadcast.id,
+        title=broadcast.title,
+        message=broadcast.message,
+        notification_type=broadcast.notification_type,
+        status=NotificationStatus.READ if _is_read(broadcast, state) else NotificationStatus.UNREAD,
+        metadata=broadcast.metadata,
+        created_at=broadcast.created_at,
+        is_broadcast=True,
+    )
+
+async def unread_broadcasts(user_id: PydanticObjectId, state: Optional[NotificationReadState] = None) -> int:
+    state = state or await get_read_state(user_id)
+    return sum(1 for broadcast in await broadcasts.recent() if not _is_read(broadcast, state))
+
+async def unread_count(user_id: PydanticObjectId) -> int:
+    """Unread personal notifications plus unread broadcasts."""
+    state = await get_read_state(user_id)
+    # No counter yet, e.g. notifications stored before counters existed
+    personal = state.unread_count if state.id is not None else await recount_unread(user_id)
+    return personal + await unread_broadcasts(user_id, state)
+
+async def list_inbox(user_id: PydanticObjectId, cursor: Optional[str], limit: int) -> Tuple[List[NotificationResponse], Optional[str]]:
+    """One page of the merged inbox, newest first, and the next cursor."""
+    query = {"user_id": user_id, "status": {"$ne": NotificationStatus.ARCHIVED}}
+    after = None
+    if cursor:
+        after = decode_cursor(cursor, INBOX_SORT)
+        query = {"$and": [query, keyset_filter(after, INBOX_SORT)]}
+    
+    personal = await Notification.get_motor_collection().find(query).sort(INBOX_SORT).limit(limit + 1).to_list(limit + 1)
+    state = await get_read_state(user_id)
+    shared = [
+        broadcast for broadcast in await broadcasts.recent()
+        if after is None or (broadcast.created_at, broadcast.id) < (after["created_at"], after["_id"])
+    ]
+    
+    # Both streams are sorted newest first, merge just enough for one page
+    merged = heapq.merge(
+        ((doc["created_at"], doc["_id"], doc) for doc in personal),
+        ((broadcast.created_at, broadcast.id, broadcast) for broadcast in shared),
+        key=lambda item: (item[0], item[1]),
+        reverse=True,
+    )
+    page = list(islice(merged, limit + 1))
+    
+    items = [
+        _broadcast_response(item, state) if isinstance(item, BroadcastNotification)
+        else NotificationResponse(id=item["_id"], **{k: v for k, v in item.items() if k != "_id"})
+        for _, _, item in page[:limit]
+    ]
+    next_cursor = None
+    if len(page) > limit:
+        created_at, last_id, _ = page[limit - 1]
+        next_cursor = encode_cursor({"created_at": created_at, "_id": last_id})
+    return items, next_cursor
+
+async def mark_broadcast_read(user_id: PydanticObjectId, broadcast_id: PydanticObjectId):
+    """Mark one broadcast read for a user."""
+    collection = NotificationReadState.get_motor_collection()
+    await collection.update_one(
+        {"user_id": user_id},
+        {"$addToSet": {"read_broadcast_ids": broadcast_id}},
+        upsert=True,
+    )
+    
+    # Keep the per-user record small: once enough ids pile up, fold the
+    # oldest fully read prefix into the watermark
+    state = await get_read_state(user_id)
+    if len(state.read_broadcast_ids) > MAX_READ_IDS:
+        await mark_all_broadcasts_read(user_id, _fold_watermark(await broadcasts.recent(), state))
+    await inbox_cache.invalidate([user_id])
+
+def _fold_watermark(recent: List[BroadcastNotification], state: NotificationReadState) -> datetime:
+    watermark = state.broadcast_watermark
+    for broadcast in reversed(recent):
+        if broadcast.created_at <= watermark:
+            continue
+        if broadcast.id not in state.read_broadcast_ids:
+            break
+        watermark = broadcast.created_at
+    return watermark
+
+async def mark_all_broadcasts_read(user_id: PydanticObjectId, watermark: Optional[datetime] = None):
+    """Move the user's broadcast watermark, `now` by default."""
+    watermark = watermark or datetime.utcnow()
+    recent = await broadcasts.recent()
+    still_newer = [b.id for b in recent if b.created_at > watermark]
+    await NotificationReadState.get_motor_collection().update_one(
+        {"user_id": user_id},
+        [{"$set": {
+            "user_id": user_id,
+            "broadcast_watermark": {"$max": [{"$ifNull": ["$broadcast_watermark", watermark]}, watermark]},
+            "read_broadcast_ids": {"$setIntersection": [
+                {"$ifNull": ["$read_broadcast_ids", []]}, still_newer,
+            ]},
+        }}],
+        upsert=True,
+    )
+    await inbox_cache.invalidate([user_id])
+
+async def mark_read(user_id: PydanticObjectId, ids: Optional[List[PydanticObjectId]] = None) -> int:
+    """Mark personal notifications read, all of them when `ids` is None."""
+    query = {"user_id": user_id, "status": NotificationStatus.UNREAD}
+    if ids is not None:
+        query["_id"] = {"$in": ids}
+    result = await Notification.get_motor_collection().update_many(
+        query,
+        {"$set": {"status": NotificationStatus.READ, "read_at": datetime.utcnow()}},
+    )
+    await add_unread({user_id: -result.modified_count})
+    await inbox_cache.invalidate([user_id])
+    return result.modified_count
+
+async def archive(user_id: PydanticObjectId, ids: List[PydanticObjectId]) -> int:
+    """Archive personal notifications."""
+    collection = Notification.get_motor_collection()
+    now = datetime.utcnow()
+    
+    # Unread ones first, so the counter drops by exactly what changed
+    unread = await collection.update_many(
+        {"user_id": user_id, "_id": {"$in": ids}, "status": NotificationStatus.UNREAD},
+        {"$set": {"status": NotificationStatus.ARCHIVED, "read_at": now}},
+    )
+    read = await collection.update_many(
+        {"user_id": user_id, "_id": {"$in": ids}, "status": NotificationStatus.READ},
+        {"$set": {"status": NotificationStatus.ARCHIVED}},
+    )
+    await add_unread({user_id: -unread.modified_count})
+    await inbox_cache.invalidate([user_id])
+    return unread.modified_count + read.modified_count
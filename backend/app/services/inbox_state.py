@@ -0,0 +1,201 @@
+"""
+Maintained unread counters and a cached first inbox page.
+
+`NotificationReadState.unread_count` tracks unread personal
+notifications. It is bumped when notifications are stored and lowered
+by the number of documents a mark-read/archive actually changed, so the
+badge never needs a `count` over `notifications`.
+
+The first inbox page is kept rendered per user in memory and in Redis,
+and dropped whenever that user's notifications or read state change.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from beanie import PydanticObjectId
+from pymongo import UpdateOne
+from redis.exceptions import RedisError
+
+from app.core.redis import get_redis, publish, subscribe
+from app.models.notification import Notification, NotificationReadState, NotificationStatus
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = "inbox:invalidate"
+GENERATION_KEY = "inbox:generation"
+
+INBOX_CACHE_TTL_SECONDS = 60
+INBOX_CACHE_SIZE = 10000
+
+def _counter_update(user_id: PydanticObjectId, delta: int) -> UpdateOne:
+    # Pipeline update so the counter can never go below zero
+    return UpdateOne(
+        {"user_id": user_id},
+        [{"$set": {
+            "user_id": user_id,
+            "unread_count": {"$max": [0, {"$add": [{"$ifNull": ["$unread_count", 0]}, delta]}]},
+        }}],
+        upsert=True,
+    )
+
+async def add_unread(increments: Dict[PydanticObjectId, int]):
+    """Apply unread counter changes for many users in one bulk write."""
+    requests = [_counter_update(user_id, delta) for user_id, delta in increments.items() if delta]
+    if requests:
+        await NotificationReadState.get_motor_collection().bulk_write(requests, ordered=False)
+
+async def recount_unread(user_id: PydanticObjectId) -> int:
+    """Rebuild a user's counter from the notifications themselves.
+
+    Used when a user has no counter document yet; `recount_all_unread`
+    repairs counters created after older notifications were stored.
+    """
+    unread = await Notification.find(
+        Notification.user_id == user_id,
+        Notification.status == NotificationStatus.UNREAD,
+    ).count()
+    await NotificationReadState.get_motor_collection().update_one(
+        {"user_id": user_id}, {"$set": {"unread_count": unread}}, upsert=True
+    )
+    return unread
+
+async def recount_all_unread(batch_size: int = 1000) -> int:
+    """Rebuild every user's counter from the notifications themselves.
+
+    A one-off for notifications stored before counters existed: a counter
+    document created since, by a new notification or a read, only holds
+    the changes made after it. Returns how many users were written.
+    """
+    counts = {
+        row["_id"]: row["unread"]
+        async for row in Notification.get_motor_collection().aggregate([
+            {"$match": {"status": NotificationStatus.UNREAD.value}},
+            {"$group": {"_id": "$user_id", "unread": {"$sum": 1}}},
+        ])
+    }
+    collection = NotificationReadState.get_motor_collection()
+    written = 0
+    requests = []
+    async for user in User.get_motor_collection().find({}, {"_id": 1}):
+        requests.append(UpdateOne(
+            {"user_id": user["_id"]}, {"$set": {"unread_count": counts.get(user["_id"], 0)}}, upsert=True,
+        ))
+        if len(requests) >= batch_size:
+            await collection.bulk_write(requests, ordered=False)
+            written += len(requests)
+            requests = []
+    if requests:
+        await collection.bulk_write(requests, ordered=False)
+        written += len(requests)
+    return written
+
+class InboxCache:
+    """Rendered first inbox page per user, in memory and Redis.
+
+    Redis keeps one hash per user (`inbox:<generation>:<user id>`) so a
+    user's pages go with a single DEL. Broadcasts touch every inbox, so
+    they bump the generation instead and old keys simply expire.
+    """
+
+    def __init__(self, maxsize: int = INBOX_CACHE_SIZE, ttl: int = INBOX_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation: Optional[int] = None
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[bytes, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def _redis_key(self, redis, user_id: str) -> str:
+        if self.generation is None:
+            self.generation = int(await redis.get(GENERATION_KEY) or 0)
+        return f"inbox:{self.generation}:{user_id}"
+
+    async def get(self, user_id: PydanticObjectId, variant: str) -> Optional[bytes]:
+        key = (str(user_id), variant)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        
+        redis = get_redis()
+        if redis is not None:
+            try:
+                body = await redis.hget(await self._redis_key(redis, key[0]), variant)
+            except RedisError:
+                body = None
+            if body:
+                body = body.encode()
+                self._store(key, body)
+                self.hits += 1
+                return body
+        
+        self.misses += 1
+        return None
+
+    async def set(self, user_id: PydanticObjectId, variant: str, body: bytes):
+        key = (str(user_id), variant)
+        self._store(key, body)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                redis_key = await self._redis_key(redis, key[0])
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(redis_key, variant, body.decode())
+                    pipe.expire(redis_key, self.ttl)
+                    await pipe.execute()
+            except RedisError:
+                logger.warning("Could not cache inbox in Redis")
+
+    def _store(self, key: Tuple[str, str], body: bytes):
+        self._entries[key] = (body, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def evict_local(self, message: str):
+        if message.startswith("*"):
+            # A new generation, everything cached so far is stale
+            self.generation = int(message[1:])
+            self._entries.clear()
+            return
+        users = set(message.split(","))
+        for key in [key for key in self._entries if key[0] in users]:
+            del self._entries[key]
+
+    async def invalidate(self, user_ids: Iterable[PydanticObjectId]):
+        """Drop cached pages for these users on every worker."""
+        users = sorted({str(user_id) for user_id in user_ids})
+        if not users:
+            return
+        message = ",".join(users)
+        self.evict_local(message)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.delete(*[await self._redis_key(redis, user) for user in users])
+            except RedisError:
+                logger.warning("Could not drop cached inboxes from Redis")
+        await publish(INVALIDATE_CHANNEL, message)
+
+    async def invalidate_all(self):
+        """Drop every cached page, e.g. after a broadcast."""
+        generation = (self.generation or 0) + 1
+        redis = get_redis()
+        if redis is not None:
+            try:
+                generation = await redis.incr(GENERATION_KEY)
+            except RedisError:
+                logger.warning("Could not bump inbox cache generation in Redis")
+        self.evict_local(f"*{generation}")
+        await publish(INVALIDATE_CHANNEL, f"*{generation}")
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+inbox_cache = InboxCache()
+subscribe(INVALIDATE_CHANNEL, inbox_cache.evict_local)
@@ -0,0 +1,307 @@
+"""
+Notification email.
+
+`Mailer` keeps `pool_size` SMTP connections open and reuses them for
+every message, so a TLS handshake and login happen once per connection
+rather than once per email. Notifications to be emailed are queued and
+flushed in batches: one user lookup per batch, messages rendered from
+cached templates, the batch spread over the pool with each connection
+sending its share back to back, and one `update_many` marking
+`is_email_sent` for everything that went out. With Celery enabled the
+batches are sent by rate-limited tasks on the worker instead.
+"""
+
+import asyncio
+import logging
+import string
+from collections import OrderedDict
+from email.message import EmailMessage
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiosmtplib
+from bson import ObjectId
+
+from app.core.config import settings
+from app.models.notification import Notification, NotificationType
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# (subject, body) per notification type; only these can be emailed
+TEMPLATES: Dict[NotificationType, Tuple[str, str]] = {
+    NotificationType.DEPOSIT_CONFIRMATION: (
+        "$title",
+        "Hi $first_name,\n\n$message\n\nThanks for playing with $app_name.\n",
+    ),
+    NotificationType.WITHDRAWAL_CONFIRMATION: (
+        "$title",
+        "Hi $first_name,\n\n$message\n\nThanks for playing with $app_name.\n",
+    ),
+    NotificationType.BET_RESULT: (
+        "$title",
+        "Hi $first_name,\n\n$message\n\nSee your bet history in $app_name for details.\n",
+    ),
+}
+
+# Rendered (subject, body) pairs kept for repeated content
+RENDER_CACHE_SIZE = 4096
+
+_compiled: Dict[NotificationType, Tuple[string.Template, string.Template]] = {
+    notification_type: (string.Template(subject), string.Template(body))
+    for notification_type, (subject, body) in TEMPLATES.items()
+}
+_rendered: "OrderedDict[tuple, Tuple[str, str]]" = OrderedDict()
+
+def render(notification_type: NotificationType, context: Dict[str, str]) -> Tuple[str, str]:
+    """Render a template, reusing the result for identical contexts."""
+    key = (notification_type, *sorted(context.items()))
+    cached = _rendered.get(key)
+    if cached is not None:
+        _rendered.move_to_end(key)
+        return cached
+    
+    subject, body = _compiled[notification_type]
+    rendered = (subject.safe_substitute(context), body.safe_substitute(context))
+    _rendered[key] = rendered
+    if len(_rendered) > RENDER_CACHE_SIZE:
+        _rendered.popitem(last=False)
+    return rendered
+
+class Mailer:
+    """SMTP connection pool with a batching notification queue."""
+    
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        start_tls: bool = True,
+        pool_size: int = 4,
+        batch_size: int = 200,
+        window: float = 0.2,
+        sender: str = "no-reply@localhost",
+        types: Optional[Iterable[NotificationType]] = None,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.start_tls = start_tls
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.window = window
+        self.sender = sender
+        # Types that are emailed at all, the rest stay in the inbox only
+        self.types = set(TEMPLATES if types is None else types) & TEMPLATES.keys()
+        self._pool: "asyncio.Queue[aiosmtplib.SMTP]" = asyncio.Queue()
+        self._queue: "asyncio.Queue[dict]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._open = False
+        self.sent = 0
+        self.failed = 0
+        self.connects = 0
+    
+    def open(self):
+        """Create the connection pool; connections open on first use."""
+        if self._open:
+            return
+        for _ in range(self.pool_size):
+            self._pool.put_nowait(aiosmtplib.SMTP(
+                hostname=self.hostname, port=self.port, start_tls=self.start_tls, timeout=30,
+            ))
+        self._open = True
+    
+    def start(self):
+        if self._task is not None:
+            return
+        self.open()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Send what is queued, then close the pool."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        await self._flush(batch)
+    
+        while not self._pool.empty():
+            connection = self._pool.get_nowait()
+            if connection.is_connected:
+                try:
+                    await connection.quit()
+                except aiosmtplib.SMTPException:
+                    connection.close()
+        self._open = False
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+    
+    async def _connect(self, connection: aiosmtplib.SMTP):
+        await connection.connect()
+        if self.username:
+            await connection.login(self.username, self.password)
+        self.connects += 1
+    
+    async def _send(self, connection: aiosmtplib.SMTP, message: EmailMessage) -> bool:
+        for _ in range(2):
+            try:
+                if not connection.is_connected:
+                    await self._connect(connection)
+                await connection.send_message(message)
+                return True
+            except aiosmtplib.SMTPServerDisconnected:
+                # Idle connections get dropped by the server, reconnect once
+                connection.close()
+            except (aiosmtplib.SMTPException, OSError):
+                logger.exception("Could not send email to %s", message["To"])
+                return False
+        return False
+    
+    async def _send_share(self, messages: List[EmailMessage]) -> List[bool]:
+        # One pooled connection sends its share of a batch back to back
+        connection = await self._pool.get()
+        try:
+            return [await self._send(connection, message) for message in messages]
+        finally:
+            self._pool.put_nowait(connection)
+    
+    async def send_many(self, messages: List[EmailMessage]) -> List[bool]:
+        """Send messages over the whole pool, returning success per message."""
+        if not messages:
+            return []
+        shares = [messages[index::self.pool_size] for index in range(self.pool_size)]
+        outcomes = await asyncio.gather(*(self._send_share(share) for share in shares if share))
+    
+        # Undo the round-robin split
+        results = [False] * len(messages)
+        for index, share_results in enumerate(outcomes):
+            for position, ok in enumerate(share_results):
+                results[index + position * self.pool_size] = ok
+        sent = sum(results)
+        self.sent += sent
+        self.failed += len(messages) - sent
+        return results
+    
+    def submit(self, notifications: List[dict]):
+        """Queue stored notifications of emailed types for sending.
+        
+        With Celery the notifications go to the `bulk` queue instead, one
+        rate-limited task per `batch_size` of them, so a burst of
+        notifications is sent at the pace SMTP allows.
+        """
+        emailed = [
+            notification for notification in notifications
+            if NotificationType(notification["notification_type"]) in self.types
+        ]
+        if not emailed:
+            return
+        if settings.CELERY_ENABLED:
+            from app.workers import tasks
+            
+            for start in range(0, len(emailed), self.batch_size):
+                chunk = emailed[start:start + self.batch_size]
+                tasks.send_notification_emails.delay([str(notification["_id"]) for notification in chunk])
+            return
+        if not self.running:
+            return
+        for notification in emailed:
+            self._queue.put_nowait(notification)
+    
+    async def deliver(self, notification_ids: List[ObjectId]) -> int:
+        """Email stored notifications that have not been emailed yet.
+        
+        Used by the Celery email task; returns how many went out.
+        """
+        self.open()
+        batch = await Notification.get_motor_collection().find(
+            {"_id": {"$in": notification_ids}, "is_email_sent": False},
+            {"user_id": 1, "notification_type": 1, "title": 1, "message": 1},
+        ).to_list(None)
+        return await self._flush(batch)
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            except Exception:
+                logger.exception("Could not send %d notification emails", len(batch))
+    
+    async def _flush(self, batch: List[dict]) -> int:
+        if not batch:
+            return 0
+        user_ids = list({notification["user_id"] for notification in batch})
+        users = {
+            user["_id"]: user
+            async for user in User.get_motor_collection().find(
+                {"_id": {"$in": user_ids}}, {"email": 1, "first_name": 1},
+            )
+        }
+    
+        ids: List[ObjectId] = []
+        messages: List[EmailMessage] = []
+        for notification in batch:
+            user = users.get(notification["user_id"])
+            if user is None:
+                continue
+            subject, body = render(NotificationType(notification["notification_type"]), {
+                "title": notification["title"],
+                "message": notification["message"],
+                "first_name": user.get("first_name") or "",
+                "app_name": settings.APP_NAME,
+            })
+            message = EmailMessage()
+            message["From"] = self.sender
+            message["To"] = user["email"]
+            message["Subject"] = subject
+            message.set_content(body)
+            ids.append(notification["_id"])
+            messages.append(message)
+    
+        results = await self.send_many(messages)
+        sent = [notification_id for notification_id, ok in zip(ids, results) if ok]
+        if sent:
+            await Notification.get_motor_collection().update_many(
+                {"_id": {"$in": sent}}, {"$set": {"is_email_sent": True}}
+            )
+        return len(sent)
+    
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "connects": self.connects,
+            "queue_depth": self._queue.qsize(),
+        }
+
+mailer = Mailer(
+    hostname=settings.SMTP_SERVER,
+    port=settings.SMTP_PORT,
+    username=settings.SMTP_USERNAME or None,
+    password=settings.SMTP_PASSWORD or None,
+    start_tls=settings.SMTP_START_TLS,
+    pool_size=settings.SMTP_POOL_SIZE,
+    batch_size=settings.EMAIL_BATCH_SIZE,
+    window=settings.EMAIL_BATCH_WINDOW_MS / 1000,
+    sender=settings.SMTP_FROM,
+    types=[NotificationType(notification_type) for notification_type in settings.EMAIL_NOTIFICATION_TYPES],
+)
@@ -0,0 +1,394 @@
+"""
+Notification delivery.
+
+Producers call `publish`/`publish_many`. With Redis enabled, events go
+onto a Redis Stream and every worker runs two readers:
+
+- a persistence consumer in the shared `notifications:persist` group,
+  so each event is batch-inserted into `notifications` exactly once
+  across the fleet (unacked events are reclaimed from dead consumers);
+- a delivery reader that tails the stream with plain XREAD and pushes
+  events to the users connected to this worker.
+
+Broadcasts are pushed straight away. A personal notification is pushed
+once across the fleet: the workers its user is connected to each try to
+claim it with a conditional update on `is_push_sent`, and only the one
+that claimed it pushes. Claims wait for the notification to be stored,
+which takes one persistence batch.
+
+Without Redis, the same steps run against an in-process queue. Live
+connections never poll Mongo.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from beanie import PydanticObjectId
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from redis.exceptions import RedisError, ResponseError
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.notification import Notification, NotificationType
+from app.services.inbox_state import add_unread, inbox_cache
+from app.services.mailer import mailer
+
+logger = logging.getLogger(__name__)
+
+PERSIST_GROUP = "notifications:persist"
+
+# Events addressed to every connected user
+BROADCAST = "*"
+
+# Reclaim events a dead persistence consumer left unacked for this long
+RECLAIM_IDLE_MS = 60000
+
+DUPLICATE_KEY = 11000
+
+class Connection:
+    """One live client with a bounded outgoing buffer.
+
+    A full buffer drops the oldest event; a client that keeps falling
+    behind is disconnected instead of holding memory for it.
+    """
+
+    def __init__(self, user_id: str, buffer_size: int, max_dropped: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=buffer_size)
+        self.max_dropped = max_dropped
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, event: dict) -> bool:
+        if self.closed:
+            return False
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            if self.dropped > self.max_dropped:
+                self.closed = True
+                # Wake the sender so it notices the close
+                self.queue.put_nowait({"type": "close"})
+                return False
+        self.queue.put_nowait(event)
+        return True
+
+class NotificationHub:
+    """Connections on this worker, by user id."""
+
+    def __init__(self):
+        self._connections: Dict[str, Set[Connection]] = defaultdict(set)
+        self.delivered = 0
+        self.disconnected_slow = 0
+
+    def connect(self, user_id: str) -> Connection:
+        connection = Connection(
+            user_id,
+            settings.NOTIFICATION_CONNECTION_BUFFER,
+            settings.NOTIFICATION_MAX_DROPPED,
+        )
+        self._connections[user_id].add(connection)
+        return connection
+
+    def is_connected(self, user_id: str) -> bool:
+        return user_id in self._connections
+
+    def disconnect(self, connection: Connection):
+        connections = self._connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self._connections[connection.user_id]
+        if connection.closed:
+            self.disconnected_slow += 1
+
+    def deliver(self, event: dict) -> bool:
+        """Push an event to its user's connections, True if anyone got it."""
+        if event["user_id"] == BROADCAST:
+            targets = [c for connections in self._connections.values() for c in connections]
+        else:
+            targets = list(self._connections.get(event["user_id"], ()))
+        delivered = False
+        for connection in targets:
+            delivered = connection.offer(event) or delivered
+        self.delivered += delivered
+        return delivered
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(connections) for connections in self._connections.values())
+
+hub = NotificationHub()
+
+def build_event(
+    user_id: Any,
+    notification_type: NotificationType,
+    title: str,
+    message: str,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> dict:
+    """Create an event; the id is assigned up front and reused by Mongo."""
+    return {
+        "id": str(ObjectId()),
+        "user_id": str(user_id),
+        "type": notification_type.value,
+        "title": title,
+        "message": message,
+        "metadata": metadata or {},
+        "created_at": datetime.utcnow().isoformat(),
+    }
+
+def _to_stream(event: dict) -> dict:
+    return {**event, "metadata": json.dumps(event["metadata"])}
+
+def _from_stream(fields: dict) -> dict:
+    return {**fields, "metadata": json.loads(fields.get("metadata") or "{}")}
+
+class NotificationService:
+    def __init__(self):
+        self.consumer_name = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._local: "asyncio.Queue[dict]" = asyncio.Queue()
+        # Personal events for users connected here, waiting to be claimed
+        self._unclaimed: List[dict] = []
+        self._tasks: List[asyncio.Task] = []
+        self.persisted = 0
+
+    async def publish(self, event: dict):
+        await self.publish_many([event])
+
+    async def publish_many(self, events: List[dict]):
+        """Queue events for persistence and live delivery."""
+        if not events:
+            return
+        redis = get_redis()
+        if redis is not None:
+            try:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for event in events:
+                        pipe.xadd(
+                            settings.NOTIFICATION_STREAM,
+                            _to_stream(event),
+                            maxlen=settings.NOTIFICATION_STREAM_MAXLEN,
+                            approximate=True,
+                        )
+                    await pipe.execute()
+                return
+            except RedisError:
+                logger.warning("Notification stream unavailable, handling %d events locally", len(events))
+        
+        for event in events:
+            self._local.put_nowait(event)
+            self._deliver(event)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._claim_pushes()))
+        if get_redis() is not None:
+            self._tasks.append(asyncio.create_task(self._persist_stream()))
+            self._tasks.append(asyncio.create_task(self._deliver_stream()))
+        self._tasks.append(asyncio.create_task(self._persist_local()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        
+        # Keep whatever was still waiting locally
+        await self.flush()
+    
+    async def flush(self):
+        """Store events waiting in the local queue now."""
+        batch = []
+        while not self._local.empty():
+            batch.append(self._local.get_nowait())
+        await self._insert(batch)
+
+    def _deliver(self, event: dict):
+        if event["user_id"] == BROADCAST:
+            hub.deliver(event)
+        elif hub.is_connected(event["user_id"]):
+            self._unclaimed.append(event)
+
+    async def push_claimed(self, events: List[dict]) -> List[dict]:
+        """Push the events this worker claims, returning those not stored yet.
+
+        `update_many` only flips `is_push_sent` where it is still False and
+        tags what it flipped with this round's claim, so reading the tags
+        back tells which notifications are ours to push. Events still not
+        stored after NOTIFICATION_PUSH_CLAIM_TIMEOUT_SECONDS are dropped,
+        the inbox has them once they are.
+        """
+        events = [event for event in events if hub.is_connected(event["user_id"])]
+        if not events:
+            return []
+        collection = Notification.get_motor_collection()
+        ids = list({ObjectId(event["id"]) for event in events})
+        claim = uuid.uuid4().hex
+        await collection.update_many(
+            {"_id": {"$in": ids}, "is_push_sent": False},
+            {"$set": {"is_push_sent": True, "push_claim": claim}},
+        )
+        stored = {
+            document["_id"]: document.get("push_claim")
+            async for document in collection.find({"_id": {"$in": ids}}, {"push_claim": 1})
+        }
+
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.NOTIFICATION_PUSH_CLAIM_TIMEOUT_SECONDS)
+        waiting = []
+        pushed = set()
+        for event in events:
+            notification_id = ObjectId(event["id"])
+            if notification_id not in stored:
+                if datetime.fromisoformat(event["created_at"]) > cutoff:
+                    waiting.append(event)
+            elif stored[notification_id] == claim and notification_id not in pushed:
+                pushed.add(notification_id)
+                hub.deliver(event)
+        return waiting
+
+    async def _insert(self, events: List[dict]):
+        documents = [
+            Notification(
+                id=PydanticObjectId(event["id"]),
+                user_id=PydanticObjectId(event["user_id"]),
+                title=event["title"],
+                message=event["message"],
+                notification_type=NotificationType(event["type"]),
+                metadata=event["metadata"] or None,
+                created_at=datetime.fromisoformat(event["created_at"]),
+            )
+            for event in events if event["user_id"] != BROADCAST
+        ]
+        if not documents:
+            return
+        failed = set()
+        try:
+            await Notification.insert_many(documents, ordered=False)
+        except BulkWriteError as exc:
+            # Redelivered events were already stored and counted
+            errors = exc.details.get("writeErrors", [])
+            if any(error["code"] != DUPLICATE_KEY for error in errors):
+                raise
+            failed = {error["index"] for error in errors}
+        
+        increments = defaultdict(int)
+        stored = []
+        for index, document in enumerate(documents):
+            if index not in failed:
+                increments[document.user_id] += 1
+                stored.append(document)
+        await add_unread(increments)
+        await inbox_cache.invalidate(increments)
+        mailer.submit([
+            {
+                "_id": document.id,
+                "user_id": document.user_id,
+                "notification_type": document.notification_type,
+                "title": document.title,
+                "message": document.message,
+            }
+            for document in stored
+        ])
+        self.persisted += len(documents) - len(failed)
+
+    async def _persist_local(self):
+        while True:
+            batch = [await self._local.get()]
+            while not self._local.empty() and len(batch) < settings.NOTIFICATION_BATCH_SIZE:
+                batch.append(self._local.get_nowait())
+            try:
+                await self._insert(batch)
+            except Exception:
+                logger.exception("Could not store %d notifications", len(batch))
+
+    async def _persist_stream(self):
+        redis = get_redis()
+        stream = settings.NOTIFICATION_STREAM
+        try:
+            await redis.xgroup_create(stream, PERSIST_GROUP, id="0", mkstream=True)
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+        
+        loop = asyncio.get_running_loop()
+        next_reclaim = 0.0
+        while True:
+            try:
+                entries = []
+                if loop.time() >= next_reclaim:
+                    next_reclaim = loop.time() + RECLAIM_IDLE_MS / 1000
+                    _, claimed, *_ = await redis.xautoclaim(
+                        stream, PERSIST_GROUP, self.consumer_name,
+                        min_idle_time=RECLAIM_IDLE_MS, count=settings.NOTIFICATION_BATCH_SIZE,
+                    )
+                    entries = [entry for entry in claimed if entry[1]]
+                if not entries:
+                    response = await redis.xreadgroup(
+                        PERSIST_GROUP, self.consumer_name, {stream: ">"},
+                        count=settings.NOTIFICATION_BATCH_SIZE, block=1000,
+                    )
+                    entries = response[0][1] if response else []
+                if not entries:
+                    continue
+                
+                await self._insert([_from_stream(fields) for _, fields in entries])
+                await redis.xack(stream, PERSIST_GROUP, *[entry_id for entry_id, _ in entries])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification persistence consumer failed, retrying")
+                await asyncio.sleep(1)
+
+    async def _deliver_stream(self):
+        redis = get_redis()
+        last_id = "$"
+        while True:
+            try:
+                response = await redis.xread(
+                    {settings.NOTIFICATION_STREAM: last_id},
+                    count=settings.NOTIFICATION_BATCH_SIZE, block=1000,
+                )
+                for _, entries in response or []:
+                    for entry_id, fields in entries:
+                        last_id = entry_id
+                        self._deliver(_from_stream(fields))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification delivery reader failed, retrying")
+                await asyncio.sleep(1)
+
+    async def _claim_pushes(self):
+        while True:
+            await asyncio.sleep(settings.NOTIFICATION_PUSH_CLAIM_INTERVAL_MS / 1000)
+            if not self._unclaimed:
+                continue
+            events, self._unclaimed = self._unclaimed, []
+            try:
+                waiting = await self.push_claimed(events)
+            except Exception:
+                logger.exception("Could not claim %d notifications for push", len(events))
+                waiting = events
+            self._unclaimed = waiting + self._unclaimed
+
+    def stats(self) -> dict:
+        return {
+            "connections": hub.connection_count,
+            "delivered": hub.delivered,
+            "disconnected_slow": hub.disconnected_slow,
+            "persisted": self.persisted,
+            "local_queue_depth": self._local.qsize(),
+            "awaiting_push_claim": len(self._unclaimed),
+        }
+
+notification_service = NotificationService()
@@ -0,0 +1,371 @@
+"""
+Payment gateway webhooks.
+
+The webhook handler only does what is needed to acknowledge an event:
+
+1. verify the Stripe signature (HMAC-SHA256 over `<timestamp>.<body>`),
+2. drop replays: a per-worker Bloom filter of event ids seen here, then
+   a shared Redis marker when Redis is enabled,
+3. store the event once, the unique `event_id` index being the final
+   word on duplicates, and only then set the Redis marker,
+4. hand the event id to the processor and return.
+
+The processor's worker tasks claim stored events and apply them through
+the wallet, whose `reference_id` keys make each balance change happen
+at most once even if two different events describe the same payment.
+Deposits in a currency other than the wallet's are rejected without
+retries.
+
+Withdrawals are held before the payout is created: a `wallet.debit` with
+`hold=True`, its reference id carried in the payout's
+`metadata.reference_id`. `payout.paid` completes the held transaction,
+`payout.failed` gives the money back and marks it FAILED. Events that miss the in-memory queue (full queue, crash, another worker
+died mid-way) are picked up by a periodic sweep.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from beanie import PydanticObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from redis.exceptions import RedisError
+
+from app.core.bloom import BloomFilter
+from app.core.config import settings
+from app.core.money import from_minor
+from app.core.redis import get_redis
+from app.models.notification import NotificationType
+from app.models.payment import PaymentEvent, PaymentEventStatus
+from app.models.transaction import PaymentMethod, Transaction, TransactionStatus, TransactionType
+from app.services import wallet
+from app.services.notifications import build_event, notification_service
+
+logger = logging.getLogger(__name__)
+
+# Stripe payment method types we can map onto our own
+PAYMENT_METHODS = {
+    "card": PaymentMethod.CREDIT_CARD,
+    "us_bank_account": PaymentMethod.BANK_TRANSFER,
+    "sepa_debit": PaymentMethod.BANK_TRANSFER,
+    "bacs_debit": PaymentMethod.BANK_TRANSFER,
+}
+
+# Events left in RECEIVED or PROCESSING longer than this are picked up again
+SWEEP_INTERVAL_SECONDS = 30
+CLAIM_LEASE_SECONDS = 60
+
+class InvalidSignatureError(Exception):
+    """The webhook signature is missing, malformed, stale or wrong."""
+
+class PaymentRejectedError(Exception):
+    """The event can never be applied, retrying will not help."""
+
+def sign(payload: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """Build a `Stripe-Signature` header value for a payload."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signed = f"{timestamp}.".encode() + payload
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+def verify_signature(payload: bytes, header: Optional[str], secret: str, tolerance: int) -> None:
+    """Check a `Stripe-Signature` header against the raw request body."""
+    if not header:
+        raise InvalidSignatureError("Missing signature")
+    
+    timestamp = None
+    signatures = []
+    for item in header.split(","):
+        key, _, value = item.strip().partition("=")
+        if key == "t":
+            timestamp = value
+        elif key == "v1":
+            signatures.append(value)
+    if not timestamp or not timestamp.isdigit() or not signatures:
+        raise InvalidSignatureError("Malformed signature")
+    if abs(time.time() - int(timestamp)) > tolerance:
+        raise InvalidSignatureError("Signature timestamp outside tolerance")
+    
+    expected = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise InvalidSignatureError("Signature mismatch")
+
+def _reference(obj: dict) -> str:
+    return f"stripe:{obj['id']}"
+
+def _user_id(obj: dict) -> PydanticObjectId:
+    try:
+        return PydanticObjectId((obj.get("metadata") or {})["user_id"])
+    except (KeyError, TypeError, InvalidId):
+        raise PaymentRejectedError(f"{obj.get('id')} has no valid user_id in its metadata")
+
+async def _withdrawal(obj: dict) -> Transaction:
+    reference_id = (obj.get("metadata") or {}).get("reference_id")
+    if not isinstance(reference_id, str) or not reference_id:
+        raise PaymentRejectedError(f"Payout {obj['id']} has no withdrawal reference in its metadata")
+    transaction = await Transaction.find_one(Transaction.reference_id == reference_id)
+    if transaction is None or transaction.transaction_type != TransactionType.WITHDRAWAL:
+        raise PaymentRejectedError(f"Payout {obj['id']} has no withdrawal {reference_id}")
+    if transaction.status == TransactionStatus.PENDING and transaction.processed_at is None:
+        # The hold is still being taken, the retry will find it done
+        raise RuntimeError(f"Withdrawal {reference_id} is not held yet")
+    if transaction.status == TransactionStatus.FAILED and transaction.failure_reason != wallet.REVERSED:
+        raise PaymentRejectedError(f"Withdrawal {reference_id} was never taken")
+    return transaction
+
+async def _payment_succeeded(obj: dict, event_id: str):
+    currency = (obj.get("currency") or "").lower()
+    if currency != settings.WALLET_CURRENCY.lower():
+        raise PaymentRejectedError(f"Deposit {obj['id']} is in {currency or 'no currency'}, not {settings.WALLET_CURRENCY}")
+    
+    user_id = _user_id(obj)
+    amount = obj.get("amount_received") or obj["amount"]
+    method_types = obj.get("payment_method_types") or []
+    await wallet.credit(
+        user_id,
+        amount,
+        TransactionType.DEPOSIT,
+        reference_id=_reference(obj),
+        description=f"Deposit {obj['id']}",
+        payment_method=PAYMENT_METHODS.get(method_types[0]) if method_types else None,
+        gateway_response=obj,
+    )
+    await notification_service.publish(build_event(
+        user_id,
+        NotificationType.DEPOSIT_CONFIRMATION,
+        "Deposit received",
+        f"{from_minor(amount):.2f} has been added to your balance",
+        {"reference_id": _reference(obj), "amount": from_minor(amount)},
+    ))
+
+async def _payment_failed(obj: dict, event_id: str):
+    # Kept for the ledger, no balance change. Keyed by event so a failed
+    # attempt never takes the reference a later success is credited under
+    try:
+        await Transaction(
+            user_id=_user_id(obj),
+            transaction_type=TransactionType.DEPOSIT,
+            amount=obj["amount"],
+            status=TransactionStatus.FAILED,
+            description=f"Failed deposit {obj['id']}",
+            reference_id=f"{_reference(obj)}:failed:{event_id}",
+            payment_gateway_response=obj,
+            processed_at=datetime.utcnow(),
+        ).insert()
+    except DuplicateKeyError:
+        pass
+
+async def _payout_paid(obj: dict, event_id: str):
+    transaction = await _withdrawal(obj)
+    if not await wallet.complete_hold(transaction.reference_id, obj):
+        return  # Already completed, or reversed by an earlier payout.failed
+    await notification_service.publish(build_event(
+        transaction.user_id,
+        NotificationType.WITHDRAWAL_CONFIRMATION,
+        "Withdrawal sent",
+        f"{from_minor(transaction.amount):.2f} is on its way to you",
+        {"reference_id": transaction.reference_id, "amount": from_minor(transaction.amount)},
+    ))
+
+async def _payout_failed(obj: dict, event_id: str):
+    # Payouts can fail after being paid, so completed withdrawals are reversed too
+    transaction = await _withdrawal(obj)
+    if not await wallet.reverse(transaction, f"Failed withdrawal payout {obj['id']}", obj):
+        return
+    await notification_service.publish(build_event(
+        transaction.user_id,
+        NotificationType.WITHDRAWAL_CONFIRMATION,
+        "Withdrawal failed",
+        f"{from_minor(transaction.amount):.2f} has been returned to your balance",
+        {"reference_id": transaction.reference_id, "amount": from_minor(transaction.amount)},
+    ))
+
+HANDLERS = {
+    "payment_intent.succeeded": _payment_succeeded,
+    "payment_intent.payment_failed": _payment_failed,
+    "payout.paid": _payout_paid,
+    "payout.failed": _payout_failed,
+}
+
+class PaymentProcessor:
+    """Webhook intake plus a pool of worker tasks applying stored events."""
+    
+    def __init__(self, workers: int = 8, queue_size: int = 10000, bloom_capacity: int = 1000000):
+        self.workers = workers
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=queue_size)
+        self._seen = BloomFilter(bloom_capacity)
+        self._tasks = []
+        self.received = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.failed = 0
+    
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+    
+    async def stop(self):
+        """Stop the workers; anything not processed is left for the sweep."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def _already_seen(self, event_id: str) -> bool:
+        if event_id in self._seen:
+            # Bloom hits can be false positives, confirm before dropping
+            if await PaymentEvent.get_motor_collection().find_one({"event_id": event_id}, {"_id": 1}):
+                return True
+    
+        redis = get_redis()
+        if redis is not None:
+            try:
+                if await redis.exists(f"payments:event:{event_id}"):
+                    return True
+            except RedisError:
+                logger.warning("Redis unavailable for webhook dedup, relying on the unique index")
+        return False
+    
+    async def _mark_seen(self, event_id: str):
+        # Only once the event is stored, so a failed insert is retried rather than dropped
+        self._seen.add(event_id)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.set(f"payments:event:{event_id}", 1, ex=settings.PAYMENT_EVENT_DEDUP_TTL_SECONDS)
+            except RedisError:
+                logger.warning("Could not mark webhook event %s as seen in Redis", event_id)
+    
+    async def ingest(self, payload: bytes, signature: Optional[str]) -> bool:
+        """Verify and store a webhook event, True if it was new."""
+        verify_signature(
+            payload, signature, settings.STRIPE_WEBHOOK_SECRET,
+            settings.PAYMENT_WEBHOOK_TOLERANCE_SECONDS,
+        )
+        try:
+            event = json.loads(payload)
+            event_id, event_type = event["id"], event["type"]
+        except (ValueError, KeyError, TypeError):
+            raise InvalidSignatureError("Malformed event")
+    
+        if await self._already_seen(event_id):
+            self.duplicates += 1
+            return False
+    
+        try:
+            await PaymentEvent.get_motor_collection().insert_one({
+                "event_id": event_id,
+                "event_type": event_type,
+                "payload": event,
+                "status": PaymentEventStatus.RECEIVED.value,
+                "attempts": 0,
+                "received_at": datetime.utcnow(),
+            })
+        except DuplicateKeyError:
+            await self._mark_seen(event_id)
+            self.duplicates += 1
+            return False
+    
+        await self._mark_seen(event_id)
+        self.received += 1
+        try:
+            self._queue.put_nowait(event_id)
+        except asyncio.QueueFull:
+            pass  # Stored, the sweep will pick it up
+        return True
+    
+    async def _claim(self, event_id: str) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await PaymentEvent.get_motor_collection().find_one_and_update(
+            {"event_id": event_id, "$or": [
+                {"status": PaymentEventStatus.RECEIVED.value},
+                {"status": PaymentEventStatus.PROCESSING.value,
+                 "claimed_at": {"$lt": now - timedelta(seconds=CLAIM_LEASE_SECONDS)}},
+            ]},
+            {"$set": {"status": PaymentEventStatus.PROCESSING.value, "claimed_at": now}, "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+    
+    async def process(self, event_id: str):
+        """Apply one stored event if nobody else holds it."""
+        event = await self._claim(event_id)
+        if event is None:
+            return
+    
+        collection = PaymentEvent.get_motor_collection()
+        handler = HANDLERS.get(event["event_type"])
+        try:
+            if handler is not None:
+                await handler(event["payload"]["data"]["object"], event_id)
+        except PaymentRejectedError as exc:
+            logger.warning("Payment event %s rejected: %s", event_id, exc)
+            await collection.update_one({"_id": event["_id"]}, {"$set": {
+                "status": PaymentEventStatus.FAILED.value,
+                "last_error": str(exc),
+            }})
+            self.failed += 1
+            return
+        except Exception as exc:
+            logger.exception("Payment event %s failed (attempt %d)", event_id, event["attempts"])
+            give_up = event["attempts"] >= settings.PAYMENT_MAX_ATTEMPTS
+            await collection.update_one({"_id": event["_id"]}, {"$set": {
+                "status": (PaymentEventStatus.FAILED if give_up else PaymentEventStatus.RECEIVED).value,
+                "last_error": repr(exc),
+            }})
+            self.failed += give_up
+            return
+    
+        await collection.update_one({"_id": event["_id"]}, {"$set": {
+            "status": PaymentEventStatus.PROCESSED.value,
+            "processed_at": datetime.utcnow(),
+        }})
+        self.processed += 1
+    
+    async def _work(self):
+        while True:
+            event_id = await self._queue.get()
+            try:
+                await self.process(event_id)
+            except Exception:
+                logger.exception("Payment worker failed on %s", event_id)
+    
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+            try:
+                cutoff = datetime.utcnow() - timedelta(seconds=SWEEP_INTERVAL_SECONDS)
+                pending = PaymentEvent.get_motor_collection().find(
+                    {"status": {"$in": [PaymentEventStatus.RECEIVED.value, PaymentEventStatus.PROCESSING.value]},
+                     "received_at": {"$lt": cutoff}},
+                    {"event_id": 1},
+                ).sort("received_at", 1).limit(self._queue.maxsize // 2)
+                async for event in pending:
+                    if self._queue.full():
+                        break
+                    self._queue.put_nowait(event["event_id"])
+            except Exception:
+                logger.exception("Payment event sweep failed")
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "processed": self.processed,
+            "failed": self.failed,
+            "queue_depth": self._queue.qsize(),
+        }
+
+payment_processor = PaymentProcessor(
+    workers=settings.PAYMENT_WORKERS,
+    queue_size=settings.PAYMENT_QUEUE_SIZE,
+    bloom_capacity=settings.PAYMENT_EVENT_BLOOM_CAPACITY,
+)
@@ -0,0 +1,306 @@
+"""
+Live exposure totals for open game sessions.
+
+Every worker keeps per-session accumulators for the bets it has written,
+split over a few shards by session id. A background task swaps out one
+shard at a time and adds its deltas to the `GameSession` documents with
+a single `$inc` each, so workers never read-modify-write the totals.
+The updated documents come back from the same flush and are kept in
+memory, which is what the stats endpoint serves from, together with the
+deltas not flushed yet.
+
+Flushes only apply to open sessions. Closing a session recomputes its
+totals from the bets themselves, and settlement does so again once it
+has refunded bets accepted after the close, so neither drift from a lost
+flush nor a late bet reaches the final totals. As nothing is `$inc`-ed
+into a closed session, the recomputed totals can be `$set` safely.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from beanie import PydanticObjectId
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.core.money import from_minor, to_minor
+from app.core.redis import publish, subscribe
+from app.models.bet import Bet, BetStatus
+from app.models.game import GameSession
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = "sessions:invalidate"
+
+# Bets without a selection are counted under this outcome
+NO_SELECTION = "_"
+
+# Fields kept in memory per session
+SESSION_FIELDS = {
+    "game_id": 1, "session_data": 1, "started_at": 1, "ended_at": 1, "settled_at": 1,
+    "bet_count": 1, "total_bets": 1, "total_liability": 1, "total_payouts": 1, "outcomes": 1,
+}
+
+def outcome_key(bet_data: Optional[dict]) -> str:
+    """Outcome a bet is counted under, safe to use in a field path."""
+    selection = (bet_data or {}).get("selection")
+    if selection is None:
+        return NO_SELECTION
+    return str(selection).replace(".", "_").replace("$", "_")
+
+class Delta:
+    """Unflushed totals for one session, amounts in minor units."""
+    
+    __slots__ = ("bets", "staked", "liability", "outcomes")
+    
+    def __init__(self):
+        self.bets = 0
+        self.staked = 0
+        self.liability = 0
+        self.outcomes: Dict[str, List[int]] = {}
+    
+    def add(self, outcome: str, staked: int, liability: int):
+        self.bets += 1
+        self.staked += staked
+        self.liability += liability
+        counts = self.outcomes.setdefault(outcome, [0, 0, 0])
+        counts[0] += 1
+        counts[1] += staked
+        counts[2] += liability
+    
+    def merge(self, other: "Delta"):
+        self.bets += other.bets
+        self.staked += other.staked
+        self.liability += other.liability
+        for outcome, (bets, staked, liability) in other.outcomes.items():
+            counts = self.outcomes.setdefault(outcome, [0, 0, 0])
+            counts[0] += bets
+            counts[1] += staked
+            counts[2] += liability
+    
+    def increments(self) -> dict:
+        increments = {
+            "bet_count": self.bets,
+            "total_bets": from_minor(self.staked),
+            "total_liability": from_minor(self.liability),
+        }
+        for outcome, (bets, staked, liability) in self.outcomes.items():
+            increments[f"outcomes.{outcome}.bets"] = bets
+            increments[f"outcomes.{outcome}.staked"] = from_minor(staked)
+            increments[f"outcomes.{outcome}.liability"] = from_minor(liability)
+        return increments
+
+class SessionStats:
+    """Sharded per-session accumulators with a periodic `$inc` flush."""
+    
+    def __init__(self, shards: int = 16, interval: float = 1.0):
+        self.interval = interval
+        self._shards: List[Dict[PydanticObjectId, Delta]] = [{} for _ in range(shards)]
+        self._sessions: Dict[PydanticObjectId, tuple] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flush_errors = 0
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the flusher after writing out every pending delta."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+    
+    def _shard(self, session_id: PydanticObjectId) -> Dict[PydanticObjectId, Delta]:
+        return self._shards[hash(session_id) % len(self._shards)]
+    
+    def record(self, bets: List[Bet]):
+        """Count written bets towards their sessions."""
+        for bet in bets:
+            if bet.game_session_id is None:
+                continue
+            shard = self._shard(bet.game_session_id)
+            delta = shard.get(bet.game_session_id)
+            if delta is None:
+                delta = shard[bet.game_session_id] = Delta()
+            delta.add(outcome_key(bet.bet_data), to_minor(bet.bet_amount), to_minor(bet.potential_payout))
+    
+    async def get_session(self, session_id: PydanticObjectId) -> Optional[dict]:
+        """Session document from memory, loaded from Mongo when missing or stale."""
+        entry = self._sessions.get(session_id)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+    
+        session = await GameSession.get_motor_collection().find_one({"_id": session_id}, SESSION_FIELDS)
+        if session is not None:
+            self._keep(session)
+        return session
+    
+    def _keep(self, session: dict):
+        # Refreshed on every flush, the TTL only bounds what other workers add
+        self._sessions[session["_id"]] = (session, time.monotonic() + max(self.interval * 5, 5))
+    
+    async def snapshot(self, session_id: PydanticObjectId) -> Optional[dict]:
+        """Persisted totals plus this worker's unflushed deltas."""
+        session = await self.get_session(session_id)
+        if session is None:
+            return None
+    
+        outcomes = {
+            outcome: dict(counts) for outcome, counts in (session.get("outcomes") or {}).items()
+        }
+        snapshot = {
+            **session,
+            "bet_count": session.get("bet_count", 0),
+            "total_bets": session.get("total_bets", 0.0),
+            "total_liability": session.get("total_liability", 0.0),
+            "outcomes": outcomes,
+        }
+        delta = self._shard(session_id).get(session_id)
+        if delta is not None:
+            for field, value in delta.increments().items():
+                if field.startswith("outcomes."):
+                    _, outcome, counter = field.split(".")
+                    counts = outcomes.setdefault(outcome, {})
+                    counts[counter] = counts.get(counter, 0) + value
+                else:
+                    snapshot[field] += value
+        return snapshot
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Session stats flush failed")
+    
+    async def flush(self, session_id: Optional[PydanticObjectId] = None):
+        """Add pending deltas to the session documents, shard by shard."""
+        shards = [self._shard(session_id)] if session_id is not None else self._shards
+        for shard in shards:
+            if session_id is not None:
+                pending = {session_id: shard.pop(session_id)} if session_id in shard else {}
+            else:
+                pending = dict(shard)
+                shard.clear()
+            if pending:
+                await asyncio.gather(*(self._flush_one(pending_id, delta) for pending_id, delta in pending.items()))
+        self.flushes += 1
+    
+    async def _flush_one(self, session_id: PydanticObjectId, delta: Delta):
+        try:
+            session = await GameSession.get_motor_collection().find_one_and_update(
+                # A closed session's totals come from reconcile
+                {"_id": session_id, "ended_at": None},
+                {"$inc": delta.increments()},
+                projection=SESSION_FIELDS,
+                return_document=ReturnDocument.AFTER,
+            )
+        except Exception:
+            # Put the delta back for the next flush
+            self.flush_errors += 1
+            self._shard(session_id).setdefault(session_id, Delta()).merge(delta)
+            logger.exception("Could not flush stats for session %s", session_id)
+            return
+        if session is not None:
+            self._keep(session)
+    
+    async def reconcile(self, session_id: PydanticObjectId) -> Optional[dict]:
+        """Recompute a closed session's totals from its bets and store them.
+    
+        A run that started before the last stored one does not overwrite it.
+        """
+        self._shard(session_id).pop(session_id, None)
+        started = datetime.utcnow()
+    
+        rows = await Bet.get_motor_collection().aggregate([
+            {"$match": {
+                "game_session_id": session_id,
+                "status": {"$nin": [BetStatus.CANCELLED.value, BetStatus.REFUNDED.value]},
+            }},
+            {"$group": {
+                "_id": {"$ifNull": ["$bet_data.selection", NO_SELECTION]},
+                "bets": {"$sum": 1},
+                "staked": {"$sum": "$bet_amount"},
+                "liability": {"$sum": "$potential_payout"},
+            }},
+        ]).to_list(None)
+    
+        outcomes: Dict[str, dict] = {}
+        for row in rows:
+            counts = outcomes.setdefault(outcome_key({"selection": row["_id"]}), {"bets": 0, "staked": 0.0, "liability": 0.0})
+            for field in ("bets", "staked", "liability"):
+                counts[field] += row[field]
+    
+        collection = GameSession.get_motor_collection()
+        session = await collection.find_one_and_update(
+            {
+                "_id": session_id,
+                "ended_at": {"$ne": None},
+                "$or": [{"reconciled_at": None}, {"reconciled_at": {"$lt": started}}],
+            },
+            {"$set": {
+                "bet_count": sum(counts["bets"] for counts in outcomes.values()),
+                "total_bets": round(sum(counts["staked"] for counts in outcomes.values()), 2),
+                "total_liability": round(sum(counts["liability"] for counts in outcomes.values()), 2),
+                "outcomes": outcomes,
+                "reconciled_at": started,
+            }},
+            projection=SESSION_FIELDS,
+            return_document=ReturnDocument.AFTER,
+        )
+        if session is None:
+            session = await collection.find_one({"_id": session_id}, SESSION_FIELDS)
+        if session is not None:
+            self._keep(session)
+        return session
+    
+    async def close(self, session_id: PydanticObjectId, result=None) -> Optional[dict]:
+        """Stop a session taking bets and reconcile its totals.
+    
+        Returns None if the session does not exist or was already closed.
+        """
+        update = {"ended_at": datetime.utcnow()}
+        if result is not None:
+            update["session_data.result"] = result
+        closed = await GameSession.get_motor_collection().update_one(
+            {"_id": session_id, "ended_at": None},
+            {"$set": update},
+        )
+        if not closed.modified_count:
+            return None
+        await invalidate_session(session_id)
+        # Bets still in a write queue are picked up by settlement
+        return await self.reconcile(session_id)
+    
+    def _evict(self, session_id: str):
+        self._sessions.pop(PydanticObjectId(session_id), None)
+    
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "pending": sum(len(shard) for shard in self._shards),
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+        }
+
+session_stats = SessionStats(
+    shards=settings.SESSION_STATS_SHARDS,
+    interval=settings.SESSION_STATS_FLUSH_MS / 1000,
+)
+
+async def invalidate_session(session_id: PydanticObjectId):
+    """Drop a session from every worker's cache after it changes state."""
+    session_stats._evict(str(session_id))
+    await publish(INVALIDATE_CHANNEL, str(session_id))
+
+subscribe(INVALIDATE_CHANNEL, session_stats._evict)
@@ -0,0 +1,306 @@
+"""
+Batched settlement of a finished GameSession.
+
+Pending bets are streamed from a cursor in `_id` order and settled a
+batch at a time with unordered bulk writes:
+
+1. stamp the batch key on the bets (still PENDING),
+2. insert payout transactions, keyed `payout:<bet id>`,
+3. credit each winner once per batch, guarded by the batch key in
+   `User.recent_ops`, and add the batch to the statistics rollups,
+   guarded by the key in their `applied` lists,
+4. mark the transactions COMPLETED, add the batch payout to the session
+   totals, guarded by `settled_batches`, and only then mark the bets
+   WON/LOST.
+
+Every step is idempotent for a given batch key. After a crash, bets that
+still carry a `settlement_batch` are replayed under their original key
+before any new batch is started, so a rerun never double-credits. The
+bets are finalized last so a replayed batch always holds every bet it was
+claimed with and the session totals are never undercounted.
+
+Bets accepted after the session closed, against a cached open check,
+are refunded rather than settled. Bets placed in time but written after
+the main pass are caught by a second pass once `settled_at` is set, and
+anything written later still makes the bet writer settle the session
+again. Each run ends by reconciling the session totals.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+from beanie import PydanticObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.money import to_minor, from_minor
+from app.models.bet import Bet, BetStatus
+from app.models.game import GameSession
+from app.models.transaction import Transaction, TransactionStatus, TransactionType, PaymentMethod
+from app.models.notification import NotificationType
+from app.models.user import User
+from app.services import wallet
+from app.services.notifications import build_event, notification_service
+from app.services.session_stats import session_stats
+from app.services.stats import record_settlement
+from app.services.wallet import apply_delta, not_applied
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+# Projection for the settlement cursor, only what payouts need
+BET_FIELDS = {"user_id": 1, "game_id": 1, "bet_amount": 1, "potential_payout": 1, "bet_data": 1, "settlement_batch": 1, "settled_at": 1}
+
+Resolver = Callable[[dict, Any], bool]
+
+def selection_matches(bet: dict, result: Any) -> bool:
+    """Default resolver: the bet wins if its selection equals the session result."""
+    selection = (bet.get("bet_data") or {}).get("selection")
+    if isinstance(result, (list, tuple, set)):
+        return selection in result
+    return selection == result
+
+def compute_batch(bets: List[dict], result: Any, resolver: Resolver) -> Tuple[List[tuple], Dict[Any, int]]:
+    """Work out status and payout for a batch in one pass.
+
+    Returns (bet_id, status, payout_minor, user_id) rows and the summed
+    credit per user.
+    """
+    wins = [resolver(bet, result) for bet in bets]
+    rows = [
+        (bet["_id"], BetStatus.WON if won else BetStatus.LOST,
+         to_minor(bet["potential_payout"]) if won else 0, bet["user_id"])
+        for bet, won in zip(bets, wins)
+    ]
+    credits: Dict[Any, int] = defaultdict(int)
+    for _, bet_status, payout, user_id in rows:
+        if payout:
+            credits[user_id] += payout
+    return rows, credits
+
+async def _bulk(collection, requests: list, ignore_duplicates: bool = False):
+    if not requests:
+        return
+    try:
+        await collection.bulk_write(requests, ordered=False)
+    except BulkWriteError as exc:
+        errors = exc.details.get("writeErrors", [])
+        if not ignore_duplicates or any(error["code"] != DUPLICATE_KEY for error in errors):
+            raise
+
+async def _claim(key: str, bets: List[dict], now: datetime) -> List[dict]:
+    """Stamp `key` on the unclaimed bets and return those that carry it.
+
+    Bets another run claimed in the meantime are left to that run.
+    """
+    bets_collection = Bet.get_motor_collection()
+    ids = [bet["_id"] for bet in bets]
+    await _bulk(bets_collection, [
+        UpdateOne({"_id": bet_id, "status": BetStatus.PENDING, "settlement_batch": None},
+                  {"$set": {"settlement_batch": key, "settled_at": now}})
+        for bet_id in ids
+    ])
+    return await bets_collection.find(
+        {"_id": {"$in": ids}, "status": BetStatus.PENDING, "settlement_batch": key},
+        BET_FIELDS,
+    ).sort("_id", 1).to_list(None)
+
+async def _settle_batch(session_id: PydanticObjectId, key: str, bets: List[dict], result: Any, resolver: Resolver) -> dict:
+    bets_collection = Bet.get_motor_collection()
+    # A replayed batch keeps the time it was claimed, so it lands in the same rollup buckets
+    now = bets[0].get("settled_at") or datetime.utcnow()
+    
+    # 1. Claim the batch so a restart replays it under the same key
+    bets = await _claim(key, bets, now)
+    if not bets:
+        return {"bets": 0, "won": 0, "payout_minor": 0}
+    rows, credits = compute_batch(bets, result, resolver)
+    
+    # 2. Payout ledger entries, duplicates mean a previous attempt got here
+    references = [f"payout:{bet_id}" for bet_id, _, payout, _ in rows if payout]
+    await _bulk(Transaction.get_motor_collection(), [
+        InsertOne({
+            "user_id": user_id,
+            "transaction_type": TransactionType.BET_WON,
+            "amount": payout,
+            "payment_method": PaymentMethod.WALLET,
+            "status": TransactionStatus.PENDING,
+            "description": f"Payout for bet {bet_id}",
+            "reference_id": f"payout:{bet_id}",
+            "created_at": now,
+        })
+        for bet_id, _, payout, user_id in rows if payout
+    ], ignore_duplicates=True)
+    
+    # 3. One credit per user per batch
+    applied_at = datetime.utcnow()
+    await _bulk(User.get_motor_collection(), [
+        UpdateOne({"_id": user_id, **not_applied(key)}, apply_delta(amount, key, applied_at))
+        for user_id, amount in credits.items()
+    ])
+    await record_settlement(key, bets, rows, now)
+    
+    # 4. Finalize ledger and session totals, then release the bets
+    if references:
+        await Transaction.get_motor_collection().update_many(
+            {"reference_id": {"$in": references}, "status": TransactionStatus.PENDING},
+            {"$set": {"status": TransactionStatus.COMPLETED, "processed_at": now}},
+        )
+    total_payout = sum(credits.values())
+    await GameSession.get_motor_collection().update_one(
+        {"_id": session_id, "settled_batches": {"$ne": key}},
+        {"$inc": {"total_payouts": from_minor(total_payout)}, "$push": {"settled_batches": key}},
+    )
+    await _bulk(bets_collection, [
+        UpdateOne(
+            {"_id": bet_id, "status": BetStatus.PENDING},
+            {"$set": {"status": bet_status, "actual_payout": from_minor(payout), "settled_at": now},
+             "$unset": {"settlement_batch": ""}},
+        )
+        for bet_id, bet_status, payout, _ in rows
+    ])
+    
+    await notification_service.publish_many([
+        build_event(
+            user_id,
+            NotificationType.BET_RESULT,
+            "You won!" if bet_status == BetStatus.WON else "Bet settled",
+            f"Your bet won {from_minor(payout):.2f}" if bet_status == BetStatus.WON else "Your bet did not win this time",
+            {"bet_id": str(bet_id), "status": bet_status.value, "payout": from_minor(payout)},
+        )
+        for bet_id, bet_status, payout, user_id in rows
+    ])
+    
+    won = sum(1 for _, bet_status, _, _ in rows if bet_status == BetStatus.WON)
+    return {"bets": len(rows), "won": won, "payout_minor": total_payout}
+
+async def _refund_batch(key: str, bets: List[dict]) -> dict:
+    """Refund bets accepted after their session closed."""
+    now = bets[0].get("settled_at") or datetime.utcnow()
+    bets = await _claim(key, bets, now)
+    if not bets:
+        return {"refunded": 0}
+    
+    # Same key as the bet writer's refunds, so a stake is returned once
+    for bet in bets:
+        await wallet.credit(
+            bet["user_id"],
+            to_minor(bet["bet_amount"]),
+            TransactionType.BET_REFUND,
+            reference_id=f"refund:{bet['_id']}",
+            description=f"Refund for bet {bet['_id']} placed after the session closed",
+        )
+    await Bet.get_motor_collection().update_many(
+        {"_id": {"$in": [bet["_id"] for bet in bets]}, "status": BetStatus.PENDING},
+        {"$set": {"status": BetStatus.REFUNDED, "settled_at": now}, "$unset": {"settlement_batch": ""}},
+    )
+    
+    await notification_service.publish_many([
+        build_event(
+            bet["user_id"],
+            NotificationType.BET_RESULT,
+            "Bet refunded",
+            "Your bet arrived after betting closed and your stake has been returned",
+            {"bet_id": str(bet["_id"]), "status": BetStatus.REFUNDED.value, "payout": 0.0},
+        )
+        for bet in bets
+    ])
+    return {"refunded": len(bets)}
+
+async def _batches(query: dict, batch_size: int) -> AsyncIterator[List[dict]]:
+    cursor = Bet.get_motor_collection().find(query, BET_FIELDS).sort("_id", 1).batch_size(batch_size)
+    batch: List[dict] = []
+    async for bet in cursor:
+        batch.append(bet)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def _settle_pending(session: GameSession, result: Any, resolver: Resolver, batch_size: int, add: Callable[[dict], None]):
+    session_id = session.id
+    
+    # Replay batches interrupted by a crash under their original keys
+    interrupted = Bet.get_motor_collection().find(
+        {"game_session_id": session_id, "status": BetStatus.PENDING, "settlement_batch": {"$ne": None}},
+        BET_FIELDS,
+    ).sort([("settlement_batch", 1), ("_id", 1)])
+    batches: Dict[str, List[dict]] = defaultdict(list)
+    async for bet in interrupted:
+        batches[bet["settlement_batch"]].append(bet)
+    for key, bets in batches.items():
+        logger.info("Resuming settlement batch %s (%d bets)", key, len(bets))
+        if key.startswith("refund:"):
+            add(await _refund_batch(key, bets))
+        else:
+            add(await _settle_batch(session_id, key, bets, result, resolver))
+    
+    pending = {"game_session_id": session_id, "status": BetStatus.PENDING, "settlement_batch": None}
+    if session.ended_at is not None:
+        # Accepted after the session closed, on a stale open check
+        late = {**pending, "placed_at": {"$gt": session.ended_at}}
+        async for batch in _batches(late, batch_size):
+            add(await _refund_batch(f"refund:{session_id}:{batch[0]['_id']}", batch))
+        pending["placed_at"] = {"$lte": session.ended_at}
+    
+    async for batch in _batches(pending, batch_size):
+        add(await _settle_batch(session_id, f"settle:{session_id}:{batch[0]['_id']}", batch, result, resolver))
+
+async def settle_session(
+    session_id: PydanticObjectId,
+    result: Any = None,
+    resolver: Resolver = selection_matches,
+    batch_size: Optional[int] = None,
+) -> dict:
+    """Settle every pending bet of a session and return a summary.
+
+    `result` defaults to `session_data["result"]` on the session. Safe to
+    call again after a crash or on an already settled session.
+    """
+    batch_size = batch_size or settings.SETTLEMENT_BATCH_SIZE
+    session = await GameSession.get(session_id)
+    if session is None:
+        raise ValueError(f"Game session {session_id} not found")
+    if result is None:
+        result = (session.session_data or {}).get("result")
+    
+    summary = {"bets": 0, "won": 0, "payout_minor": 0, "refunded": 0, "batches": 0}
+    
+    def add(batch_summary: dict):
+        summary["batches"] += 1
+        for field in ("bets", "won", "payout_minor", "refunded"):
+            summary[field] += batch_summary.get(field, 0)
+    
+    await _settle_pending(session, result, resolver, batch_size, add)
+    await session.set({GameSession.settled_at: datetime.utcnow()})
+    # Bets written while the first pass ran; the bet writer handles any later
+    await _settle_pending(session, result, resolver, batch_size, add)
+    await session_stats.reconcile(session_id)
+    
+    logger.info("Settled session %s: %s", session_id, summary)
+    return summary
+
+# Settlement runs started in this process, kept so they are not collected
+_scheduled: Set[asyncio.Task] = set()
+
+def _settlement_done(task: asyncio.Task):
+    _scheduled.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background settlement failed", exc_info=task.exception())
+
+def schedule_settlement(session_id: PydanticObjectId):
+    """Settle a session on a Celery worker, or in this process without Celery."""
+    if settings.CELERY_ENABLED:
+        from app.workers import tasks
+        
+        tasks.settle_session.apply_async(args=[str(session_id)], priority=0)
+        return
+    task = asyncio.create_task(settle_session(session_id))
+    _scheduled.add(task)
+    task.add_done_callback(_settlement_done)
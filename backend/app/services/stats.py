@@ -0,0 +1,199 @@
+"""
+Per-user-per-day and per-game-per-hour betting rollups.
+
+Settlement calls `record_settlement` for every batch it settles, before
+the bets are finalized. Each rollup document lists the batch keys it has
+counted in `applied`, and the `$inc` is guarded by that list, so a
+replayed batch is never counted twice. Dashboards read a few dozen
+summary documents instead of aggregating over `bets`.
+
+`rebuild` recomputes whole past days from live and archived bets with a
+server-side aggregation that `$merge`s into the rollup collections.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from pymongo import UpdateOne
+
+from app.core.database import secondary_reads
+from app.core.money import MINOR_UNITS, to_minor
+from app.models.bet import Bet, BetStatus
+from app.models.stats import GameHourlyStats, UserDailyStats
+from app.services import archive
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("bets", "wins", "wagered", "won")
+
+def _day(when: datetime) -> datetime:
+    return when.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _hour(when: datetime) -> datetime:
+    return when.replace(minute=0, second=0, microsecond=0)
+
+def _guarded(collection_key: dict, key: str, increments: Dict[str, int]) -> List[UpdateOne]:
+    # Create the document first so the guarded update never has to upsert
+    return [
+        UpdateOne(collection_key, {"$setOnInsert": {**{field: 0 for field in COUNTERS}, "applied": []}}, upsert=True),
+        UpdateOne(
+            {**collection_key, "applied": {"$ne": key}},
+            {"$inc": increments, "$push": {"applied": key}},
+        ),
+    ]
+
+async def record_settlement(key: str, bets: List[dict], rows: List[tuple], now: datetime):
+    """Add one settlement batch to the rollups.
+    
+    `bets` are the settled documents and `rows` the matching
+    (bet_id, status, payout_minor, user_id) rows from `compute_batch`.
+    """
+    users: Dict[Any, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    games: Dict[Any, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    
+    for bet, (_, bet_status, payout, user_id) in zip(bets, rows):
+        game = str(bet["game_id"])
+        counts = {
+            "bets": 1,
+            "wins": int(bet_status == BetStatus.WON),
+            "wagered": to_minor(bet["bet_amount"]),
+            "won": payout,
+        }
+        for field, value in counts.items():
+            users[user_id][field] += value
+            users[user_id][f"games.{game}.{field}"] += value
+            games[bet["game_id"]][field] += value
+    
+    day, hour = _day(now), _hour(now)
+    user_requests = [
+        request
+        for user_id, increments in users.items()
+        for request in _guarded({"user_id": user_id, "day": day}, key, dict(increments))
+    ]
+    game_requests = [
+        request
+        for game_id, increments in games.items()
+        for request in _guarded({"game_id": game_id, "hour": hour}, key, dict(increments))
+    ]
+    if user_requests:
+        await UserDailyStats.get_motor_collection().bulk_write(user_requests, ordered=True)
+    if game_requests:
+        await GameHourlyStats.get_motor_collection().bulk_write(game_requests, ordered=True)
+
+def _summary(documents: List[dict], period: str) -> dict:
+    totals = {field: sum(document.get(field, 0) for document in documents) for field in COUNTERS}
+    return {
+        **totals,
+        "net": totals["won"] - totals["wagered"],
+        "series": [
+            {period: document[period], **{field: document.get(field, 0) for field in COUNTERS}}
+            for document in documents
+        ],
+    }
+
+async def user_stats(user_id: PydanticObjectId, days: int) -> dict:
+    """Totals, per-game totals and a daily series for the last `days` days."""
+    since = _day(datetime.utcnow()) - timedelta(days=days - 1)
+    documents = await secondary_reads(UserDailyStats.get_motor_collection()).find(
+        {"user_id": user_id, "day": {"$gte": since}},
+        {"applied": 0},
+    ).sort("day", 1).to_list(None)
+    
+    by_game: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for document in documents:
+        for game_id, counts in (document.get("games") or {}).items():
+            for field in COUNTERS:
+                by_game[game_id][field] += counts.get(field, 0)
+    
+    return {**_summary(documents, "day"), "games": dict(by_game)}
+
+async def game_stats(game_id: PydanticObjectId, hours: int) -> dict:
+    """Totals and an hourly series for the last `hours` hours."""
+    since = _hour(datetime.utcnow()) - timedelta(hours=hours - 1)
+    documents = await secondary_reads(GameHourlyStats.get_motor_collection()).find(
+        {"game_id": game_id, "hour": {"$gte": since}},
+        {"applied": 0},
+    ).sort("hour", 1).to_list(None)
+    return _summary(documents, "hour")
+
+def _minor(field: str) -> dict:
+    return {"$toLong": {"$round": [{"$multiply": [field, MINOR_UNITS]}, 0]}}
+
+async def _settled_bets(since: datetime, until: datetime) -> Tuple[Any, List[dict]]:
+    """Source collection and stages yielding settled bets from live and archived data."""
+    match = {"$match": {
+        "status": {"$in": [BetStatus.WON.value, BetStatus.LOST.value]},
+        "settled_at": {"$gte": since, "$lt": until},
+    }}
+    stages = [match]
+    for name in await archive.archive_months(archive.BETS):
+        # Bets are archived by placement month, which is never after settlement
+        if archive.month_range(name)[0] < until:
+            stages.append({"$unionWith": {"coll": name, "pipeline": [match]}})
+    stages.append({"$project": {
+        "user_id": 1,
+        "game_id": 1,
+        "settled_at": 1,
+        "win": {"$cond": [{"$eq": ["$status", BetStatus.WON.value]}, 1, 0]},
+        "wagered": _minor("$bet_amount"),
+        "won": _minor("$actual_payout"),
+    }})
+    return Bet.get_motor_collection(), stages
+
+def _sums(group_id: dict) -> dict:
+    return {
+        "$group": {
+            "_id": group_id,
+            "bets": {"$sum": 1},
+            "wins": {"$sum": "$win"},
+            "wagered": {"$sum": "$wagered"},
+            "won": {"$sum": "$won"},
+        }
+    }
+
+async def rebuild(since: datetime, until: Optional[datetime] = None) -> None:
+    """Recompute rollups for settled bets in [since, until) from scratch.
+    
+    Both bounds are truncated to whole days and `until` defaults to the
+    start of today, so buckets still receiving settlements are left to
+    `record_settlement`.
+    """
+    since = _day(since)
+    until = _day(until or datetime.utcnow())
+    
+    collection, source = await _settled_bets(since, until)
+    await collection.aggregate(source + [
+        _sums({"user_id": "$user_id", "day": {"$dateTrunc": {"date": "$settled_at", "unit": "day"}}, "game_id": "$game_id"}),
+        {"$group": {
+            "_id": {"user_id": "$_id.user_id", "day": "$_id.day"},
+            **{field: {"$sum": f"${field}"} for field in COUNTERS},
+            "games": {"$push": {"k": {"$toString": "$_id.game_id"}, "v": {field: f"${field}" for field in COUNTERS}}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "user_id": "$_id.user_id",
+            "day": "$_id.day",
+            **{field: 1 for field in COUNTERS},
+            "games": {"$arrayToObject": "$games"},
+            "applied": {"$literal": []},
+        }},
+        {"$merge": {"into": UserDailyStats.Settings.name, "on": ["user_id", "day"], "whenMatched": "replace"}},
+    ], allowDiskUse=True).to_list(None)
+    
+    collection, source = await _settled_bets(since, until)
+    await collection.aggregate(source + [
+        _sums({"game_id": "$game_id", "hour": {"$dateTrunc": {"date": "$settled_at", "unit": "hour"}}}),
+        {"$project": {
+            "_id": 0,
+            "game_id": "$_id.game_id",
+            "hour": "$_id.hour",
+            **{field: 1 for field in COUNTERS},
+            "applied": {"$literal": []},
+        }},
+        {"$merge": {"into": GameHourlyStats.Settings.name, "on": ["game_id", "hour"], "whenMatched": "replace"}},
+    ], allowDiskUse=True).to_list(None)
+    
+    logger.info("Rebuilt statistics rollups for %s to %s", since, until)
@@ -0,0 +1,64 @@
+import re
+from typing import List, Tuple
+
+from app.models.user import User
+
+# Fields never returned by listings
+USER_LIST_PROJECTION = {
+    "hashed_password": 0,
+    "recent_ops": 0,
+    "email_lower": 0,
+    "username_lower": 0,
+    "name_tokens": 0,
+}
+
+async def search_users(term: str, skip: int, limit: int) -> Tuple[List[dict], int]:
+    """Find users by email, username or name, best matches first.
+
+    Single words are matched as prefixes of the lowercased email,
+    username and name tokens, which the prefix indexes serve as range
+    scans. Exact email/username matches rank above prefix matches, which
+    rank above name matches. Multi-word terms go through the text index
+    and are ranked by text score.
+    """
+    term = term.strip().lower()
+    collection = User.get_motor_collection()
+    
+    if len(term.split()) > 1:
+        match = {"$text": {"$search": term}}
+        rank = {"$meta": "textScore"}
+    else:
+        prefix = {"$regex": f"^{re.escape(term)}"}
+        match = {"$or": [
+            {"email_lower": prefix},
+            {"username_lower": prefix},
+            {"name_tokens": prefix},
+        ]}
+        rank = {"$switch": {
+            "branches": [
+                {"case": {"$or": [{"$eq": ["$email_lower", term]}, {"$eq": ["$username_lower", term]}]}, "then": 3},
+                {"case": {"$or": [
+                    {"$eq": [{"$indexOfCP": ["$email_lower", term]}, 0]},
+                    {"$eq": [{"$indexOfCP": ["$username_lower", term]}, 0]},
+                ]}, "then": 2},
+            ],
+            "default": 1,
+        }}
+    
+    result = await collection.aggregate([
+        {"$match": match},
+        {"$facet": {
+            "users": [
+                {"$addFields": {"_rank": rank}},
+                {"$sort": {"_rank": -1, "_id": -1}},
+                {"$skip": skip},
+                {"$limit": limit},
+                {"$project": {**USER_LIST_PROJECTION, "_rank": 0}},
+            ],
+            "total": [{"$count": "count"}],
+        }},
+    ]).to_list(1)
+    
+    users = result[0]["users"] if result else []
+    total = result[0]["total"][0]["count"] if result and result[0]["total"] else 0
+    return users, total
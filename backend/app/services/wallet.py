@@ -0,0 +1,283 @@
+"""
+Wallet ledger.
+
+Every balance change is a single atomic `$inc` on the user document,
+guarded by conditions instead of read-modify-write:
+
+1. A PENDING `Transaction` is inserted with the operation's idempotency
+   key as `reference_id`. The unique index on `reference_id` makes a
+   replayed key land on the existing transaction.
+2. `find_one_and_update` applies the delta only if the key is not in the
+   user's `recent_ops` and, for debits, only if the balance covers it.
+   The key is recorded in `recent_ops` in the same update, so retrying
+   step 2 can never apply the delta twice.
+3. The transaction is completed with the balances from step 2.
+
+A debit made with `hold=True` takes the money but leaves its transaction
+PENDING (with `processed_at` set) until `complete_hold` or `reverse`
+finishes it, for withdrawals waiting on the payment gateway.
+
+A replayed key whose transaction is finished gets the stored outcome:
+the completed transaction, or the error it failed with. A crash between
+the steps leaves a PENDING transaction; replaying the same key finishes
+it. Keys stay in `recent_ops` for `WALLET_OP_KEY_TTL_HOURS` however
+many operations follow, longer than any replay waits.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from beanie import PydanticObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+from app.models.transaction import Transaction, TransactionStatus, TransactionType, PaymentMethod
+from app.models.user import User, UserStatus
+
+class WalletError(Exception):
+    """Base error for wallet operations, with the failed transaction if any."""
+    
+    reason = "error"
+    
+    def __init__(self, message: str, transaction: Optional[Transaction] = None):
+        super().__init__(message)
+        self.transaction = transaction
+
+class AccountNotFoundError(WalletError):
+    """The user does not exist or is not active."""
+    
+    reason = "account_not_found"
+
+class InsufficientFundsError(WalletError):
+    """The balance does not cover the debit."""
+    
+    reason = "insufficient_funds"
+
+# failure_reason of a debit given back with `reverse`
+REVERSED = "reversed"
+
+def _stored_failure(transaction: Transaction) -> WalletError:
+    for error in (AccountNotFoundError, InsufficientFundsError):
+        if transaction.failure_reason == error.reason:
+            return error(transaction.reference_id, transaction)
+    return WalletError(transaction.reference_id, transaction)
+
+def not_applied(key: str) -> dict:
+    """User filter: the operation `key` has not been applied yet."""
+    return {"recent_ops.key": {"$ne": key}}
+
+def apply_delta(delta: int, key: str, now: datetime) -> List[dict]:
+    """Pipeline update adding `delta` and recording `key`.
+    
+    Keys older than `WALLET_OP_KEY_TTL_HOURS` are dropped in the same
+    update, so the list is bounded by time rather than by count.
+    """
+    cutoff = now - timedelta(hours=settings.WALLET_OP_KEY_TTL_HOURS)
+    return [{"$set": {
+        "balance_minor": {"$add": ["$balance_minor", delta]},
+        "balance_version": {"$add": [{"$ifNull": ["$balance_version", 0]}, 1]},
+        "recent_ops": {"$concatArrays": [
+            {"$filter": {"input": {"$ifNull": ["$recent_ops", []]}, "cond": {"$gte": ["$$this.at", cutoff]}}},
+            [{"key": key, "at": now}],
+        ]},
+    }}]
+
+def new_reference() -> str:
+    """Generate a fresh idempotency key."""
+    return uuid.uuid4().hex
+
+async def debit(
+    user_id: PydanticObjectId,
+    amount: int,
+    transaction_type: TransactionType,
+    reference_id: Optional[str] = None,
+    description: Optional[str] = None,
+    payment_method: PaymentMethod = PaymentMethod.WALLET,
+    gateway_response: Optional[Dict[str, Any]] = None,
+    details: Optional[Dict[str, Any]] = None,
+    hold: bool = False,
+) -> Transaction:
+    """Take `amount` minor units from the user's balance.
+    
+    With `hold` the transaction stays PENDING until `complete_hold` or
+    `reverse`.
+    """
+    if amount <= 0:
+        raise ValueError("Debit amount must be positive")
+    return await _apply(
+        user_id, -amount, transaction_type, reference_id, description,
+        payment_method=payment_method, gateway_response=gateway_response, details=details, hold=hold,
+    )
+
+async def credit(
+    user_id: PydanticObjectId,
+    amount: int,
+    transaction_type: TransactionType,
+    reference_id: Optional[str] = None,
+    description: Optional[str] = None,
+    payment_method: PaymentMethod = PaymentMethod.WALLET,
+    gateway_response: Optional[Dict[str, Any]] = None,
+    details: Optional[Dict[str, Any]] = None,
+) -> Transaction:
+    """Add `amount` minor units to the user's balance."""
+    if amount <= 0:
+        raise ValueError("Credit amount must be positive")
+    return await _apply(
+        user_id, amount, transaction_type, reference_id, description,
+        payment_method=payment_method, gateway_response=gateway_response, details=details,
+    )
+
+async def complete_hold(reference_id: str, gateway_response: Optional[Dict[str, Any]] = None) -> bool:
+    """Complete a held debit, False if it was not waiting."""
+    update: Dict[str, Any] = {"status": TransactionStatus.COMPLETED.value, "updated_at": datetime.utcnow()}
+    if gateway_response is not None:
+        update["payment_gateway_response"] = gateway_response
+    result = await Transaction.get_motor_collection().update_one(
+        {"reference_id": reference_id, "status": TransactionStatus.PENDING.value, "processed_at": {"$ne": None}},
+        {"$set": update},
+    )
+    return result.modified_count == 1
+
+async def reverse(
+    transaction: Transaction,
+    description: Optional[str] = None,
+    gateway_response: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """Give back a held or completed debit and mark it FAILED.
+    
+    The money goes back as an ADJUSTMENT keyed `<reference_id>:reversal`,
+    so replays credit it once. False if it was already reversed.
+    """
+    await credit(
+        transaction.user_id,
+        transaction.amount,
+        TransactionType.ADJUSTMENT,
+        reference_id=f"{transaction.reference_id}:reversal",
+        description=description,
+        gateway_response=gateway_response,
+    )
+    result = await Transaction.get_motor_collection().update_one(
+        {"_id": transaction.id, "status": {"$in": [TransactionStatus.PENDING.value, TransactionStatus.COMPLETED.value]}},
+        {"$set": {
+            "status": TransactionStatus.FAILED.value,
+            "failure_reason": REVERSED,
+            "updated_at": datetime.utcnow(),
+        }},
+    )
+    return result.modified_count == 1
+
+async def set_balance(
+    user_id: PydanticObjectId,
+    target: int,
+    reference_id: Optional[str] = None,
+    description: Optional[str] = None,
+    retries: int = 5,
+) -> Optional[Transaction]:
+    """Move the balance to `target` with an ADJUSTMENT transaction.
+
+    The delta is computed from the balance read just before applying and
+    applied only if the balance is still the same (compare-and-set).
+    """
+    reference_id = reference_id or new_reference()
+    for attempt in range(retries):
+        user = await User.get(user_id)
+        if user is None:
+            raise AccountNotFoundError(str(user_id))
+        delta = target - user.balance_minor
+        if delta == 0:
+            return None
+        try:
+            return await _apply(
+                user_id, delta, TransactionType.ADJUSTMENT,
+                f"{reference_id}:{attempt}", description,
+                expected_balance=user.balance_minor,
+            )
+        except InsufficientFundsError:
+            # Balance moved underneath us, recompute the delta
+            continue
+    raise WalletError("Balance changed concurrently, adjustment not applied")
+
+async def _apply(
+    user_id: PydanticObjectId,
+    delta: int,
+    transaction_type: TransactionType,
+    reference_id: Optional[str],
+    description: Optional[str],
+    expected_balance: Optional[int] = None,
+    payment_method: PaymentMethod = PaymentMethod.WALLET,
+    gateway_response: Optional[Dict[str, Any]] = None,
+    details: Optional[Dict[str, Any]] = None,
+    hold: bool = False,
+) -> Transaction:
+    reference_id = reference_id or new_reference()
+    # Applied transactions always have processed_at; holds stay PENDING
+    applied = TransactionStatus.PENDING if hold else TransactionStatus.COMPLETED
+    transaction = Transaction(
+        user_id=user_id,
+        transaction_type=transaction_type,
+        amount=abs(delta),
+        payment_method=payment_method,
+        status=TransactionStatus.PENDING,
+        description=description,
+        reference_id=reference_id,
+        payment_gateway_response=gateway_response,
+        details=details,
+    )
+    try:
+        await transaction.insert()
+    except DuplicateKeyError:
+        transaction = await Transaction.find_one(Transaction.reference_id == reference_id)
+        held = transaction.status == TransactionStatus.PENDING and transaction.processed_at is not None
+        if transaction.status == TransactionStatus.COMPLETED or held:
+            return transaction
+        if transaction.status != TransactionStatus.PENDING:
+            raise _stored_failure(transaction)
+    
+    condition = {"_id": user_id, **not_applied(reference_id)}
+    if delta < 0:
+        condition["status"] = UserStatus.ACTIVE
+        condition["balance_minor"] = {"$gte": -delta}
+    if expected_balance is not None:
+        condition["balance_minor"] = expected_balance
+    
+    users = User.get_motor_collection()
+    now = datetime.utcnow()
+    updated = await users.find_one_and_update(
+        condition,
+        apply_delta(delta, reference_id, now),
+        projection={"balance_minor": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    
+    if updated is None:
+        user = await users.find_one(
+            {"_id": user_id}, {"status": 1, "recent_ops": {"$elemMatch": {"key": reference_id}}},
+        )
+        if user is not None and user.get("recent_ops"):
+            # Applied before a crash; the balances at that point are unknown
+            await transaction.set({
+                Transaction.status: applied,
+                Transaction.processed_at: now,
+            })
+            return transaction
+        
+        if user is None or (delta < 0 and user.get("status") != UserStatus.ACTIVE):
+            error = AccountNotFoundError(str(user_id), transaction)
+        else:
+            error = InsufficientFundsError(reference_id, transaction)
+        await transaction.set({
+            Transaction.status: TransactionStatus.FAILED,
+            Transaction.failure_reason: error.reason,
+            Transaction.processed_at: now,
+        })
+        raise error
+    
+    await transaction.set({
+        Transaction.status: applied,
+        Transaction.balance_after: updated["balance_minor"],
+        Transaction.balance_before: updated["balance_minor"] - delta,
+        Transaction.processed_at: now,
+    })
+    return transaction
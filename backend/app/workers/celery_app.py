@@ -0,0 +1,94 @@
+"""
+Celery application for work that should not run in the API process.
+
+Settlement runs on the `critical` queue and notification email on
+`bulk`, so a burst of mail never holds settlement up. Email tasks carry
+one batch each and are rate limited per worker by
+`EMAIL_TASK_RATE_LIMIT`. Run one worker per queue class, for example:
+    
+    celery -A app.workers.celery_app worker -Q critical -c 4
+    celery -A app.workers.celery_app worker -Q default,bulk -c 8
+
+Archival and rollup rebuilds are not Celery tasks, they run from
+`scripts/archive.py` and `scripts/rebuild_stats.py`.
+
+With `CELERY_BROKER_URL=memory://` and
+`CELERY_RESULT_BACKEND=cache+memory://` no Redis is needed; start an
+in-process worker with `celery.contrib.testing.worker.start_worker`.
+"""
+
+import asyncio
+from typing import Optional
+
+from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
+from kombu import Queue
+
+from app.core.config import settings
+
+celery_app = Celery(
+    "betting",
+    broker=settings.CELERY_BROKER_URL or settings.REDIS_URL,
+    backend=settings.CELERY_RESULT_BACKEND or settings.REDIS_URL,
+    include=["app.workers.tasks"],
+)
+
+celery_app.conf.update(
+    task_queues=[Queue("critical"), Queue("default"), Queue("bulk")],
+    task_default_queue="default",
+    task_routes={
+        "app.workers.tasks.settle_session": {"queue": "critical"},
+        "app.workers.tasks.send_notification_emails": {"queue": "bulk"},
+    },
+    # Priorities within a queue on the Redis transport, 0 is highest
+    broker_transport_options={"queue_order_strategy": "priority", "priority_steps": list(range(10))},
+    task_default_priority=5,
+    # Long tasks: take one message at a time and ack only once done
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    task_track_started=True,
+    result_extended=True,
+    result_expires=settings.CELERY_RESULT_EXPIRES_SECONDS,
+)
+
+# One event loop per worker process, shared by every task it runs
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def run_async(coroutine):
+    """Run a coroutine to completion on the worker process's loop."""
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        _loop.run_until_complete(_startup())
+    return _loop.run_until_complete(coroutine)
+
+async def _startup():
+    from app.core.database import init_database
+    from app.core.redis import init_redis
+    
+    # The loop only runs during tasks, leave indexes to the API and scripts/create_indexes.py
+    await init_database(indexes="skip")
+    await init_redis()
+
+async def _shutdown():
+    from app.core.database import close_database
+    from app.core.redis import close_redis
+    from app.services.mailer import mailer
+    
+    await mailer.stop()
+    await close_redis()
+    await close_database()
+
+@worker_process_init.connect
+def _init_worker(**kwargs):
+    run_async(asyncio.sleep(0))
+
+@worker_process_shutdown.connect
+def _shutdown_worker(**kwargs):
+    if _loop is not None:
+        _loop.run_until_complete(_shutdown())
+        _loop.close()
@@ -0,0 +1,30 @@
+from typing import Any, List
+
+from beanie import PydanticObjectId
+from bson import ObjectId
+
+from app.core.config import settings
+from app.workers.celery_app import celery_app, run_async
+
+@celery_app.task(name="app.workers.tasks.settle_session")
+def settle_session(session_id: str, result: Any = None) -> dict:
+    """Settle a closed game session."""
+    from app.services.settlement import settle_session as settle
+    
+    return run_async(settle(PydanticObjectId(session_id), result))
+
+@celery_app.task(
+    name="app.workers.tasks.send_notification_emails",
+    bind=True,
+    rate_limit=settings.EMAIL_TASK_RATE_LIMIT,
+    max_retries=5,
+)
+def send_notification_emails(self, notification_ids: List[str]) -> int:
+    """Email one batch of stored notifications, skipping any already sent."""
+    from app.services.mailer import mailer
+    
+    try:
+        return run_async(mailer.deliver([ObjectId(notification_id) for notification_id in notification_ids]))
+    except Exception as exc:
+        # A retry only resends what is still marked unsent
+        raise self.retry(exc=exc, countdown=2 ** self.request.retries)
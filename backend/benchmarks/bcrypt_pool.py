@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Login throughput vs. password hashing pool size.
+
+Runs the same batch of bcrypt verifications through PasswordService with
+1, 2, 4, ... up to the CPU count workers and prints verifications/sec
+for each size. Run from the backend directory:
+
+    python benchmarks/bcrypt_pool.py --requests 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.hashing import PasswordService, _hash_password
+
+
+async def measure(workers: int, requests: int, hashed: str) -> float:
+    service = PasswordService(workers=workers, queue_size=requests)
+    service.start()
+    try:
+        # Spin up the worker processes before timing
+        await asyncio.gather(*(service.verify("password123", hashed) for _ in range(workers)))
+        started = time.perf_counter()
+        await asyncio.gather(*(service.verify("password123", hashed) for _ in range(requests)))
+        return requests / (time.perf_counter() - started)
+    finally:
+        service.shutdown()
+
+
+async def run(args):
+    hashed = _hash_password("password123")
+    sizes = []
+    size = 1
+    while size < args.max_workers:
+        sizes.append(size)
+        size *= 2
+    sizes.append(args.max_workers)
+
+    baseline = None
+    print(f"{'workers':>8} {'verify/s':>10} {'speedup':>8}")
+    for workers in sizes:
+        rate = await measure(workers, args.requests, hashed)
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>10.1f} {rate / baseline:>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
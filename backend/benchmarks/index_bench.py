@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Index plan benchmark for bets, transactions and notifications.
+
+Seeds a throwaway database on a local mongod, then runs the hot queries
+twice: once with the old single-field indexes and once with the indexes
+declared on the models. For each query it prints the winning plan,
+keys/documents examined and median latency. Run from the backend
+directory:
+
+    python benchmarks/index_bench.py --mongodb-url mongodb://localhost:27017 --users 2000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel
+
+from app.models.bet import Bet
+from app.models.notification import Notification
+from app.models.transaction import Transaction
+
+MODELS = {"bets": Bet, "transactions": Transaction, "notifications": Notification}
+
+# The single-field indexes the models declared before the compound plan
+OLD_INDEXES = {
+    "bets": ["user_id", "game_id", "status", "placed_at"],
+    "transactions": ["user_id", "transaction_type", "status", "created_at", "reference_id"],
+    "notifications": ["user_id", "notification_type", "status", "created_at"],
+}
+
+
+def model_indexes(model):
+    return [IndexModel(index) if isinstance(index, str) else index for index in model.Settings.indexes]
+
+
+async def seed(db, args):
+    users = [ObjectId() for _ in range(args.users)]
+    sessions = [ObjectId() for _ in range(args.sessions)]
+    now = datetime.utcnow()
+    types = ["deposit", "withdrawal", "bet_placed", "bet_won"]
+
+    for start in range(0, args.bets, 20000):
+        await db.bets.insert_many([{
+            "user_id": random.choice(users), "game_id": ObjectId(),
+            "game_session_id": random.choice(sessions),
+            "bet_amount": 5.0, "potential_payout": 10.0, "odds": 2.0,
+            "status": "pending" if random.random() < 0.05 else random.choice(["won", "lost"]),
+            "placed_at": now - timedelta(minutes=random.randint(0, 60 * 24 * 90)),
+        } for _ in range(min(20000, args.bets - start))])
+        await db.transactions.insert_many([{
+            "user_id": random.choice(users), "transaction_type": random.choice(types),
+            "amount": 500, "status": "pending" if random.random() < 0.01 else "completed",
+            "created_at": now - timedelta(minutes=random.randint(0, 60 * 24 * 90)),
+        } for _ in range(min(20000, args.bets - start))])
+        await db.notifications.insert_many([{
+            "user_id": random.choice(users), "title": "t", "message": "m",
+            "notification_type": "bet_result",
+            "status": random.choice(["unread", "read", "read", "archived"]),
+            "created_at": now - timedelta(minutes=random.randint(0, 60 * 24 * 90)),
+        } for _ in range(min(20000, args.bets - start))])
+    return users, sessions
+
+
+def queries(users, sessions):
+    user = users[0]
+    session = sessions[0]
+    month_ago = datetime.utcnow() - timedelta(days=30)
+    return [
+        ("user bets by time", "bets", {"user_id": user}, [("placed_at", -1)]),
+        ("pending bets in session", "bets",
+         {"game_session_id": session, "status": "pending", "settlement_batch": None}, [("_id", 1)]),
+        ("user transactions by type and date", "transactions",
+         {"user_id": user, "transaction_type": "deposit", "created_at": {"$gte": month_ago}}, [("created_at", -1)]),
+        ("user transactions", "transactions", {"user_id": user}, [("created_at", -1)]),
+        ("stale pending transactions", "transactions",
+         {"status": "pending", "created_at": {"$lt": month_ago}}, [("created_at", 1)]),
+        ("inbox page", "notifications",
+         {"user_id": user, "status": {"$ne": "archived"}}, [("created_at", -1), ("_id", -1)]),
+        ("unread for user", "notifications", {"user_id": user, "status": "unread"}, None),
+    ]
+
+
+def plan_stages(plan):
+    stages = []
+    while plan:
+        name = plan.get("stage")
+        if plan.get("indexName"):
+            name += f"({plan['indexName']})"
+        stages.append(name)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " <- ".join(stages)
+
+
+async def measure(db, query_list, repeats):
+    rows = []
+    for name, collection, spec, sort in query_list:
+        cursor = db[collection].find(spec).limit(50)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stats = explain["executionStats"]
+
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            cursor = db[collection].find(spec).limit(50)
+            if sort:
+                cursor = cursor.sort(sort)
+            await cursor.to_list(50)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        rows.append((name, plan_stages(explain["queryPlanner"]["winningPlan"]),
+                     stats["totalKeysExamined"], stats["totalDocsExamined"], statistics.median(timings)))
+    return rows
+
+
+def report(label, rows):
+    print(f"\n== {label}")
+    for name, plan, keys, docs, median in rows:
+        print(f"{name:<36} keys={keys:<8} docs={docs:<8} p50={median:7.2f}ms  {plan}")
+
+
+async def run(args):
+    client = AsyncIOMotorClient(args.mongodb_url)
+    await client.drop_database(args.database)
+    db = client[args.database]
+    users, sessions = await seed(db, args)
+    query_list = queries(users, sessions)
+
+    for collection, fields in OLD_INDEXES.items():
+        await db[collection].create_indexes([IndexModel(field) for field in fields])
+    report("before: single-field indexes", await measure(db, query_list, args.repeats))
+
+    for collection, model in MODELS.items():
+        await db[collection].drop_indexes()
+        await db[collection].create_indexes(model_indexes(model))
+    report("after: compound and partial indexes", await measure(db, query_list, args.repeats))
+
+    for collection in MODELS:
+        stats = await db.command("collStats", collection)
+        print(f"{collection}: total index size {stats['totalIndexSize'] / 1024 / 1024:.1f} MiB")
+
+    await client.drop_database(args.database)
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="index_bench")
+    parser.add_argument("--bets", type=int, default=500000, help="Documents per collection")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
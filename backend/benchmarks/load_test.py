@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for the betting API.
+
+Runs a fixed number of concurrent clients against one endpoint and reports
+latency percentiles and throughput. Run it against the server before and
+after a change and compare the two reports, e.g.:
+
+    python benchmarks/load_test.py --url http://localhost:8000/api/v1/games/ \
+        --concurrency 500 --duration 30 --label after
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List, Optional
+
+import httpx
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Return the pct-th percentile of already sorted samples."""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+    return samples[index]
+
+
+async def worker(client: httpx.AsyncClient, args, deadline: float, latencies: List[float], errors: List[int]):
+    """Issue requests back to back until the deadline."""
+    body = json.loads(args.body) if args.body else None
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.request(args.method, args.url, json=body)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError:
+            errors.append(0)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(args) -> dict:
+    headers = {}
+    if args.token:
+        headers["Authorization"] = f"Bearer {args.token}"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    latencies: List[float] = []
+    errors: List[int] = []
+
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=args.timeout) as client:
+        # Warm up connections so the measured window is steady state
+        await asyncio.gather(*(client.get(args.url) for _ in range(min(args.concurrency, 50))), return_exceptions=True)
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            worker(client, args, deadline, latencies, errors) for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "label": args.label,
+        "url": args.url,
+        "concurrency": args.concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round((latencies[-1] if latencies else 0.0) * 1000, 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api/v1/games/")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--body", help="JSON request body")
+    parser.add_argument("--token", help="Bearer token for authenticated endpoints")
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--label", default="run")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
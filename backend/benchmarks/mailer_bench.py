@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Pooled mailer versus one SMTP connection per message.
+
+Starts a local aiosmtpd server that accepts and counts messages, then
+sends the same batch with a fresh connection per message and through
+`Mailer.send_many` at several pool sizes. aiosmtpd is a test
+dependency, in requirements-dev.txt. Run from the backend directory:
+
+    pip install -r requirements-dev.txt
+    python benchmarks/mailer_bench.py --messages 2000 --pool-sizes 1 4 8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+from app.models.notification import NotificationType
+from app.services.mailer import Mailer, render
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+def build_messages(count: int):
+    messages = []
+    for index in range(count):
+        subject, body = render(NotificationType.BET_RESULT, {
+            "title": "You won!",
+            "message": "Your bet won 20.00",
+            "first_name": f"Player{index % 50}",
+            "app_name": "Betting Application",
+        })
+        message = EmailMessage()
+        message["From"] = "no-reply@localhost"
+        message["To"] = f"player{index}@example.com"
+        message["Subject"] = subject
+        message.set_content(body)
+        messages.append(message)
+    return messages
+
+async def per_message(messages, port: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(message):
+        async with semaphore:
+            await aiosmtplib.send(message, hostname="127.0.0.1", port=port, start_tls=False)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(message) for message in messages))
+    return time.perf_counter() - started
+
+async def pooled(messages, port: int, pool_size: int) -> tuple:
+    mailer = Mailer("127.0.0.1", port, start_tls=False, pool_size=pool_size)
+    mailer.start()
+    started = time.perf_counter()
+    results = await mailer.send_many(messages)
+    elapsed = time.perf_counter() - started
+    await mailer.stop()
+    return elapsed, sum(results), mailer.connects
+
+async def run(args):
+    handler = CountingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+    controller.start()
+    try:
+        messages = build_messages(args.messages)
+
+        elapsed = await per_message(messages, args.port, args.concurrency)
+        print(f"connection per message (concurrency {args.concurrency}): "
+              f"{len(messages) / elapsed:8.0f} msg/s, {len(messages)} connections")
+
+        for pool_size in args.pool_sizes:
+            elapsed, sent, connects = await pooled(messages, args.port, pool_size)
+            print(f"pooled, {pool_size:>2} connections:{'':>21}"
+                  f"{sent / elapsed:8.0f} msg/s, {connects} connections")
+
+        print(f"server received {handler.received} messages")
+    finally:
+        controller.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8025)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
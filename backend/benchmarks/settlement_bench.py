@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Settlement benchmark with a synthetic game session.
+
+Generates a session with --bets pending bets spread over --users users,
+settles it with the batched engine, and checks the ledger afterwards:
+user balances, payout transactions and the session total must agree.
+Run from the backend directory against a throwaway database:
+
+    python benchmarks/settlement_bench.py --bets 1000000 --users 50000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from beanie import init_beanie
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.money import from_minor
+from app.models.bet import Bet, BetStatus
+from app.models.game import GameSession
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services.settlement import settle_session
+
+SELECTIONS = ["red", "black", "green"]
+
+
+async def generate_session(args) -> ObjectId:
+    """Insert users, a session and its pending bets."""
+    game_id = ObjectId()
+    session = GameSession(game_id=game_id, session_data={"result": "red"})
+    await session.insert()
+
+    user_ids = [ObjectId() for _ in range(args.users)]
+    users = User.get_motor_collection()
+    for start in range(0, len(user_ids), 10000):
+        await users.insert_many([
+            {"_id": uid, "email": f"user{uid}@example.com", "username": str(uid),
+             "hashed_password": "x", "first_name": "Bench", "last_name": "User",
+             "balance_minor": 0, "balance_version": 0, "recent_ops": []}
+            for uid in user_ids[start:start + 10000]
+        ], ordered=False)
+
+    bets = Bet.get_motor_collection()
+    for start in range(0, args.bets, 20000):
+        docs = []
+        for _ in range(min(20000, args.bets - start)):
+            amount = random.choice([1.0, 2.0, 5.0, 10.0])
+            odds = 2.0
+            docs.append({
+                "user_id": random.choice(user_ids), "game_id": game_id,
+                "game_session_id": session.id, "bet_amount": amount,
+                "potential_payout": amount * odds, "actual_payout": 0.0, "odds": odds,
+                "bet_type": "single", "status": BetStatus.PENDING.value,
+                "bet_data": {"selection": random.choice(SELECTIONS)},
+            })
+        await bets.insert_many(docs, ordered=False)
+    return session.id
+
+
+async def run(args):
+    client = AsyncIOMotorClient(args.mongodb_url)
+    await client.drop_database(args.database)
+    await init_beanie(database=client[args.database], document_models=[User, Bet, GameSession, Transaction])
+
+    started = time.perf_counter()
+    session_id = await generate_session(args)
+    print(f"generated {args.bets} bets for {args.users} users in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    summary = await settle_session(session_id, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"settled {summary['bets']} bets in {summary['batches']} batches in {elapsed:.2f}s "
+          f"({summary['bets'] / elapsed:.0f} bets/s)")
+
+    # Settling again must be a no-op
+    again = await settle_session(session_id, batch_size=args.batch_size)
+    assert again["bets"] == 0, "second settlement touched bets"
+
+    balances = await User.get_motor_collection().aggregate([
+        {"$group": {"_id": None, "total": {"$sum": "$balance_minor"}}}
+    ]).to_list(1)
+    session = await GameSession.get(session_id)
+    pending = await Bet.find(Bet.status == BetStatus.PENDING).count()
+    assert pending == 0, f"{pending} bets left pending"
+    assert balances[0]["total"] == summary["payout_minor"], "balances do not match payouts"
+    assert abs(session.total_payouts - from_minor(summary["payout_minor"])) < 0.01
+    print("✅ ledger consistent")
+
+    await client.drop_database(args.database)
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="settlement_bench")
+    parser.add_argument("--bets", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
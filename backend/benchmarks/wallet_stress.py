@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for the wallet ledger.
+
+Fires thousands of concurrent debits (and replays of the same keys)
+at one hot account on a local mongod, then checks that no update was
+lost or applied twice:
+
+    final balance == start balance - completed debits * amount
+
+Run from the backend directory against a throwaway database:
+
+    python benchmarks/wallet_stress.py --mongodb-url mongodb://localhost:27017 --ops 20000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+from app.models.user import User
+from app.services import wallet
+
+
+async def run(args):
+    client = AsyncIOMotorClient(args.mongodb_url, maxPoolSize=args.concurrency)
+    await client.drop_database(args.database)
+    await init_beanie(database=client[args.database], document_models=[User, Transaction])
+
+    # Enough to cover roughly 80% of the debits so some hit insufficient funds
+    start_balance = int(args.ops * args.amount * 0.8)
+    user = User(
+        email="hot@example.com",
+        username="hot",
+        hashed_password="x",
+        first_name="Hot",
+        last_name="Account",
+        balance_minor=start_balance,
+    )
+    await user.insert()
+
+    keys = [f"stress:{i}" for i in range(args.ops)]
+    # Replay a share of the keys to exercise idempotency
+    keys += random.sample(keys, int(args.ops * args.replay_ratio))
+    random.shuffle(keys)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    outcomes = {"ok": 0, "insufficient": 0}
+
+    async def one(key):
+        async with semaphore:
+            try:
+                await wallet.debit(user.id, args.amount, TransactionType.BET_PLACED, reference_id=key)
+                outcomes["ok"] += 1
+            except wallet.InsufficientFundsError:
+                outcomes["insufficient"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(key) for key in keys))
+    elapsed = time.perf_counter() - started
+
+    await user.sync()
+    completed = await Transaction.find(Transaction.status == TransactionStatus.COMPLETED).count()
+    expected = start_balance - completed * args.amount
+
+    print(f"operations:      {len(keys)} ({args.ops} unique keys)")
+    print(f"throughput:      {len(keys) / elapsed:.0f} ops/s at concurrency {args.concurrency}")
+    print(f"completed debits {completed}, rejected calls {outcomes['insufficient']}")
+    print(f"final balance:   {user.balance_minor} (expected {expected})")
+    assert user.balance_minor == expected, "lost or duplicated update"
+    assert user.balance_minor >= 0, "balance went negative"
+    print("✅ ledger consistent")
+
+    await client.drop_database(args.database)
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="wallet_stress")
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--amount", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--replay-ratio", type=float, default=0.1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
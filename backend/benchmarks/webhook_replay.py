@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Stand-in payment gateway: replays signed webhook events at a target rate.
+
+Generates Stripe-style `payment_intent.succeeded` events for a test
+user, signs them with the webhook secret and posts them to a running API,
+resending a share of them to exercise deduplication. Reports ack
+throughput and latency. Start the API first, then from the backend
+directory:
+
+    python benchmarks/webhook_replay.py --url http://localhost:8000 --user-id <id> --events 20000 --rate 5000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+
+import httpx
+
+def sign(payload: bytes, secret: str) -> str:
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+def make_event(user_id: str) -> bytes:
+    intent = f"pi_{uuid.uuid4().hex[:24]}"
+    amount = random.choice([500, 1000, 2500, 10000])
+    return json.dumps({
+        "id": f"evt_{uuid.uuid4().hex[:24]}",
+        "object": "event",
+        "type": "payment_intent.succeeded",
+        "created": int(time.time()),
+        "data": {"object": {
+            "id": intent,
+            "object": "payment_intent",
+            "amount": amount,
+            "amount_received": amount,
+            "currency": "usd",
+            "payment_method_types": ["card"],
+            "metadata": {"user_id": user_id},
+        }},
+    }).encode()
+
+async def run(args):
+    events = [make_event(args.user_id) for _ in range(args.events)]
+    # Gateways retry on timeouts, replay a share of the events
+    events += random.sample(events, int(args.events * args.duplicate_ratio))
+    random.shuffle(events)
+
+    url = args.url.rstrip("/") + "/api/v1/payments/webhook"
+    latencies = []
+    outcomes = {"new": 0, "duplicate": 0, "error": 0}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    interval = 1 / args.rate if args.rate else 0
+
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=args.concurrency)) as client:
+        async def send(payload: bytes):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, content=payload, headers={
+                        "Content-Type": "application/json",
+                        "Stripe-Signature": sign(payload, args.secret),
+                    })
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    if response.status_code != 200:
+                        outcomes["error"] += 1
+                    else:
+                        outcomes["duplicate" if response.json()["duplicate"] else "new"] += 1
+                except httpx.HTTPError:
+                    outcomes["error"] += 1
+
+        started = time.perf_counter()
+        tasks = []
+        for index, payload in enumerate(events):
+            # Pace submissions to the target rate
+            delay = started + index * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(payload)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"events:     {len(events)} ({args.events} unique)")
+    print(f"throughput: {len(events) / elapsed:.0f} acks/s")
+    print(f"outcomes:   {outcomes}")
+    if latencies:
+        print(f"ack ms:     p50={statistics.median(latencies):.2f} "
+              f"p99={latencies[int(len(latencies) * 0.99) - 1]:.2f} max={latencies[-1]:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--user-id", required=True, help="User credited by the generated deposits")
+    parser.add_argument("--secret", default=os.environ.get("STRIPE_WEBHOOK_SECRET", "whsec_test"))
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1)
+    parser.add_argument("--rate", type=float, default=2000, help="Events per second, 0 for unpaced")
+    parser.add_argument("--concurrency", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
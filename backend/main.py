@@ -1,19 +1,49 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.core.database import init_database, close_database
-from app.routers import auth, users, games
+from app.core.database import init_database, close_database, pool_metrics
+from app.core.deps import require_metrics_access
+from app.core.health import health_checker
+from app.core.redis import init_redis, close_redis
+from app.core.hashing import password_service
+from app.core.security import token_cache
+from app.core.principal import principal_cache
+from app.core.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware, threadpool_stats
+from app.core.profiling import ProfilerMiddleware
+from app.core.rate_limit import RateLimitMiddleware, rate_limiter
+from app.core.responses import FastJSONResponse
+from app.services.bet_writer import bet_writer
+from app.services.session_stats import session_stats
+from app.services.notifications import notification_service
+from app.services.payments import payment_processor
+from app.services.mailer import mailer
+from app.services.inbox_state import inbox_cache
+from app.routers import auth, users, games, bets, notifications, stats, payments, tasks
 
 # Async context manager for database lifecycle
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await init_database()
+    await init_redis()
+    password_service.start()
+    bet_writer.start()
+    session_stats.start()
+    notification_service.start()
+    payment_processor.start()
+    if settings.EMAIL_ENABLED:
+        mailer.start()
     yield
     # Shutdown
+    await payment_processor.stop()
+    await bet_writer.stop()
+    await session_stats.stop()
+    await notification_service.stop()
+    await mailer.stop()
+    password_service.shutdown()
+    await close_redis()
     await close_database()
 
 # Initialize FastAPI app
@@ -22,9 +52,18 @@ app = FastAPI(
     version=settings.APP_VERSION,
     description="A comprehensive betting application API",
     debug=settings.DEBUG,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Innermost, so a profile covers only the request itself
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+
+# Rate limits run before routing, so rejected requests stay cheap
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -34,10 +73,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so latency includes every other middleware
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(users.router, prefix="/api/v1")
 app.include_router(games.router, prefix="/api/v1")
+app.include_router(bets.router, prefix="/api/v1")
+app.include_router(notifications.router, prefix="/api/v1")
+app.include_router(stats.router, prefix="/api/v1")
+app.include_router(payments.router, prefix="/api/v1")
+app.include_router(tasks.router, prefix="/api/v1")
 
 @app.get("/")
 async def root():
@@ -47,6 +95,37 @@ async def root():
         "docs": "/docs"
     }
 
+# Service counters, read at scrape time
+REGISTRY.register_stats("mongodb_pool", pool_metrics.stats)
+REGISTRY.register_stats("threadpool", threadpool_stats)
+REGISTRY.register_stats("password_hashing", password_service.stats)
+REGISTRY.register_stats("jwt_cache", token_cache.stats)
+REGISTRY.register_stats("principal_cache", principal_cache.stats)
+REGISTRY.register_stats("rate_limit", rate_limiter.stats)
+REGISTRY.register_stats("bet_writer", bet_writer.stats)
+REGISTRY.register_stats("session_stats", session_stats.stats)
+REGISTRY.register_stats("notifications", notification_service.stats)
+REGISTRY.register_stats("payments", payment_processor.stats)
+REGISTRY.register_stats("email", mailer.stats)
+REGISTRY.register_stats("inbox_cache", inbox_cache.stats)
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_access)])
+    async def metrics():
+        """Prometheus text exposition for this worker process (scraper or admin only)."""
+        return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 @app.get("/health")
+@app.get("/health/live")
 async def health_check():
+    """Liveness: the worker's event loop is answering."""
     return {"status": "healthy"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: Mongo and Redis answer pings, 503 otherwise."""
+    result = await health_checker.ready()
+    return FastJSONResponse(
+        {"status": "ready" if result["ready"] else "not_ready", **result},
+        status_code=200 if result["ready"] else 503,
+    )
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Move settled bets and completed transactions into monthly archives.
+
+Intended to run from cron. Stopping it part-way is safe; the next run
+picks up whatever is still in the live collections.
+
+    python scripts/archive.py --older-than-days 90 --batch-size 1000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.database import init_database, close_database
+from app.services import archive
+
+async def run(args):
+    await init_database()
+    before = datetime.utcnow() - timedelta(days=args.older_than_days)
+    try:
+        for name in args.collections:
+            summary = await archive.archive(archive.SPECS[name], before, args.batch_size)
+            print(f"✅ Archived {summary['archived']} {name} in {summary['batches']} batches")
+    finally:
+        await close_database()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--collections", nargs="+", choices=sorted(archive.SPECS), default=sorted(archive.SPECS))
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Rebuild every user's unread notification counter.
+
+Counters are maintained as notifications are stored and read, but a
+user with notifications from before counters existed gets a counter
+document on their next notification or read that misses the older
+ones. Run this once after deploying the counters, ideally with little
+traffic: a notification stored while it runs can be left out of its
+user's count. Safe to run more than once.
+
+    python scripts/backfill_unread_counts.py
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import init_database, close_database
+from app.services.inbox_state import recount_all_unread
+
+async def run(args):
+    await init_database(indexes="skip")
+    try:
+        users = await recount_all_unread(args.batch_size)
+        print(f"✅ Rebuilt unread counters for {users} users")
+    finally:
+        await close_database()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Counter updates per bulk write")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Backfill the normalized search fields on existing users.
+
+New and updated users get `email_lower`, `username_lower` and
+`name_tokens` on write; this fills them in for documents written before
+the search indexes existed. Safe to run more than once.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+
+async def backfill():
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    users = client[settings.DATABASE_NAME].users
+    result = await users.update_many(
+        {},
+        [{"$set": {
+            "email_lower": {"$toLower": "$email"},
+            "username_lower": {"$toLower": "$username"},
+            "name_tokens": {"$filter": {
+                "input": {"$split": [
+                    {"$toLower": {"$concat": [
+                        {"$ifNull": ["$first_name", ""]}, " ", {"$ifNull": ["$last_name", ""]},
+                    ]}},
+                    " ",
+                ]},
+                "cond": {"$ne": ["$$this", ""]},
+            }},
+        }}],
+    )
+    print(f"✅ Updated search fields on {result.modified_count} users")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
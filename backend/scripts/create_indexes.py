@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Create the indexes declared on every model.
+
+Run it as a release step before deploying model changes when the API
+starts with INDEX_CREATION=skip; with the default "background" mode
+each worker also does this at startup. Existing indexes are never
+dropped. Indexes no model declares, retired ones and any added by hand,
+are listed, and dropped only with --drop-undeclared. Safe to run more
+than once.
+
+    python scripts/create_indexes.py
+    python scripts/create_indexes.py --drop-undeclared
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import (
+    init_database, close_database, create_indexes, document_models, get_database_client, undeclared_indexes,
+)
+from app.core.config import settings
+
+async def run(args):
+    await init_database(indexes="skip")
+    try:
+        started = time.perf_counter()
+        await create_indexes()
+        print(f"✅ Created indexes for {len(document_models())} models in {time.perf_counter() - started:.1f}s")
+        
+        database = (await get_database_client())[settings.DATABASE_NAME]
+        for collection, names in (await undeclared_indexes()).items():
+            for name in names:
+                if args.drop_undeclared:
+                    await database[collection].drop_index(name)
+                    print(f"🗑️  Dropped {collection}.{name}")
+                else:
+                    print(f"ℹ️  {collection}.{name} is not declared on any model")
+    finally:
+        await close_database()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drop-undeclared", action="store_true", help="Drop indexes no model declares")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
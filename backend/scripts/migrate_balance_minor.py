@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+One-off migration from float amounts to integer minor units.
+
+Converts every user that still has the old float `User.balance` to
+`User.balance_minor`, and every transaction (live or archived) whose
+`amount`, `balance_before` or `balance_after` is still a float. Each is
+a server-side update; converted values are integers, so running it again
+finds nothing left to do.
+"""
+
+import asyncio
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.core.money import MINOR_UNITS
+
+# Transaction fields that held decimal amounts before the wallet ledger
+TRANSACTION_AMOUNT_FIELDS = ("amount", "balance_before", "balance_after")
+
+def _to_minor(field: str) -> dict:
+    return {"$toLong": {"$round": [{"$multiply": [f"${field}", MINOR_UNITS]}, 0]}}
+
+async def migrate_transactions(database) -> int:
+    """Convert float ledger amounts in `transactions` and its archives."""
+    pattern = re.compile(r"^transactions(_archive_\d{4}_\d{2})?$")
+    names = [name for name in await database.list_collection_names() if pattern.match(name)]
+    converted = 0
+    for name in names:
+        for field in TRANSACTION_AMOUNT_FIELDS:
+            result = await database[name].update_many(
+                {field: {"$type": "double"}},
+                [{"$set": {field: _to_minor(field)}}],
+            )
+            converted += result.modified_count
+    return converted
+
+async def migrate():
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    database = client[settings.DATABASE_NAME]
+    users = database.users
+    result = await users.update_many(
+        {"balance": {"$exists": True}},
+        [
+            {"$set": {
+                "balance_minor": _to_minor("balance"),
+                "recent_ops": {"$ifNull": ["$recent_ops", []]},
+            }},
+            {"$unset": "balance"},
+        ],
+    )
+    print(f"✅ Migrated {result.modified_count} users to minor-unit balances")
+    converted = await migrate_transactions(database)
+    print(f"✅ Converted {converted} transaction amounts to minor units")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
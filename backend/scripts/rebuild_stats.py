@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Rebuild the per-user-per-day and per-game-per-hour statistics rollups.
+
+Recomputes whole days of settled bets, live and archived, with a
+server-side aggregation and replaces the matching rollup documents. Use
+it once to backfill history, or to repair a range of days. Safe to run
+more than once.
+
+    python scripts/rebuild_stats.py --days 365
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import init_database, close_database
+from app.services import stats
+
+async def run(args):
+    await init_database()
+    try:
+        await stats.rebuild(datetime.utcnow() - timedelta(days=args.days))
+        print(f"✅ Rebuilt statistics for the last {args.days} days")
+    finally:
+        await close_database()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90, help="How many whole days back to rebuild")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.models.bet import Bet, BetStatus
+from app.services import archive
+
+pytestmark = pytest.mark.asyncio
+
+@pytest.fixture(autouse=True)
+def fresh_archive_state():
+    # Both caches outlive each test's database
+    archive._months.clear()
+    archive._indexed.clear()
+
+async def place(user_id, placed_at: datetime, status: BetStatus = BetStatus.WON) -> Bet:
+    bet = Bet(
+        user_id=user_id, game_id=PydanticObjectId(), bet_amount=10.0, potential_payout=20.0, odds=2.0,
+        status=status, placed_at=placed_at,
+    )
+    await bet.insert()
+    return bet
+
+async def pages(user_id, limit: int) -> list:
+    seen, cursor = [], None
+    while True:
+        items, cursor = await archive.history(archive.BETS, user_id, cursor, limit)
+        seen.append([item["_id"] for item in items])
+        if cursor is None:
+            return seen
+
+async def test_history_pages_through_live_rows_and_every_archive_month(db):
+    user_id, other = PydanticObjectId(), PydanticObjectId()
+    now = datetime.utcnow().replace(microsecond=0)
+    bets = [await place(user_id, now - timedelta(days=days)) for days in (1, 2, 100, 101, 130, 160, 161, 200)]
+    # Old but still pending, so it stays live among the archived months
+    bets.append(await place(user_id, now - timedelta(days=150), BetStatus.PENDING))
+    await place(other, now - timedelta(days=120))
+
+    summary = await archive.archive(archive.BETS, batch_size=2)
+    assert summary["archived"] == 7
+    assert len(await archive.archive_months(archive.BETS)) >= 3
+
+    expected = [bet.id for bet in sorted(bets, key=lambda bet: (bet.placed_at, bet.id), reverse=True)]
+    for limit in (1, 2, 4, 20):
+        seen = await pages(user_id, limit)
+        assert [bet_id for page in seen for bet_id in page] == expected
+        assert all(len(page) == limit for page in seen[:-1])
+
+async def test_live_only_history_skips_the_archive(db):
+    user_id = PydanticObjectId()
+    now = datetime.utcnow().replace(microsecond=0)
+    recent = await place(user_id, now - timedelta(days=1))
+    await place(user_id, now - timedelta(days=120))
+    await archive.archive(archive.BETS)
+
+    items, cursor = await archive.history(archive.BETS, user_id, None, 10, include_archive=False)
+    assert [item["_id"] for item in items] == [recent.id]
+    assert cursor is None
+
+async def test_archiving_again_moves_nothing_twice(db):
+    user_id = PydanticObjectId()
+    old = await place(user_id, datetime.utcnow() - timedelta(days=120))
+    name = archive.archive_name(archive.BETS, old.placed_at)
+
+    assert (await archive.archive(archive.BETS))["archived"] == 1
+    assert (await archive.archive(archive.BETS))["archived"] == 0
+    assert await db[name].count_documents({"_id": old.id}) == 1
+    assert await Bet.get(old.id) is None
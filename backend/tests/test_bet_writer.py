@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+from beanie import PydanticObjectId
+from pymongo.errors import BulkWriteError
+
+from app.models.bet import Bet
+from app.models.transaction import Transaction, TransactionType
+from app.models.user import User
+from app.services import wallet
+from app.services.bet_writer import BetWriter
+
+pytestmark = pytest.mark.asyncio
+
+async def test_stakes_for_bets_never_written_are_refunded(make_user):
+    user = await make_user(balance_minor=2000)
+    written, lost = PydanticObjectId(), PydanticObjectId()
+    await wallet.debit(
+        user.id, 1500, TransactionType.BET_PLACED,
+        reference_id=f"bets:{written}",
+        details={"bets": {str(written): 1000, str(lost): 500}},
+    )
+    await Bet(
+        id=written, user_id=user.id, game_id=PydanticObjectId(),
+        bet_amount=10.0, potential_payout=20.0, odds=2.0,
+    ).insert()
+    writer = BetWriter()
+    since, until = datetime.utcnow() - timedelta(minutes=1), datetime.utcnow() + timedelta(minutes=1)
+
+    assert await writer.recover_orphaned_stakes(since, until) == 1
+    assert (await User.get(user.id)).balance_minor == 1000
+    refund = await Transaction.find_one(Transaction.reference_id == f"refund:{lost}")
+    assert refund.amount == 500
+
+    # Already refunded, a later sweep leaves it alone
+    assert await writer.recover_orphaned_stakes(since, until) == 0
+    assert (await User.get(user.id)).balance_minor == 1000
+
+async def test_recent_stakes_are_left_to_the_writer(make_user):
+    user = await make_user(balance_minor=1000)
+    bet_id = PydanticObjectId()
+    await wallet.debit(user.id, 1000, TransactionType.BET_PLACED, reference_id=f"bet:{bet_id}")
+
+    # Inside the grace period the bet may still be on its way
+    cutoff = datetime.utcnow() - timedelta(minutes=10)
+    assert await BetWriter().recover_orphaned_stakes(cutoff - timedelta(days=1), cutoff) == 0
+    assert (await User.get(user.id)).balance_minor == 0
+
+async def test_failed_batch_refunds_only_the_bets_that_did_not_land(make_user, monkeypatch):
+    user = await make_user(balance_minor=2000)
+    bets = [
+        Bet(
+            id=PydanticObjectId(), user_id=user.id, game_id=PydanticObjectId(),
+            bet_amount=10.0, potential_payout=20.0, odds=2.0,
+        )
+        for _ in range(2)
+    ]
+    landed, lost = bets
+    await wallet.debit(
+        user.id, 2000, TransactionType.BET_PLACED,
+        reference_id=f"bets:{landed.id}",
+        details={"bets": {str(bet.id): 1000 for bet in bets}},
+    )
+
+    # The first bet is written, the second fails on every attempt
+    insert_many = Bet.insert_many
+    attempts = []
+
+    async def partial(documents, **kwargs):
+        if not attempts:
+            await insert_many(documents[:1], **kwargs)
+        attempts.append(len(documents))
+        raise BulkWriteError({"writeErrors": [{"index": 1, "code": 121, "errmsg": "Document failed validation"}]})
+
+    monkeypatch.setattr(Bet, "insert_many", partial)
+    writer = BetWriter()
+    await writer._flush(bets)
+
+    assert attempts == [2, 2, 2]
+    assert await Bet.get(landed.id) is not None
+    assert (await User.get(user.id)).balance_minor == 1000
+    assert await Transaction.find_one(Transaction.reference_id == f"refund:{landed.id}") is None
+    assert (await Transaction.find_one(Transaction.reference_id == f"refund:{lost.id}")).amount == 1000
+    assert writer.flushed == 1
+
+    since, until = datetime.utcnow() - timedelta(minutes=1), datetime.utcnow() + timedelta(minutes=1)
+    assert await writer.recover_orphaned_stakes(since, until) == 0
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from beanie import PydanticObjectId
+
+from app.models.bet import BetType
+from app.routers.bets import _server_odds
+from app.schemas.betting import BetCreate
+
+# Only the odds table is read, documents need a bound collection to be built
+GAME = SimpleNamespace(odds={"red": 2.0, "multiple:red": 1.5, "multiple": 3.0, "*": 10.0})
+
+def bet(selection=None, bet_type=BetType.SINGLE, odds=2.0) -> BetCreate:
+    return BetCreate(
+        game_id=PydanticObjectId(),
+        bet_amount=10.0,
+        odds=odds,
+        bet_type=bet_type,
+        bet_data={"selection": selection} if selection is not None else None,
+    )
+
+def test_selection_price_wins_over_defaults():
+    assert _server_odds(GAME, None, bet("red")) == 2.0
+    assert _server_odds(GAME, None, bet("red", BetType.MULTIPLE)) == 1.5
+    assert _server_odds(GAME, None, bet("black", BetType.MULTIPLE)) == 3.0
+    assert _server_odds(GAME, None, bet("black")) == 10.0
+    assert _server_odds(GAME, None, bet()) == 10.0
+
+def test_session_prices_override_the_game():
+    session = {"session_data": {"odds": {"red": 1.8}}}
+
+    assert _server_odds(GAME, session, bet("red")) == 1.8
+    assert _server_odds(GAME, session, bet("black")) == 10.0
+
+def test_unpriced_selection_has_no_odds():
+    game = SimpleNamespace(odds={"red": 2.0})
+
+    assert _server_odds(game, None, bet("black")) is None
+    assert _server_odds(game, {"session_data": None}, bet("red")) == 2.0
@@ -0,0 +1,6 @@
+import os
+
+from app.core.config import settings
+
+def test_motor_gets_a_thread_per_pooled_connection():
+    assert int(os.environ["MOTOR_MAX_WORKERS"]) >= settings.MONGODB_MAX_POOL_SIZE
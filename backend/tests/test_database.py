@@ -0,0 +1,55 @@
+import pytest
+
+from app.core import database
+from app.core.database import create_indexes, document_models, undeclared_indexes
+
+pytestmark = pytest.mark.asyncio
+
+async def index_names(db, collection: str) -> set:
+    return set(await db[collection].index_information())
+
+async def test_unique_indexes_are_created_on_their_own(db):
+    for model in document_models():
+        await model.get_motor_collection().drop_indexes()
+
+    await create_indexes(unique=True)
+
+    assert await index_names(db, "users") == {"_id_", "email_1", "username_1"}
+    assert await index_names(db, "transactions") == {"_id_", "reference_id_unique"}
+    assert await index_names(db, "payment_events") == {"_id_", "event_id_unique"}
+    assert await index_names(db, "notification_read_state") == {"_id_", "user_id_1"}
+
+    await create_indexes(unique=False)
+
+    assert {"created_at_id", "user_text"} <= await index_names(db, "users")
+    assert await undeclared_indexes() == {}
+
+async def test_indexes_added_by_hand_are_kept(db):
+    await db.users.create_index("phone", name="ops_phone")
+
+    await create_indexes()
+
+    assert "ops_phone" in await index_names(db, "users")
+    assert await undeclared_indexes() == {"users": ["ops_phone"]}
+
+async def test_background_mode_builds_unique_indexes_before_returning(db, monkeypatch):
+    calls = []
+
+    async def record(unique=None):
+        calls.append(unique)
+
+    async def nothing(_client):
+        pass
+
+    monkeypatch.setattr(database, "create_indexes", record)
+    monkeypatch.setattr(database, "_warm_up", nothing)
+    monkeypatch.setattr(database.settings, "DATABASE_NAME", db.name)
+
+    await database.init_database(indexes="background")
+    assert calls == [True]
+    assert database.index_status == "pending"
+    await database._index_task
+
+    assert calls == [True, False]
+    assert database.index_status == "ready"
+    await database.close_database()
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from app.core import database, health
+from app.core.health import HealthChecker
+
+pytestmark = pytest.mark.asyncio
+
+class Admin:
+    """Stands in for `client.admin`, counting pings."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.pings = 0
+
+    async def command(self, name: str):
+        self.pings += 1
+        await asyncio.sleep(self.delay)
+
+@pytest.fixture
+def mongo(monkeypatch):
+    monkeypatch.setattr(health, "get_redis", lambda: None)
+
+    def connect(delay: float = 0.0) -> Admin:
+        admin = Admin(delay)
+        monkeypatch.setattr(database, "client", type("Client", (), {"admin": admin})())
+        return admin
+
+    monkeypatch.setattr(database, "client", None)
+    return connect
+
+async def test_not_ready_before_mongo_is_connected(mongo):
+    result = await HealthChecker().ready()
+
+    assert result["ready"] is False
+    assert result["checks"]["mongodb"] == {"ok": False, "error": "RuntimeError: not connected"}
+
+async def test_concurrent_probes_share_one_cached_check(mongo):
+    admin = mongo(delay=0.05)
+    checker = HealthChecker(ttl=0.2)
+
+    results = await asyncio.gather(*(checker.ready() for _ in range(20)))
+    assert admin.pings == 1
+    assert all(result["ready"] for result in results)
+
+    await checker.ready()
+    assert admin.pings == 1
+    await asyncio.sleep(0.25)
+    await checker.ready()
+    assert admin.pings == 2
+
+async def test_slow_mongo_is_not_ready_and_the_failure_is_cached(mongo):
+    admin = mongo(delay=1.0)
+    checker = HealthChecker(ttl=60, timeout=0.05)
+
+    result = await checker.ready()
+    assert result["ready"] is False
+    assert result["checks"]["mongodb"]["error"] == "timed out after 0.05s"
+
+    await checker.ready()
+    assert admin.pings == 1
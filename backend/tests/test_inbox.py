@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.notification import (
+    BroadcastNotification,
+    Notification,
+    NotificationReadState,
+    NotificationType,
+)
+from app.services import inbox
+from app.services.inbox_state import add_unread, recount_all_unread
+
+pytestmark = pytest.mark.asyncio
+
+@pytest.fixture(autouse=True)
+def fresh_broadcasts():
+    # The cache outlives each test's database
+    inbox.broadcasts.invalidate()
+
+async def notify(user, count: int) -> list:
+    notifications = [
+        Notification(user_id=user.id, title="Hi", message="Hello", notification_type=NotificationType.GENERAL)
+        for _ in range(count)
+    ]
+    await Notification.insert_many(notifications)
+    return notifications
+
+async def broadcast(minutes_ago: int) -> BroadcastNotification:
+    # Whole seconds, Mongo keeps milliseconds only
+    created_at = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=minutes_ago)
+    item = BroadcastNotification(
+        title="Promo", message="Free spins", notification_type=NotificationType.PROMOTION, created_at=created_at,
+    )
+    await item.insert()
+    return item
+
+async def test_counter_follows_stores_reads_and_archives(make_user):
+    user = await make_user()
+    stored = await notify(user, 3)
+    await add_unread({user.id: 3})
+
+    assert await inbox.unread_count(user.id) == 3
+    assert await inbox.mark_read(user.id, [stored[0].id]) == 1
+    assert await inbox.mark_read(user.id, [stored[0].id]) == 0
+    assert await inbox.archive(user.id, [stored[0].id, stored[1].id]) == 2
+    assert await inbox.unread_count(user.id) == 1
+
+    await add_unread({user.id: -5})
+    state = await NotificationReadState.find_one(NotificationReadState.user_id == user.id)
+    assert state.unread_count == 0
+
+async def test_backfill_counts_notifications_older_than_the_counter(make_user):
+    user, quiet = await make_user(), await make_user()
+    await notify(user, 3)
+    # A newer notification creates the counter without the older ones
+    await notify(user, 1)
+    await add_unread({user.id: 1})
+    assert await inbox.unread_count(user.id) == 1
+
+    assert await recount_all_unread(batch_size=1) == 2
+
+    assert await inbox.unread_count(user.id) == 4
+    assert await inbox.unread_count(quiet.id) == 0
+
+async def test_broadcast_watermark_and_read_ids(make_user):
+    user = await make_user()
+    oldest, middle, newest = await broadcast(30), await broadcast(20), await broadcast(10)
+
+    assert await inbox.unread_count(user.id) == 3
+    await inbox.mark_broadcast_read(user.id, newest.id)
+    assert await inbox.unread_count(user.id) == 2
+
+    await inbox.mark_all_broadcasts_read(user.id, middle.created_at)
+    state = await inbox.get_read_state(user.id)
+    assert state.broadcast_watermark == middle.created_at
+    assert state.read_broadcast_ids == [newest.id]
+    assert await inbox.unread_count(user.id) == 0
+
+    # The watermark never moves back
+    await inbox.mark_all_broadcasts_read(user.id, oldest.created_at)
+    assert (await inbox.get_read_state(user.id)).broadcast_watermark == middle.created_at
+
+async def test_read_ids_fold_into_the_watermark(make_user, monkeypatch):
+    monkeypatch.setattr(inbox, "MAX_READ_IDS", 1)
+    user = await make_user()
+    oldest, middle, newest = await broadcast(30), await broadcast(20), await broadcast(10)
+
+    await inbox.mark_broadcast_read(user.id, oldest.id)
+    await inbox.mark_broadcast_read(user.id, middle.id)
+
+    state = await inbox.get_read_state(user.id)
+    assert state.broadcast_watermark == middle.created_at
+    assert state.read_broadcast_ids == []
+    assert await inbox.unread_broadcasts(user.id) == 1
+
+    page, _ = await inbox.list_inbox(user.id, None, 10)
+    assert [(item.id, item.status.value) for item in page] == [
+        (newest.id, "unread"), (middle.id, "read"), (oldest.id, "read"),
+    ]
+
+async def test_inbox_cursor_pages_merge_personal_and_broadcast(make_user):
+    user, other = await make_user(), await make_user()
+    now = datetime.utcnow().replace(microsecond=0)
+    personal = [
+        Notification(
+            user_id=owner.id, title="Hi", message="Hello", notification_type=NotificationType.GENERAL,
+            created_at=now - timedelta(minutes=minutes),
+        )
+        for owner, minutes in ((user, 5), (user, 15), (user, 15), (other, 12), (user, 35))
+    ]
+    await Notification.insert_many(personal)
+    shared = [await broadcast(minutes) for minutes in (10, 15, 25)]
+
+    mine = [(item.created_at, item.id) for item in personal if item.user_id == user.id]
+    expected = [item_id for _, item_id in sorted(mine + [(item.created_at, item.id) for item in shared], reverse=True)]
+    for limit in (1, 2, 3, 10):
+        seen, cursor = [], None
+        while True:
+            page, cursor = await inbox.list_inbox(user.id, cursor, limit)
+            assert len(page) <= limit
+            seen.extend(item.id for item in page)
+            if cursor is None:
+                break
+        assert seen == expected
@@ -0,0 +1,102 @@
+import socket
+from email.message import EmailMessage
+from types import SimpleNamespace
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app.models.notification import NotificationType
+from app.services.mailer import Mailer, render
+
+class Inbox:
+    """aiosmtpd handler keeping what it accepts, refusing some recipients."""
+
+    def __init__(self, refused=()):
+        self.refused = set(refused)
+        self.received = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refused:
+            return "550 Mailbox unavailable"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.extend(envelope.rcpt_tos)
+        return "250 Message accepted for delivery"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    """A local SMTP server; call `restart()` to drop every open connection."""
+    inbox = Inbox(refused=["user4@example.com"])
+    port = free_port()
+    controllers = [Controller(inbox, hostname="127.0.0.1", port=port)]
+    controllers[0].start()
+
+    def restart():
+        controllers[-1].stop()
+        controllers.append(Controller(inbox, hostname="127.0.0.1", port=port))
+        controllers[-1].start()
+
+    yield SimpleNamespace(inbox=inbox, port=port, restart=restart)
+    controllers[-1].stop()
+
+def message(to: str) -> EmailMessage:
+    email = EmailMessage()
+    email["From"] = "no-reply@example.com"
+    email["To"] = to
+    email["Subject"] = "Hello"
+    email.set_content("Hi")
+    return email
+
+def test_render_fills_templates_and_reuses_results():
+    context = {"title": "You won!", "first_name": "Ada", "message": "Your bet won 20.00", "app_name": "Betting"}
+
+    subject, body = render(NotificationType.BET_RESULT, context)
+
+    assert subject == "You won!"
+    assert body.startswith("Hi Ada,\n\nYour bet won 20.00")
+    assert render(NotificationType.BET_RESULT, dict(context)) is render(NotificationType.BET_RESULT, context)
+
+@pytest.mark.asyncio
+async def test_send_many_spreads_over_the_pool_and_keeps_message_order(smtp_server):
+    refused = "user4@example.com"
+    mailer = Mailer("127.0.0.1", smtp_server.port, start_tls=False, pool_size=3)
+    mailer.open()
+    recipients = [f"user{n}@example.com" for n in range(7)]
+
+    results = await mailer.send_many([message(to) for to in recipients])
+
+    assert results == [to != refused for to in recipients]
+    assert sorted(smtp_server.inbox.received) == sorted(set(recipients) - {refused})
+    assert (mailer.sent, mailer.failed, mailer.connects) == (6, 1, 3)
+
+    # Open connections are reused
+    await mailer.send_many([message("again@example.com")])
+    assert mailer.connects == 3
+    await mailer.stop()
+
+@pytest.mark.asyncio
+async def test_dropped_connections_are_reopened(smtp_server):
+    mailer = Mailer("127.0.0.1", smtp_server.port, start_tls=False, pool_size=2)
+    mailer.open()
+    await mailer.send_many([message("first@example.com"), message("second@example.com")])
+
+    smtp_server.restart()
+    results = await mailer.send_many([message("third@example.com"), message("fourth@example.com")])
+
+    assert results == [True, True]
+    assert "third@example.com" in smtp_server.inbox.received
+    assert mailer.connects == 4
+    await mailer.stop()
+
+def test_only_configured_types_are_emailed():
+    mailer = Mailer("localhost", 25, types=[NotificationType.DEPOSIT_CONFIRMATION, NotificationType.PROMOTION])
+
+    assert mailer.types == {NotificationType.DEPOSIT_CONFIRMATION}
+    assert NotificationType.BET_RESULT not in Mailer("localhost", 25, types=[]).types
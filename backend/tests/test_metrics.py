@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+import anyio.to_thread
+import pytest
+
+from app.core.metrics import Registry, threadpool_stats
+
+@pytest.mark.asyncio
+async def test_threadpool_stats_read_the_anyio_limiter():
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    call = asyncio.ensure_future(anyio.to_thread.run_sync(block))
+    await asyncio.get_running_loop().run_in_executor(None, started.wait)
+
+    stats = threadpool_stats()
+    assert stats["borrowed"] == 1
+    assert stats["total"] == anyio.to_thread.current_default_thread_limiter().total_tokens
+    assert stats["waiting"] == 0
+
+    release.set()
+    await call
+    assert threadpool_stats()["borrowed"] == 0
+
+@pytest.mark.asyncio
+async def test_stats_render_as_gauges():
+    registry = Registry()
+    registry.register_stats("threadpool", threadpool_stats)
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE threadpool_borrowed gauge" in lines
+    assert "threadpool_borrowed 0" in lines
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.notification import Notification, NotificationType
+from app.services.notifications import NotificationService, build_event, hub
+
+pytestmark = pytest.mark.asyncio
+
+@pytest.fixture
+def connection():
+    connections = []
+
+    async def connect(user):
+        connections.append(hub.connect(str(user.id)))
+        return connections[-1]
+
+    yield connect
+    for connection in connections:
+        hub.disconnect(connection)
+
+async def store(event: dict):
+    await Notification(
+        id=event["id"],
+        user_id=event["user_id"],
+        title=event["title"],
+        message=event["message"],
+        notification_type=NotificationType(event["type"]),
+    ).insert()
+
+async def test_each_notification_is_pushed_by_one_worker(make_user, connection):
+    user = await make_user()
+    client = await connection(user)
+    event = build_event(user.id, NotificationType.BET_RESULT, "You won", "20.00 paid out")
+    await store(event)
+
+    # The same event reaches two workers, and twice the first one
+    first, second = NotificationService(), NotificationService()
+    assert await first.push_claimed([event, event]) == []
+    assert await second.push_claimed([event]) == []
+
+    assert client.queue.qsize() == 1
+    stored = await Notification.get(event["id"])
+    assert stored.is_push_sent is True
+
+async def test_claims_wait_for_the_notification_to_be_stored(make_user, connection):
+    user = await make_user()
+    client = await connection(user)
+    fresh = build_event(user.id, NotificationType.BET_RESULT, "You won", "20.00 paid out")
+    stale = {**build_event(user.id, NotificationType.BET_RESULT, "You lost", "Better luck next time"),
+             "created_at": (datetime.utcnow() - timedelta(minutes=5)).isoformat()}
+    service = NotificationService()
+
+    assert await service.push_claimed([fresh, stale]) == [fresh]
+    assert client.queue.empty()
+
+    await store(fresh)
+    assert await service.push_claimed([fresh]) == []
+    assert client.queue.get_nowait()["id"] == fresh["id"]
+
+async def test_users_not_connected_here_are_not_claimed(make_user):
+    user = await make_user()
+    event = build_event(user.id, NotificationType.BET_RESULT, "You won", "20.00 paid out")
+    await store(event)
+
+    assert await NotificationService().push_claimed([event]) == []
+    assert (await Notification.get(event["id"])).is_push_sent is False
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.core.pagination import decode_cursor, encode_cursor, keyset_filter, page_cursor
+
+SORT = [("created_at", -1), ("_id", -1)]
+
+def test_cursor_round_trips_datetimes_and_ids():
+    values = {"created_at": datetime(2024, 5, 1, 12, 30, 15, 123000), "_id": ObjectId()}
+
+    assert decode_cursor(encode_cursor(values), SORT) == values
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor({"created_at": datetime(2024, 1, 1)})])
+def test_bad_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, SORT)
+    assert exc.value.status_code == 400
+
+def test_keyset_filter_breaks_ties_on_later_fields():
+    after = {"created_at": datetime(2024, 1, 1), "_id": ObjectId()}
+
+    assert keyset_filter(after, SORT) == {"$or": [
+        {"created_at": {"$lt": after["created_at"]}},
+        {"created_at": after["created_at"], "_id": {"$lt": after["_id"]}},
+    ]}
+    assert keyset_filter({"_id": after["_id"]}, [("_id", 1)]) == {"_id": {"$gt": after["_id"]}}
+
+def test_page_cursor_points_at_last_returned_item():
+    items = [{"created_at": datetime(2024, 1, 1), "_id": ObjectId(), "extra": n} for n in range(3)]
+
+    assert page_cursor(items, SORT, 3) is None
+    assert decode_cursor(page_cursor(items, SORT, 2), SORT) == {
+        "created_at": items[1]["created_at"], "_id": items[1]["_id"],
+    }
+
+@pytest.mark.asyncio
+async def test_pages_cover_every_document_once_in_order(db):
+    collection = db.pagination_test
+    start = datetime(2024, 1, 1)
+    # Several documents share each timestamp, so _id has to break the ties
+    await collection.insert_many([{"created_at": start + timedelta(minutes=n // 3)} for n in range(25)])
+    expected = await collection.find().sort(SORT).to_list(None)
+
+    seen, cursor, limit = [], None, 4
+    while True:
+        query = keyset_filter(decode_cursor(cursor, SORT), SORT) if cursor else {}
+        items = await collection.find(query).sort(SORT).limit(limit + 1).to_list(limit + 1)
+        seen.extend(items[:limit])
+        cursor = page_cursor(items, SORT, limit)
+        if cursor is None:
+            break
+
+    assert [item["_id"] for item in seen] == [item["_id"] for item in expected]
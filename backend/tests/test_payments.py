@@ -0,0 +1,172 @@
+import json
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.models.payment import PaymentEvent, PaymentEventStatus
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+from app.models.user import User
+from app.services import wallet
+from app.services.payments import InvalidSignatureError, PaymentProcessor, sign
+
+pytestmark = pytest.mark.asyncio
+
+def event(event_id: str, event_type: str, intent_id: str, user_id, amount: int = 1500, currency: str = "usd") -> bytes:
+    return json.dumps({
+        "id": event_id,
+        "type": event_type,
+        "data": {"object": {
+            "id": intent_id,
+            "amount": amount,
+            "amount_received": amount,
+            "currency": currency,
+            "payment_method_types": ["card"],
+            "metadata": {"user_id": str(user_id)},
+        }},
+    }).encode()
+
+def payout(event_id: str, event_type: str, payout_id: str, reference_id: str, amount: int = 1000) -> bytes:
+    return json.dumps({
+        "id": event_id,
+        "type": event_type,
+        "data": {"object": {
+            "id": payout_id,
+            "amount": amount,
+            "currency": "usd",
+            "metadata": {"reference_id": reference_id},
+        }},
+    }).encode()
+
+def processor() -> PaymentProcessor:
+    return PaymentProcessor(workers=1, queue_size=100, bloom_capacity=1000)
+
+async def deliver(payments: PaymentProcessor, payload: bytes) -> bool:
+    return await payments.ingest(payload, sign(payload, settings.STRIPE_WEBHOOK_SECRET))
+
+async def test_bad_signatures_are_rejected():
+    payload = event("evt_1", "payment_intent.succeeded", "pi_1", "0" * 24)
+    payments = processor()
+
+    with pytest.raises(InvalidSignatureError):
+        await payments.ingest(payload, sign(payload, "whsec_someone_else"))
+    with pytest.raises(InvalidSignatureError):
+        stale = int(time.time()) - settings.PAYMENT_WEBHOOK_TOLERANCE_SECONDS - 60
+        await payments.ingest(payload, sign(payload, settings.STRIPE_WEBHOOK_SECRET, stale))
+    with pytest.raises(InvalidSignatureError):
+        await payments.ingest(payload, None)
+
+async def test_redelivered_event_is_stored_once(make_user):
+    user = await make_user()
+    payload = event("evt_1", "payment_intent.succeeded", "pi_1", user.id)
+    payments = processor()
+
+    assert await deliver(payments, payload) is True
+    assert await deliver(payments, payload) is False
+    # Another worker has not seen it, the unique index still catches it
+    assert await deliver(processor(), payload) is False
+
+    assert payments.stats()["duplicates"] == 1
+    assert await PaymentEvent.find(PaymentEvent.event_id == "evt_1").count() == 1
+
+async def test_two_events_for_one_payment_credit_once(make_user):
+    user = await make_user()
+    payments = processor()
+    for event_id in ("evt_1", "evt_2"):
+        assert await deliver(payments, event(event_id, "payment_intent.succeeded", "pi_1", user.id))
+        await payments.process(event_id)
+
+    assert (await User.get(user.id)).balance_minor == 1500
+    assert await Transaction.find(Transaction.transaction_type == TransactionType.DEPOSIT).count() == 1
+    statuses = {stored.status for stored in await PaymentEvent.find_all().to_list()}
+    assert statuses == {PaymentEventStatus.PROCESSED}
+
+async def test_failed_attempt_does_not_block_a_later_success(make_user):
+    user = await make_user()
+    payments = processor()
+    await deliver(payments, event("evt_fail", "payment_intent.payment_failed", "pi_1", user.id))
+    await payments.process("evt_fail")
+    await deliver(payments, event("evt_ok", "payment_intent.succeeded", "pi_1", user.id))
+    await payments.process("evt_ok")
+
+    assert (await User.get(user.id)).balance_minor == 1500
+    failed = await Transaction.find_one(Transaction.reference_id == "stripe:pi_1:failed:evt_fail")
+    assert failed.status == TransactionStatus.FAILED
+    deposit = await Transaction.find_one(Transaction.reference_id == "stripe:pi_1")
+    assert deposit.status == TransactionStatus.COMPLETED
+
+async def test_foreign_currency_is_rejected_without_retries(make_user):
+    user = await make_user()
+    payments = processor()
+    await deliver(payments, event("evt_1", "payment_intent.succeeded", "pi_1", user.id, currency="eur"))
+
+    await payments.process("evt_1")
+
+    stored = await PaymentEvent.find_one(PaymentEvent.event_id == "evt_1")
+    assert stored.status == PaymentEventStatus.FAILED
+    assert stored.attempts == 1
+    assert (await User.get(user.id)).balance_minor == 0
+    assert payments.stats()["failed"] == 1
+
+async def test_bad_metadata_is_rejected_without_retries(make_user):
+    payments = processor()
+    payload = json.loads(event("evt_1", "payment_intent.succeeded", "pi_1", "not-an-id"))
+    await deliver(payments, json.dumps(payload).encode())
+    del payload["data"]["object"]["metadata"]
+    payload["id"] = "evt_2"
+    await deliver(payments, json.dumps(payload).encode())
+
+    for event_id in ("evt_1", "evt_2"):
+        await payments.process(event_id)
+        stored = await PaymentEvent.find_one(PaymentEvent.event_id == event_id)
+        assert stored.status == PaymentEventStatus.FAILED
+        assert stored.attempts == 1
+
+async def test_paid_payout_completes_the_held_withdrawal(make_user):
+    user = await make_user(balance_minor=1500)
+    held = await wallet.debit(user.id, 1000, TransactionType.WITHDRAWAL, reference_id="withdrawal:1", hold=True)
+    assert held.status == TransactionStatus.PENDING
+    assert (await User.get(user.id)).balance_minor == 500
+    # Replaying the hold neither takes the money again nor completes it
+    replayed = await wallet.debit(user.id, 1000, TransactionType.WITHDRAWAL, reference_id="withdrawal:1", hold=True)
+    assert replayed.status == TransactionStatus.PENDING
+
+    payments = processor()
+    await deliver(payments, payout("evt_1", "payout.paid", "po_1", "withdrawal:1"))
+    await payments.process("evt_1")
+
+    withdrawal = await Transaction.find_one(Transaction.reference_id == "withdrawal:1")
+    assert withdrawal.status == TransactionStatus.COMPLETED
+    assert (await User.get(user.id)).balance_minor == 500
+
+async def test_failed_payout_returns_the_held_amount_once(make_user):
+    user = await make_user(balance_minor=1500)
+    await wallet.debit(user.id, 1000, TransactionType.WITHDRAWAL, reference_id="withdrawal:1", hold=True)
+    payments = processor()
+    for event_id in ("evt_1", "evt_2"):
+        await deliver(payments, payout(event_id, "payout.failed", "po_1", "withdrawal:1"))
+        await payments.process(event_id)
+    # A late payout.paid does not bring the reversed withdrawal back
+    await deliver(payments, payout("evt_3", "payout.paid", "po_1", "withdrawal:1"))
+    await payments.process("evt_3")
+
+    withdrawal = await Transaction.find_one(Transaction.reference_id == "withdrawal:1")
+    assert withdrawal.status == TransactionStatus.FAILED
+    assert (await User.get(user.id)).balance_minor == 1500
+    reversal = await Transaction.find_one(Transaction.reference_id == "withdrawal:1:reversal")
+    assert reversal.amount == 1000
+    statuses = {stored.status for stored in await PaymentEvent.find_all().to_list()}
+    assert statuses == {PaymentEventStatus.PROCESSED}
+
+async def test_payout_without_a_withdrawal_is_rejected(make_user):
+    user = await make_user(balance_minor=500)
+    with pytest.raises(wallet.InsufficientFundsError):
+        await wallet.debit(user.id, 1000, TransactionType.WITHDRAWAL, reference_id="withdrawal:1", hold=True)
+    payments = processor()
+    await deliver(payments, payout("evt_1", "payout.failed", "po_1", "withdrawal:1"))
+    await deliver(payments, payout("evt_2", "payout.failed", "po_2", "withdrawal:2"))
+    for event_id in ("evt_1", "evt_2"):
+        await payments.process(event_id)
+
+    assert (await User.get(user.id)).balance_minor == 500
+    assert payments.stats()["failed"] == 2
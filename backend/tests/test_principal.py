@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+import pytest
+from beanie import PydanticObjectId
+
+from app.core import principal as principal_module
+from app.core.principal import Principal, PrincipalCache, _version
+from app.models.user import UserRole, UserStatus
+
+pytestmark = pytest.mark.asyncio
+
+EMAIL = "alice@example.com"
+
+@pytest.fixture(autouse=True)
+def no_redis(monkeypatch):
+    monkeypatch.setattr(principal_module, "get_redis", lambda: None)
+
+def principal(role: UserRole, updated_at) -> Principal:
+    return Principal(
+        id=PydanticObjectId(), email=EMAIL, role=role, status=UserStatus.ACTIVE, version=_version(updated_at),
+    )
+
+async def test_load_from_before_the_write_is_not_cached_again():
+    cache = PrincipalCache()
+    before = datetime.utcnow() - timedelta(minutes=1)
+    written = datetime.utcnow()
+
+    # A request read the admin before the demotion and finishes after it
+    await cache.invalidate(EMAIL, written)
+    await cache.set(principal(UserRole.ADMIN, before))
+    await cache.set(principal(UserRole.ADMIN, None))
+    assert await cache.get(EMAIL) is None
+
+    # Loaded from Mongo after the write: milliseconds only, still current
+    await cache.set(principal(UserRole.USER, written.replace(microsecond=written.microsecond // 1000 * 1000)))
+    assert (await cache.get(EMAIL)).role == UserRole.USER
+
+async def test_invalidation_from_another_worker_raises_the_floor():
+    cache = PrincipalCache()
+    written = datetime.utcnow()
+    await cache.set(principal(UserRole.ADMIN, written - timedelta(minutes=1)))
+
+    cache.evict_local(f"{EMAIL} {_version(written)}")
+    assert await cache.get(EMAIL) is None
+    await cache.set(principal(UserRole.ADMIN, written - timedelta(minutes=1)))
+    assert await cache.get(EMAIL) is None
@@ -0,0 +1,38 @@
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import RateLimiter, _client_ip
+
+def scope(*forwarded: str, client=("10.0.0.9", 50000)) -> dict:
+    return {"headers": [(b"x-forwarded-for", value.encode()) for value in forwarded], "client": client}
+
+def test_forwarded_header_is_ignored_without_trusted_proxies():
+    assert _client_ip(scope("1.2.3.4"), 0) == "10.0.0.9"
+
+@pytest.mark.parametrize("hops, expected", [(1, "203.0.113.7"), (2, "198.51.100.2")])
+def test_client_is_taken_trusted_hops_from_the_right(hops, expected):
+    # Client forged the first entry, then two proxies appended what they saw
+    assert _client_ip(scope("6.6.6.6, 198.51.100.2", "203.0.113.7"), hops) == expected
+
+def test_short_header_falls_back_to_the_socket_peer():
+    assert _client_ip(scope("203.0.113.7"), 2) == "10.0.0.9"
+    assert _client_ip(scope(client=None), 1) == "unknown"
+
+@pytest.mark.asyncio
+async def test_account_bucket_is_shared_by_credential_routes(monkeypatch):
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: None)
+    limiter = RateLimiter({
+        "POST /api/v1/auth/login": "ip:100/60,account:4/300",
+        "POST /api/v1/auth/token": "ip:100/60,account:4/300",
+    })
+    routes = [limiter.policy_for("POST", path) for path in ("/api/v1/auth/login", "/api/v1/auth/token")]
+
+    results = []
+    for attempt in range(6):
+        policy, limits = routes[attempt % 2]
+        account_limits = [limit for limit in limits if limit.scope == "account"]
+        results.append(await limiter.check(policy, account_limits, "alice@example.com"))
+
+    # Alternating routes gets the same four guesses as one route
+    assert [retry_after is None for retry_after in results] == [True] * 4 + [False] * 2
+    assert await limiter.check(routes[0][0], routes[0][1][:1], "alice@example.com") is None
@@ -0,0 +1,42 @@
+import json
+from datetime import datetime
+
+from beanie import PydanticObjectId
+from bson import ObjectId
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.core.responses import FastJSONResponse, fast_response
+from app.models.user import UserRole
+
+class Item(BaseModel):
+    id: PydanticObjectId
+    role: UserRole
+    created_at: datetime
+    amount: float
+
+def item() -> Item:
+    return Item(id=PydanticObjectId(), role=UserRole.ADMIN, created_at=datetime(2024, 5, 1, 12, 30), amount=12.5)
+
+def test_models_render_like_fastapi_would():
+    model = item()
+
+    body = FastJSONResponse(model).body
+
+    assert json.loads(body) == json.loads(model.model_dump_json())
+    assert json.loads(body)["role"] == "admin"
+
+def test_raw_documents_with_object_ids_render():
+    document_id = ObjectId()
+
+    body = FastJSONResponse({"_id": document_id, "items": [{"created_at": datetime(2024, 1, 1)}]}).body
+
+    assert json.loads(body) == {"_id": str(document_id), "items": [{"created_at": "2024-01-01T00:00:00"}]}
+
+def test_models_are_left_to_fastapi_when_disabled(monkeypatch):
+    model = item()
+    assert isinstance(fast_response(model, status_code=201), FastJSONResponse)
+    assert fast_response(model, status_code=201).status_code == 201
+
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", False)
+    assert fast_response(model) is model
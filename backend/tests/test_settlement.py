@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.bet import Bet, BetStatus
+from app.models.game import Game, GameSession, GameType
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+from app.models.user import User
+from app.services import settlement
+from app.services.bet_writer import BetWriter
+
+pytestmark = pytest.mark.asyncio
+
+async def closed_session(result="A") -> GameSession:
+    game = Game(name="Test game", game_type=GameType.LOTTERY)
+    await game.insert()
+    session = GameSession(game_id=game.id, session_data={"result": result}, ended_at=datetime.utcnow())
+    await session.insert()
+    return session
+
+async def place(session: GameSession, user, selection: str, amount: float, odds: float, **fields) -> Bet:
+    bet = Bet(
+        user_id=user.id,
+        game_id=session.game_id,
+        game_session_id=session.id,
+        bet_amount=amount,
+        potential_payout=round(amount * odds, 2),
+        odds=odds,
+        bet_data={"selection": selection},
+        placed_at=session.ended_at - timedelta(seconds=30),
+        **fields,
+    )
+    await bet.insert()
+    return bet
+
+async def balance(user) -> int:
+    return (await User.get(user.id)).balance_minor
+
+async def test_settles_each_bet_once(make_user):
+    session = await closed_session()
+    winner, loser = await make_user(), await make_user()
+    won = await place(session, winner, "A", 10.0, 2.0)
+    lost = await place(session, loser, "B", 5.0, 3.0)
+
+    summary = await settlement.settle_session(session.id, batch_size=1)
+
+    assert (summary["bets"], summary["won"], summary["payout_minor"], summary["batches"]) == (2, 1, 2000, 2)
+    assert await balance(winner) == 2000
+    assert await balance(loser) == 0
+    assert (await Bet.get(won.id)).status == BetStatus.WON
+    assert (await Bet.get(lost.id)).status == BetStatus.LOST
+    payout = await Transaction.find_one(Transaction.reference_id == f"payout:{won.id}")
+    assert payout.status == TransactionStatus.COMPLETED
+
+    again = await settlement.settle_session(session.id, batch_size=1)
+
+    assert again["bets"] == 0
+    assert await balance(winner) == 2000
+    assert (await GameSession.get(session.id)).total_payouts == 20.0
+
+async def test_replay_after_crash_credits_once_and_counts_every_payout(make_user, monkeypatch):
+    session = await closed_session()
+    users = [await make_user() for _ in range(3)]
+    for user in users:
+        await place(session, user, "A", 10.0, 2.5)
+    await place(session, users[0], "B", 10.0, 4.0)
+
+    # Die after the credits and rollups, before anything is finalized
+    record_settlement = settlement.record_settlement
+
+    async def crash(*args, **kwargs):
+        await record_settlement(*args, **kwargs)
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(settlement, "record_settlement", crash)
+    with pytest.raises(RuntimeError):
+        await settlement.settle_session(session.id)
+    claimed = await Bet.find({"game_session_id": session.id, "settlement_batch": {"$ne": None}}).count()
+    assert claimed == 4
+    assert [await balance(user) for user in users] == [2500, 2500, 2500]
+
+    monkeypatch.setattr(settlement, "record_settlement", record_settlement)
+    await settlement.settle_session(session.id)
+
+    assert [await balance(user) for user in users] == [2500, 2500, 2500]
+    stored = await GameSession.get(session.id)
+    assert stored.total_payouts == 75.0
+    assert len(stored.settled_batches) == 1
+    assert stored.settled_at is not None
+    bets = await Bet.find(Bet.game_session_id == session.id).to_list()
+    assert sorted(bet.status for bet in bets) == sorted([BetStatus.WON] * 3 + [BetStatus.LOST])
+    assert all(bet.settlement_batch is None for bet in bets)
+    payouts = await Transaction.find(
+        Transaction.transaction_type == TransactionType.BET_WON,
+        Transaction.status == TransactionStatus.COMPLETED,
+    ).count()
+    assert payouts == 3
+
+async def test_bets_accepted_after_close_are_refunded(make_user):
+    session = await closed_session()
+    user = await make_user()
+    in_time = await place(session, user, "A", 10.0, 2.0)
+    late = await place(session, user, "A", 5.0, 2.0, placed_at=session.ended_at + timedelta(seconds=1))
+
+    summary = await settlement.settle_session(session.id)
+
+    assert (summary["bets"], summary["refunded"]) == (1, 1)
+    assert (await Bet.get(in_time.id)).status == BetStatus.WON
+    assert (await Bet.get(late.id)).status == BetStatus.REFUNDED
+    assert await balance(user) == 2000 + 500
+    refund = await Transaction.find_one(Transaction.reference_id == f"refund:{late.id}")
+    assert refund.transaction_type == TransactionType.BET_REFUND
+    stored = await GameSession.get(session.id)
+    assert (stored.bet_count, stored.total_bets) == (1, 10.0)
+
+async def test_bet_written_after_settlement_settles_the_session_again(make_user):
+    session = await closed_session()
+    user = await make_user()
+    await settlement.settle_session(session.id)
+    straggler = Bet(
+        user_id=user.id,
+        game_id=session.game_id,
+        game_session_id=session.id,
+        bet_amount=10.0,
+        potential_payout=30.0,
+        odds=3.0,
+        bet_data={"selection": "A"},
+        placed_at=session.ended_at - timedelta(seconds=1),
+    )
+
+    await BetWriter()._flush([straggler])
+    await asyncio.gather(*settlement._scheduled)
+
+    assert (await Bet.get(straggler.id)).status == BetStatus.WON
+    assert await balance(user) == 3000
+    assert (await GameSession.get(session.id)).total_payouts == 30.0
@@ -0,0 +1,36 @@
+from bson import ObjectId
+
+from app.core.config import settings
+from app.models.notification import NotificationType
+from app.services.mailer import Mailer
+from app.workers import tasks
+from app.workers.celery_app import celery_app
+
+def notification(notification_type: NotificationType) -> dict:
+    return {
+        "_id": ObjectId(),
+        "user_id": ObjectId(),
+        "notification_type": notification_type,
+        "title": "Deposit received",
+        "message": "15.00 was added to your balance",
+    }
+
+def test_email_runs_rate_limited_on_the_bulk_queue():
+    routes = celery_app.conf.task_routes
+
+    assert routes["app.workers.tasks.send_notification_emails"] == {"queue": "bulk"}
+    assert routes["app.workers.tasks.settle_session"] == {"queue": "critical"}
+    assert tasks.send_notification_emails.rate_limit == settings.EMAIL_TASK_RATE_LIMIT
+
+def test_submit_enqueues_one_task_per_batch(monkeypatch):
+    sent = []
+    monkeypatch.setattr(settings, "CELERY_ENABLED", True)
+    monkeypatch.setattr(tasks.send_notification_emails, "delay", sent.append)
+    notifications = [notification(NotificationType.DEPOSIT_CONFIRMATION) for _ in range(5)]
+
+    Mailer("localhost", 25, batch_size=2).submit(notifications + [notification(NotificationType.PROMOTION)])
+
+    assert [len(chunk) for chunk in sent] == [2, 2, 1]
+    assert [notification_id for chunk in sent for notification_id in chunk] == [
+        str(notification["_id"]) for notification in notifications
+    ]
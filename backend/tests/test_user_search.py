@@ -0,0 +1,49 @@
+from typing import Optional
+
+import pytest
+
+from app.models.user import User
+from app.services.user_search import search_users
+
+pytestmark = pytest.mark.asyncio
+
+async def user(username: str, first_name: str = "Test", last_name: str = "User", email: Optional[str] = None) -> User:
+    created = User(
+        email=email or f"{username}@example.com", username=username, hashed_password="x",
+        first_name=first_name, last_name=last_name,
+    )
+    await created.insert()
+    return created
+
+async def test_exact_matches_rank_above_prefixes_above_names(db):
+    name_match = await user("zed", first_name="Ann", last_name="Lee")
+    prefix = await user("annabel")
+    exact = await user("ann", email="someone@example.com")
+    await user("bob")
+
+    users, total = await search_users("  ANN ", 0, 10)
+
+    assert [found["_id"] for found in users] == [exact.id, prefix.id, name_match.id]
+    assert total == 3
+    assert all("hashed_password" not in found and "name_tokens" not in found for found in users)
+
+async def test_pages_cover_each_match_once(db):
+    created = [await user(f"player{n:02d}") for n in range(7)]
+
+    seen = []
+    for skip in range(0, 8, 3):
+        users, total = await search_users("player", skip, 3)
+        assert total == 7
+        seen.extend(found["_id"] for found in users)
+
+    # Equal ranks fall back to newest first
+    assert seen == [found.id for found in reversed(created)]
+
+async def test_multi_word_terms_use_the_text_index(db):
+    match = await user("alovelace", first_name="Ada", last_name="Lovelace")
+    await user("ghopper", first_name="Grace", last_name="Hopper")
+
+    users, total = await search_users("ada lovelace", 0, 10)
+
+    assert [found["_id"] for found in users] == [match.id]
+    assert total == 1
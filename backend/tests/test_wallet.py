@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.models.transaction import Transaction, TransactionStatus, TransactionType
+from app.models.user import User, UserStatus
+from app.schemas.user import AdminUserUpdate
+from app.services import wallet
+
+pytestmark = pytest.mark.asyncio
+
+async def balance(user) -> int:
+    return (await User.get(user.id)).balance_minor
+
+async def test_replayed_credit_applies_once(make_user):
+    user = await make_user()
+
+    first = await wallet.credit(user.id, 500, TransactionType.DEPOSIT, reference_id="deposit:1")
+    second = await wallet.credit(user.id, 500, TransactionType.DEPOSIT, reference_id="deposit:1")
+
+    assert second.id == first.id
+    assert second.status == TransactionStatus.COMPLETED
+    assert await balance(user) == 500
+    assert await Transaction.find(Transaction.reference_id == "deposit:1").count() == 1
+
+async def test_concurrent_debits_with_one_key_apply_once(make_user):
+    user = await make_user(balance_minor=1000)
+
+    results = await asyncio.gather(
+        *(wallet.debit(user.id, 300, TransactionType.BET_PLACED, reference_id="bet:1") for _ in range(10)),
+        return_exceptions=True,
+    )
+
+    assert all(not isinstance(result, Exception) for result in results)
+    assert await balance(user) == 700
+    stored = await Transaction.find_one(Transaction.reference_id == "bet:1")
+    assert stored.status == TransactionStatus.COMPLETED
+    assert (stored.balance_before, stored.balance_after) == (1000, 700)
+
+async def test_debit_never_overdraws(make_user):
+    user = await make_user(balance_minor=1000)
+
+    results = await asyncio.gather(
+        *(wallet.debit(user.id, 300, TransactionType.BET_PLACED, reference_id=f"bet:{n}") for n in range(5)),
+        return_exceptions=True,
+    )
+
+    applied = [result for result in results if not isinstance(result, Exception)]
+    rejected = [result for result in results if isinstance(result, wallet.InsufficientFundsError)]
+    assert (len(applied), len(rejected)) == (3, 2)
+    assert await balance(user) == 100
+    failed = await Transaction.find(Transaction.status == TransactionStatus.FAILED).count()
+    assert failed == 2
+
+async def test_debit_from_inactive_account_is_refused(make_user):
+    user = await make_user(balance_minor=1000, status=UserStatus.SUSPENDED)
+
+    with pytest.raises(wallet.AccountNotFoundError):
+        await wallet.debit(user.id, 100, TransactionType.BET_PLACED, reference_id="bet:1")
+    assert await balance(user) == 1000
+
+async def test_replay_after_crash_completes_without_applying_again(make_user):
+    # The balance update landed but the process died before completing the transaction
+    user = await make_user(balance_minor=800, recent_ops=[{"key": "payout:1", "at": datetime.utcnow()}])
+    await Transaction(
+        user_id=user.id,
+        transaction_type=TransactionType.BET_WON,
+        amount=800,
+        status=TransactionStatus.PENDING,
+        reference_id="payout:1",
+    ).insert()
+
+    transaction = await wallet.credit(user.id, 800, TransactionType.BET_WON, reference_id="payout:1")
+
+    assert transaction.status == TransactionStatus.COMPLETED
+    assert await balance(user) == 800
+
+async def test_set_balance_moves_to_target(make_user):
+    user = await make_user(balance_minor=250)
+
+    transaction = await wallet.set_balance(user.id, 1000, reference_id="adjust:1")
+
+    assert transaction.transaction_type == TransactionType.ADJUSTMENT
+    assert transaction.amount == 750
+    assert await balance(user) == 1000
+    assert await wallet.set_balance(user.id, 1000) is None
+
+async def test_replay_after_many_other_operations_still_applies_once(make_user):
+    user = await make_user(balance_minor=1000)
+    await wallet.debit(user.id, 300, TransactionType.BET_PLACED, reference_id="bet:1")
+    # As if the process died before completing the transaction
+    await Transaction.find_one(Transaction.reference_id == "bet:1").update({"$set": {"status": TransactionStatus.PENDING}})
+    for n in range(200):
+        await wallet.credit(user.id, 1, TransactionType.BONUS, reference_id=f"bonus:{n}")
+
+    transaction = await wallet.debit(user.id, 300, TransactionType.BET_PLACED, reference_id="bet:1")
+
+    assert transaction.status == TransactionStatus.COMPLETED
+    assert await balance(user) == 900
+
+async def test_expired_operation_keys_are_dropped(make_user, monkeypatch):
+    user = await make_user()
+    await wallet.credit(user.id, 100, TransactionType.BONUS, reference_id="bonus:1")
+    monkeypatch.setattr(settings, "WALLET_OP_KEY_TTL_HOURS", 0)
+
+    await wallet.credit(user.id, 100, TransactionType.BONUS, reference_id="bonus:2")
+
+    assert [op["key"] for op in (await User.get(user.id)).recent_ops] == ["bonus:2"]
+
+async def test_replayed_failure_returns_the_stored_outcome(make_user):
+    user = await make_user(balance_minor=100)
+    with pytest.raises(wallet.InsufficientFundsError):
+        await wallet.debit(user.id, 300, TransactionType.BET_PLACED, reference_id="bet:1")
+    await wallet.credit(user.id, 500, TransactionType.DEPOSIT, reference_id="deposit:1")
+
+    with pytest.raises(wallet.InsufficientFundsError) as replay:
+        await wallet.debit(user.id, 300, TransactionType.BET_PLACED, reference_id="bet:1")
+
+    assert replay.value.transaction.status == TransactionStatus.FAILED
+    assert replay.value.transaction.failure_reason == "insufficient_funds"
+    assert await balance(user) == 600
+
+async def test_replayed_refusal_keeps_its_reason(make_user):
+    user = await make_user(balance_minor=1000, status=UserStatus.SUSPENDED)
+    with pytest.raises(wallet.AccountNotFoundError):
+        await wallet.debit(user.id, 100, TransactionType.BET_PLACED, reference_id="bet:1")
+
+    with pytest.raises(wallet.AccountNotFoundError):
+        await wallet.debit(user.id, 100, TransactionType.BET_PLACED, reference_id="bet:1")
+
+async def test_admin_cannot_set_a_negative_balance():
+    with pytest.raises(ValidationError):
+        AdminUserUpdate(balance=-0.01)
+    assert AdminUserUpdate(balance=0).balance == 0